@@ -0,0 +1,106 @@
+"""
+Benchmark de l'analyse hors ligne (pmscan_analyze).
+Génère des segments .pmr synthétiques (plusieurs capteurs, une trame par seconde
+et par capteur sur plusieurs jours), les analyse avec 1 puis N processus, et
+vérifie que le tableau de synthèse est identique quel que soit le nombre de
+processus et cohérent avec le décodage de pmscan_batch.
+
+Usage:
+    python benchmarks/bench_analyze.py [nombre_de_jours] [nombre_de_capteurs] [processus]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmscan_analyze import analyze, summary_rows  # noqa: E402
+from pmscan_batch import decode_frames  # noqa: E402
+from pmscan_record import (  # noqa: E402
+    HEADER_STRUCT,
+    RECORD_DTYPE,
+    RECORD_SIZE,
+    SEGMENT_MAGIC,
+    SEGMENT_VERSION,
+    SEGMENT_SUFFIX,
+    Segment,
+)
+
+DAY = 86400
+
+def write_segment(directory, address, day_start, seed):
+    """
+    Écrit un segment d'un jour de trames synthétiques (une par seconde).
+
+    Returns:
+        str: Chemin du segment
+    """
+    rng = np.random.default_rng(seed)
+    records = np.zeros(DAY, dtype=RECORD_DTYPE)
+    seconds = np.arange(DAY)
+    records["received_ns"] = (day_start + seconds) * 10**9 + 500_000_000
+    frames = records["frame"]
+    frames["timestamp"] = day_start + seconds
+    frames["command"] = 1
+    frames["particles_count"] = rng.integers(0, 5000, DAY)
+    # Cycle journalier de la pollution, avec bruit
+    base = 150 + 120 * np.sin(2 * np.pi * seconds / DAY)
+    frames["pm1_0"] = np.clip(base * 0.6 + rng.normal(0, 20, DAY), 0, 5000)
+    frames["pm2_5"] = np.clip(base + rng.normal(0, 30, DAY), 0, 5000)
+    frames["pm10_0"] = np.clip(base * 1.6 + rng.normal(0, 50, DAY), 0, 5000)
+    frames["temperature"] = rng.integers(150, 350, DAY)
+    frames["humidity"] = rng.integers(200, 1020, DAY)
+    # Quelques trames de démarrage
+    frames["pm2_5"][:3] = 0xFFFF
+
+    day = time.strftime("%Y%m%d", time.gmtime(day_start))
+    safe = address.replace(":", "-")
+    path = os.path.join(directory, f"pmscan-{safe}-{day}-000000-000{SEGMENT_SUFFIX}")
+    with open(path, "wb") as f:
+        f.write(HEADER_STRUCT.pack(SEGMENT_MAGIC, SEGMENT_VERSION, RECORD_SIZE,
+                                   day_start * 10**9, address.encode("ascii")))
+        records.tofile(f)
+    return path
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    devices = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    jobs = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    first_day = (int(time.time()) // DAY - days) * DAY
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [
+            write_segment(directory, f"AA:BB:CC:DD:EE:{device:02X}", first_day + day * DAY, device * 1000 + day)
+            for device in range(devices)
+            for day in range(days)
+        ]
+        count = len(paths) * DAY
+        print(f"Segments: {len(paths)} ({devices} capteurs x {days} jours), {count:,} trames")
+
+        start = time.perf_counter()
+        reference = analyze(paths, jobs=1)
+        single = time.perf_counter() - start
+        print(f"1 processus:  {single:.2f} s ({count / single:,.0f} trames/s)")
+
+        start = time.perf_counter()
+        results = analyze(paths, jobs=jobs, chunk_records=DAY // 4)
+        parallel = time.perf_counter() - start
+        print(f"{jobs} processus: {parallel:.2f} s ({count / parallel:,.0f} trames/s), "
+              f"accélération x{single / parallel:.1f}")
+
+        if summary_rows(results) != summary_rows(reference):
+            print("ERREUR: le résultat dépend du nombre de processus")
+            sys.exit(1)
+        with Segment(paths[0]) as segment:
+            expected = decode_frames(segment.frames)["pm2_5"].mean()
+        aggregate = next(iter(reference.values()))
+        if abs(aggregate.mean("pm2_5") - expected) > 1e-9:
+            print(f"ERREUR: moyenne PM2.5 {aggregate.mean('pm2_5')} au lieu de {expected}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark du décodage des trames PMScan.
+Compare le décodeur trame par trame (parse_real_time_data) au décodeur
+vectorisé (pmscan_batch.decode_frames) sur un tampon de trames synthétiques,
+et vérifie que les deux produisent les mêmes valeurs.
+
+Usage:
+    python benchmarks/bench_decode.py [nombre_de_trames]
+"""
+
+import contextlib
+import io
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pmscan_batch import FRAME_SIZE, decode_frames, frames_to_dicts  # noqa: E402
+from pmscan_reader import parse_real_time_data  # noqa: E402
+
+def make_frames(count, warmup_ratio=0.01, seed=42):
+    """
+    Génère un tampon de trames synthétiques.
+
+    Args:
+        count (int): Nombre de trames
+        warmup_ratio (float): Proportion de trames en phase de démarrage (0xFFFF)
+        seed (int): Graine du générateur aléatoire
+
+    Returns:
+        bytes: Tampon de count * 20 bytes
+    """
+    rng = np.random.default_rng(seed)
+    start = int(time.time())
+    buffer = bytearray(count * FRAME_SIZE)
+    for i in range(count):
+        pm = [int(v) for v in rng.integers(0, 1500, size=3)]
+        if rng.random() < warmup_ratio:
+            pm[0] = 0xFFFF
+        struct.pack_into(
+            "<IBBHHHHHHxx", buffer, i * FRAME_SIZE,
+            start + i, 0, 1, int(rng.integers(0, 5000)),
+            pm[0], pm[1], pm[2],
+            int(rng.integers(150, 350)), int(rng.integers(200, 1020)),
+        )
+    return bytes(buffer)
+
+def bench_per_frame(buffer):
+    """Décode le tampon trame par trame avec parse_real_time_data."""
+    results = []
+    # parse_real_time_data affiche un dump hexadécimal par trame
+    with contextlib.redirect_stdout(io.StringIO()):
+        for offset in range(0, len(buffer), FRAME_SIZE):
+            parsed = parse_real_time_data(buffer[offset:offset + FRAME_SIZE])
+            if parsed is not None:
+                results.append(parsed)
+    return results
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    buffer = make_frames(count)
+
+    start = time.perf_counter()
+    reference = bench_per_frame(buffer)
+    per_frame_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frames = decode_frames(buffer)
+    batch_time = time.perf_counter() - start
+
+    if frames_to_dicts(frames) != [parsed._asdict() for parsed in reference]:
+        print("ERREUR: les deux décodeurs ne donnent pas le même résultat")
+        sys.exit(1)
+
+    print(f"Trames: {count} ({len(frames)} valides)")
+    print(f"parse_real_time_data: {per_frame_time:.3f} s ({count / per_frame_time:,.0f} trames/s)")
+    print(f"decode_frames:        {batch_time:.3f} s ({count / batch_time:,.0f} trames/s)")
+    print(f"Accélération: x{per_frame_time / batch_time:.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmark de la publication line protocol (pmscan_publish).
+Envoie des trames synthétiques de plusieurs capteurs vers un serveur HTTP local
+qui imite l'API d'écriture d'InfluxDB, mesure le débit soutenu (trames/s de la
+soumission à l'accusé de réception) et vérifie qu'aucune trame n'est perdue
+quand le serveur est arrêté puis relancé en cours de route (lots en attente
+sur disque, puis renvoyés).
+
+Usage:
+    python benchmarks/bench_publish.py [nombre_de_trames] [nombre_de_capteurs]
+"""
+
+import asyncio
+import gzip
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.append(os.path.join(ROOT, "custom_components", "pmscan"))
+
+from pmscan_export import Exporter  # noqa: E402
+from pmscan_publish import InfluxPublisher  # noqa: E402
+from protocol import Frame  # noqa: E402
+
+# Durée de la coupure du serveur (secondes)
+OUTAGE = 3.0
+
+class StandInServer:
+    """Serveur HTTP local qui compte les lignes reçues, comme l'API d'écriture d'InfluxDB."""
+
+    def __init__(self):
+        self.lines = 0
+        self.requests = 0
+        self.connections = 0
+        self.port = 0
+        self._server = None
+        self._sockets = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1: connexion persistante entre les requêtes
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stand_in._lock:
+                    stand_in.connections += 1
+                    stand_in._sockets.add(self.request)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                with stand_in._lock:
+                    stand_in.lines += body.count(b"\n")
+                    stand_in.requests += 1
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        # Coupe aussi les connexions persistantes en cours
+        with self._lock:
+            for sock in self._sockets:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self._sockets.clear()
+
+def make_rows(count, devices, seed=42):
+    """
+    Génère des trames décodées synthétiques, réparties entre plusieurs capteurs.
+
+    Returns:
+        list: Tuples (adresse, trame décodée)
+    """
+    rng = random.Random(seed)
+    start = int(time.time())
+    addresses = [f"AA:BB:CC:DD:{i // 256:02X}:{i % 256:02X}" for i in range(devices)]
+    return [
+        (addresses[i % devices], Frame(
+            timestamp=start + i // devices,
+            state=0,
+            command=1,
+            particles_count=rng.randrange(5000),
+            pm1_0=rng.randrange(1500) / 10,
+            pm2_5=rng.randrange(1500) / 10,
+            pm10_0=rng.randrange(1500) / 10,
+            temperature=rng.randrange(150, 350) / 10,
+            humidity=rng.randrange(200, 1020) / 10,
+        ))
+        for i in range(count)
+    ]
+
+async def publish(exporter, rows, server, expected, on_progress=None):
+    """Soumet les trames en respectant la file, puis attend leur réception par le serveur."""
+    writer = exporter.writers[0]
+    for index, (address, parsed_data) in enumerate(rows):
+        # Contre-pression: le producteur attend plutôt que de perdre des trames
+        while writer.queue.full():
+            await asyncio.sleep(0.001)
+        exporter.submit(address, parsed_data)
+        if on_progress is not None and index % 1000 == 0:
+            await on_progress(index)
+    while server.lines < expected:
+        await asyncio.sleep(0.01)
+
+async def run(count, devices):
+    rows = make_rows(count, devices)
+    server = StandInServer()
+    server.start()
+    url = f"http://127.0.0.1:{server.port}/api/v2/write?org=bench&bucket=pmscan"
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        # Débit soutenu, serveur disponible
+        publisher = InfluxPublisher(url, spool_dir=spool_dir)
+        exporter = Exporter(sinks=[publisher])
+        exporter.start()
+        start = time.perf_counter()
+        await publish(exporter, rows, server, count)
+        elapsed = time.perf_counter() - start
+        await exporter.close()
+        print(f"Trames: {count} ({devices} capteurs)")
+        print(f"Débit soutenu: {count / elapsed:,.0f} trames/s "
+              f"({server.requests} requêtes, {server.connections} connexion(s))")
+
+        # Serveur arrêté pendant OUTAGE secondes au tiers des trames, puis relancé
+        server.lines = 0
+        publisher = InfluxPublisher(url, spool_dir=spool_dir)
+        exporter = Exporter(sinks=[publisher])
+        exporter.start()
+
+        async def outage(index):
+            if index == count // 3 // 1000 * 1000:
+                server.stop()
+                asyncio.get_running_loop().call_later(OUTAGE, server.start)
+            await asyncio.sleep(0)
+
+        start = time.perf_counter()
+        await publish(exporter, rows, server, count, on_progress=outage)
+        elapsed = time.perf_counter() - start
+        await exporter.close()
+        writer = exporter.writers[0]
+        print(f"Avec coupure de {OUTAGE:.0f} s: {count / elapsed:,.0f} trames/s, "
+              f"{publisher.batches_spooled} lots mis en attente, "
+              f"{publisher.batches_replayed} renvoyés, {writer.dropped} trames ignorées")
+        if server.lines != count:
+            print(f"ERREUR: {server.lines} lignes reçues sur {count}")
+            sys.exit(1)
+    server.stop()
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    devices = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    asyncio.run(run(count, devices))
+
+if __name__ == "__main__":
+    main()
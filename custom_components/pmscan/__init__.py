@@ -2,21 +2,49 @@
 from __future__ import annotations
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform
+from homeassistant.const import CONF_ADDRESS, Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .backfill import BackfillState
+from .metrics import DeviceMetrics
 
 DOMAIN = "pmscan"
+# Ordonnanceur des connexions BLE, partagé par toutes les entrées
+DATA_SCHEDULER = f"{DOMAIN}_scheduler"
+# Horloge du capteur à la dernière trame et fin des heures importées, par capteur
+DATA_BACKFILL = f"{DOMAIN}_backfill"
+BACKFILL_STORAGE_KEY = f"{DOMAIN}.backfill"
+BACKFILL_STORAGE_VERSION = 1
+BACKFILL_SAVE_DELAY = 30
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the PMScan component."""
+    backfill_store = Store(hass, BACKFILL_STORAGE_VERSION, BACKFILL_STORAGE_KEY)
+    backfill = BackfillState(
+        await backfill_store.async_load(),
+        on_change=lambda: backfill_store.async_delay_save(backfill.as_dict, BACKFILL_SAVE_DELAY),
+    )
+    hass.data[DATA_BACKFILL] = backfill
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up PMScan from a config entry."""
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {
+        "metrics": DeviceMetrics(entry.data[CONF_ADDRESS]),
+    }
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS) 
\ No newline at end of file
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        hass.data[DOMAIN].pop(entry.entry_id, None)
+    return unload_ok 
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""Air quality indexes computed from PMScan PM2.5 and PM10 measurements.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+import time
+from bisect import bisect_right
+from typing import NamedTuple
+
+# Nombre d'heures prises en compte par le NowCast
+NOWCAST_HOURS = 12
+# Poids minimum du NowCast pour les particules
+NOWCAST_MIN_WEIGHT = 0.5
+
+class Scale:
+    """Breakpoint table of an air quality index.
+
+    levels lists the (label, color) of each level, from best to worst.
+    breakpoints maps a pollutant to the lower concentration bound of each
+    level, optionally followed by the upper bound of the last level. When
+    index_bounds gives the (low, high) index of each level, the index is
+    interpolated linearly within the level (US EPA); otherwise it is the
+    level number, from 1.
+    """
+
+    __slots__ = ("name", "title", "levels", "breakpoints", "index_bounds", "nowcast", "precision")
+
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        levels: tuple[tuple[str, str], ...],
+        breakpoints: dict[str, tuple[float, ...]],
+        index_bounds: tuple[tuple[int, int], ...] | None = None,
+        nowcast: bool = False,
+        precision: dict[str, int] | None = None,
+    ) -> None:
+        """Initialize the scale.
+
+        nowcast tells whether the scale is meant to be applied to NowCast
+        concentrations; precision gives the number of decimals each
+        concentration is truncated to before the lookup.
+        """
+        self.name = name
+        self.title = title
+        self.levels = levels
+        self.breakpoints = breakpoints
+        self.index_bounds = index_bounds
+        self.nowcast = nowcast
+        self.precision = precision or {}
+
+    def evaluate(self, concentrations: dict[str, float]) -> AirQuality:
+        """Return the air quality of the worst pollutant."""
+        worst = None
+        for pollutant, lows in self.breakpoints.items():
+            concentration = concentrations.get(pollutant)
+            if concentration is None:
+                continue
+            decimals = self.precision.get(pollutant)
+            concentration = _truncate(max(concentration, 0.0), decimals)
+            level = min(bisect_right(lows, concentration) - 1, len(self.levels) - 1)
+            index = self._index(lows, level, concentration, decimals)
+            if worst is None or index > worst[0]:
+                worst = (index, level, pollutant, concentration)
+        if worst is None:
+            raise ValueError("Aucune concentration pour l'indice " + self.name)
+        index, level, pollutant, concentration = worst
+        label, color = self.levels[level]
+        return AirQuality(self.name, level, label, color, index, pollutant, concentration)
+
+    def _index(
+        self, lows: tuple[float, ...], level: int, concentration: float, decimals: int | None
+    ) -> int:
+        bounds = self.index_bounds
+        if bounds is None:
+            return level + 1
+        index_low, index_high = bounds[level]
+        if level + 1 >= len(lows):
+            return index_high
+        # Borne haute du niveau: borne basse du suivant moins un pas de précision
+        low = lows[level]
+        high = lows[level + 1] - (10 ** -decimals if decimals is not None else 0)
+        if concentration >= high:
+            return index_high
+        return round(index_low + (index_high - index_low) * (concentration - low) / (high - low))
+
+class AirQuality(NamedTuple):
+    """Air quality of a set of concentrations on one scale."""
+
+    scale: str
+    level: int
+    label: str
+    color: str
+    index: int
+    pollutant: str
+    concentration: float
+
+# Échelle de la LED du PMScan (PM10 seul)
+LED_SCALE = Scale(
+    "led",
+    "LED",
+    (
+        ("EXCELLENTE", "Verte"),
+        ("BONNE", "Jaune"),
+        ("MOYENNE", "Orange"),
+        ("MAUVAISE", "Rouge"),
+        ("TRÈS MAUVAISE", "Violette"),
+    ),
+    {"pm10": (0, 10, 30, 50, 80)},
+)
+
+# Indice européen de la qualité de l'air (AEE), concentrations horaires
+EAQI_SCALE = Scale(
+    "eaqi",
+    "EAQI",
+    (
+        ("Bon", "Cyan"),
+        ("Moyen", "Verte"),
+        ("Dégradé", "Jaune"),
+        ("Mauvais", "Rouge"),
+        ("Très mauvais", "Bordeaux"),
+        ("Extrêmement mauvais", "Violette"),
+    ),
+    {
+        "pm2_5": (0, 10, 20, 25, 50, 75),
+        "pm10": (0, 20, 40, 50, 100, 150),
+    },
+)
+
+# Indice US EPA (révision 2024), appliqué au NowCast
+US_EPA_SCALE = Scale(
+    "us_epa",
+    "AQI US",
+    (
+        ("Bon", "Verte"),
+        ("Modéré", "Jaune"),
+        ("Mauvais (sensibles)", "Orange"),
+        ("Mauvais", "Rouge"),
+        ("Très mauvais", "Violette"),
+        ("Dangereux", "Bordeaux"),
+    ),
+    {
+        "pm2_5": (0.0, 9.1, 35.5, 55.5, 125.5, 225.5, 325.5),
+        "pm10": (0, 55, 155, 255, 355, 425, 605),
+    },
+    index_bounds=((0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 500)),
+    nowcast=True,
+    precision={"pm2_5": 1, "pm10": 0},
+)
+
+SCALES = {scale.name: scale for scale in (LED_SCALE, EAQI_SCALE, US_EPA_SCALE)}
+DEFAULT_SCALE = LED_SCALE.name
+
+class NowCast:
+    """US EPA NowCast of one pollutant, over the last NOWCAST_HOURS hours.
+
+    Values are accumulated in a ring of hourly sums and counts, so adding a
+    value is O(1). The averages of the completed hours are computed once per
+    hour; computing the NowCast then only averages the current hour and
+    weights NOWCAST_HOURS values.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty NowCast."""
+        self._sums = [0.0] * NOWCAST_HOURS
+        self._counts = [0] * NOWCAST_HOURS
+        self._hour = -1
+        # Moyennes des heures écoulées, de la plus récente à la plus ancienne
+        self._past: list[float | None] = [None] * (NOWCAST_HOURS - 1)
+
+    def add(self, value: float, now: float | None = None) -> None:
+        """Add a concentration measured at now (time.time() by default)."""
+        hour = self._advance(now)
+        self._sums[hour % NOWCAST_HOURS] += value
+        self._counts[hour % NOWCAST_HOURS] += 1
+
+    def value(self, now: float | None = None) -> float | None:
+        """Return the NowCast concentration, None without data.
+
+        The NowCast needs two of the three most recent hours; until then
+        the mean of the most recent hour is returned.
+        """
+        hour = self._advance(now)
+        count = self._counts[hour % NOWCAST_HOURS]
+        averages = [self._sums[hour % NOWCAST_HOURS] / count if count else None, *self._past]
+        recent = [average for average in averages[:3] if average is not None]
+        if not recent:
+            return None
+        if len(recent) < 2:
+            return recent[0]
+
+        available = [average for average in averages if average is not None]
+        highest = max(available)
+        weight = max(min(available) / highest, NOWCAST_MIN_WEIGHT) if highest else 1.0
+        total = weights = 0.0
+        factor = 1.0
+        for average in averages:
+            if average is not None:
+                total += factor * average
+                weights += factor
+            factor *= weight
+        return total / weights
+
+    def _advance(self, now: float | None) -> int:
+        """Clear the hours that left the window and return the current hour."""
+        if now is None:
+            now = time.time()
+        hour = int(now // 3600)
+        if hour > self._hour:
+            for expired in range(max(self._hour + 1, hour - NOWCAST_HOURS + 1), hour + 1):
+                self._sums[expired % NOWCAST_HOURS] = 0.0
+                self._counts[expired % NOWCAST_HOURS] = 0
+            self._hour = hour
+            self._past = [
+                self._sums[index] / self._counts[index] if self._counts[index] else None
+                for index in ((hour - age) % NOWCAST_HOURS for age in range(1, NOWCAST_HOURS))
+            ]
+        return self._hour
+
+class AirQualityEngine:
+    """Air quality of one device, evaluated once per frame.
+
+    The result of the last frame is kept in current, so that readers (entity
+    state and attributes, display) do not evaluate the scale again.
+    """
+
+    def __init__(self, scale: str = DEFAULT_SCALE, nowcast: bool | None = None) -> None:
+        """Initialize the engine.
+
+        nowcast defaults to the recommendation of the scale.
+        """
+        self.scale = SCALES[scale]
+        if nowcast is None:
+            nowcast = self.scale.nowcast
+        self._nowcasts = {pollutant: NowCast() for pollutant in self.scale.breakpoints} if nowcast else None
+        self.current: AirQuality | None = None
+
+    def update(
+        self, pm2_5: float | None, pm10: float | None, now: float | None = None
+    ) -> AirQuality:
+        """Evaluate the air quality of a new frame and return it."""
+        concentrations = {"pm2_5": pm2_5, "pm10": pm10}
+        if self._nowcasts is not None:
+            if now is None:
+                now = time.time()
+            for pollutant, nowcast in self._nowcasts.items():
+                if concentrations[pollutant] is not None:
+                    nowcast.add(concentrations[pollutant], now)
+                concentrations[pollutant] = nowcast.value(now)
+        self.current = self.scale.evaluate(concentrations)
+        return self.current
+
+def describe(air_quality: AirQuality) -> str:
+    """Return a short description such as "BONNE (LED Jaune)" or "Modéré (AQI US 57)"."""
+    scale = SCALES[air_quality.scale]
+    detail = air_quality.color if scale is LED_SCALE else air_quality.index
+    return f"{air_quality.label} ({scale.title} {detail})"
+
+def _truncate(value: float, decimals: int | None) -> float:
+    """Truncate a concentration to a number of decimals (None: unchanged)."""
+    if decimals is None:
+        return value
+    factor = 10 ** decimals
+    return int(value * factor) / factor
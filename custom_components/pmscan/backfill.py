@@ -0,0 +1,135 @@
+"""Backfill of PMScan outages from the on-device memory.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, NamedTuple
+
+try:
+    from .protocol import FRAME, PM_WARMUP_VALUE
+except ImportError:
+    # Module chargé hors du paquet (lecteur en ligne de commande)
+    from protocol import FRAME, PM_WARMUP_VALUE
+
+HOUR = 3600
+
+# Mesures reconstituées: clé de la trame -> (champ de l'enregistrement, diviseur)
+BACKFILL_KEYS = {
+    "particles_count": (3, 1),
+    "pm1_0": (4, 10),
+    "pm2_5": (5, 10),
+    "pm10_0": (6, 10),
+    "temperature": (7, 10),
+    "humidity": (8, 10),
+}
+
+class HourlyStatistics(NamedTuple):
+    """Mean, minimum and maximum of one measurement over one hour."""
+
+    start: int
+    mean: float
+    min: float
+    max: float
+    count: int
+
+def hourly_statistics(
+    memory: bytes, start: int, end: int
+) -> dict[str, list[HourlyStatistics]]:
+    """Aggregate memory records into hourly statistics.
+
+    Only the records of the hours between start and end (hour-aligned device
+    timestamps, end excluded) are used; records of the warm-up phase (0xFFFF)
+    and empty memory (all 0xFF) are skipped. Returns the statistics of each
+    key of BACKFILL_KEYS, by increasing hour, for the hours that have records.
+    """
+    # Par heure: [effectif, puis somme, minimum, maximum de chaque mesure]
+    hours: dict[int, list[Any]] = {}
+    fields = tuple(BACKFILL_KEYS.values())
+    with memoryview(memory) as view:
+        for values in FRAME.iter_unpack(view[:len(view) - len(view) % FRAME.size]):
+            timestamp = values[0]
+            if not start <= timestamp < end or PM_WARMUP_VALUE in values[4:7]:
+                continue
+            hour = timestamp - timestamp % HOUR
+            accumulator = hours.get(hour)
+            if accumulator is None:
+                accumulator = hours[hour] = [0] + [[0.0, float("inf"), float("-inf")] for _ in fields]
+            accumulator[0] += 1
+            for (field, divisor), stats in zip(fields, accumulator[1:]):
+                value = values[field] / divisor
+                stats[0] += value
+                if value < stats[1]:
+                    stats[1] = value
+                if value > stats[2]:
+                    stats[2] = value
+
+    statistics: dict[str, list[HourlyStatistics]] = {key: [] for key in BACKFILL_KEYS}
+    for hour in sorted(hours):
+        count, *per_key = hours[hour]
+        for key, (total, minimum, maximum) in zip(BACKFILL_KEYS, per_key):
+            statistics[key].append(
+                HourlyStatistics(hour, round(total / count, 2), minimum, maximum, count)
+            )
+    return statistics
+
+class BackfillState:
+    """Device times seen and imported, by address.
+
+    last_seen is the device time of the last frame received before a
+    disconnection; high_water_mark is the end of the last hour imported, so
+    that no hour is imported twice. The content is a plain dict so that it
+    can be persisted as JSON: {address: {"last_seen": t, "high_water_mark": t}}.
+    on_change is called whenever the content changes, to schedule a save.
+    """
+
+    def __init__(
+        self,
+        data: dict[str, Any] | None = None,
+        on_change: Callable[[], None] | None = None,
+    ) -> None:
+        """Initialize the state from persisted data."""
+        self._devices: dict[str, dict[str, int]] = dict(data or {})
+        self._on_change = on_change
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the content to persist."""
+        return self._devices
+
+    def last_seen(self, address: str) -> int | None:
+        """Return the device time of the last frame seen before a disconnection."""
+        return self._devices.get(address, {}).get("last_seen")
+
+    def seen(self, address: str, device_time: int) -> None:
+        """Record the device time of the last frame seen on a connection."""
+        self._set(address, "last_seen", device_time)
+
+    def gap(self, address: str, current: int) -> tuple[int, int] | None:
+        """Return the hours missed before a frame, None if there are none.
+
+        current is the device time of the first frame after an outage, which
+        started at last_seen. Only the hours entirely within the outage, and
+        after the high-water mark, are returned as a (start, end) pair of
+        hour-aligned device times.
+        """
+        previous = self.last_seen(address)
+        if previous is None:
+            return None
+        start = -(-previous // HOUR) * HOUR
+        high_water_mark = self._devices.get(address, {}).get("high_water_mark")
+        if high_water_mark is not None:
+            start = max(start, high_water_mark)
+        end = current - current % HOUR
+        return (start, end) if end > start else None
+
+    def imported(self, address: str, end: int) -> None:
+        """Move the high-water mark to the end of the imported hours."""
+        self._set(address, "high_water_mark", end)
+
+    def _set(self, address: str, key: str, value: int) -> None:
+        device = self._devices.setdefault(address, {})
+        if device.get(key) != value:
+            device[key] = value
+            if self._on_change is not None:
+                self._on_change()
@@ -20,8 +20,23 @@ from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv
 
 from . import DOMAIN
+from .protocol import PMSCAN_SERVICE_UUID
+from .scheduler import DEFAULT_ADAPTER_SLOTS, MAX_ADAPTER_SLOTS
 from .sensor import (
+    AQI_SCALES,
+    DEFAULT_AQI_SCALE,
+    DEFAULT_BACKFILL,
+    DEFAULT_COALESCE_WRITES,
+    DEFAULT_DEADBANDS,
+    DEFAULT_DIAGNOSTIC_SENSORS,
+    DEFAULT_FRAMES_PER_CYCLE,
     DEFAULT_MEASUREMENT_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_PASSIVE,
+    DEFAULT_PULL_MEMORY,
+    DEFAULT_WINDOW_SENSORS,
+    MAX_FRAMES_PER_CYCLE,
+    MAX_MIN_WRITE_INTERVAL,
     MIN_MEASUREMENT_INTERVAL,
     MAX_MEASUREMENT_INTERVAL,
 )
@@ -30,9 +45,17 @@ _LOGGER = logging.getLogger(__name__)
 
 CONF_MEASUREMENT_INTERVAL = "measurement_interval"
 CONF_KEEP_CONNECTION = "keep_connection"
+CONF_BACKFILL = "backfill"
+CONF_PASSIVE = "passive"
+CONF_FRAMES_PER_CYCLE = "frames_per_cycle"
+CONF_PULL_MEMORY = "pull_memory"
+CONF_ADAPTER_SLOTS = "adapter_slots"
+CONF_MIN_WRITE_INTERVAL = "min_write_interval"
+CONF_COALESCE_WRITES = "coalesce_writes"
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+CONF_WINDOW_SENSORS = "window_sensors"
+CONF_AQI_SCALE = "aqi_scale"
 
-# UUID du service PMScan
-PMSCAN_SERVICE_UUID = "f3641900-00b0-4240-ba50-05ca45bf8abc"
 # Nom partiel pour identifier un PMScan
 PMSCAN_NAME_PREFIX = "PMScan"
 
@@ -64,7 +87,79 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 CONF_KEEP_CONNECTION,
                 default=self.config_entry.options.get(CONF_KEEP_CONNECTION, True),
             ): bool,
+            vol.Optional(
+                CONF_BACKFILL,
+                default=self.config_entry.options.get(CONF_BACKFILL, DEFAULT_BACKFILL),
+            ): bool,
+            vol.Optional(
+                CONF_PASSIVE,
+                default=self.config_entry.options.get(CONF_PASSIVE, DEFAULT_PASSIVE),
+            ): bool,
+            vol.Optional(
+                CONF_FRAMES_PER_CYCLE,
+                default=self.config_entry.options.get(
+                    CONF_FRAMES_PER_CYCLE, DEFAULT_FRAMES_PER_CYCLE
+                ),
+            ): vol.All(
+                vol.Coerce(int),
+                vol.Range(min=1, max=MAX_FRAMES_PER_CYCLE),
+            ),
+            vol.Optional(
+                CONF_PULL_MEMORY,
+                default=self.config_entry.options.get(CONF_PULL_MEMORY, DEFAULT_PULL_MEMORY),
+            ): bool,
+            vol.Optional(
+                CONF_ADAPTER_SLOTS,
+                default=self.config_entry.options.get(CONF_ADAPTER_SLOTS, DEFAULT_ADAPTER_SLOTS),
+            ): vol.All(
+                vol.Coerce(int),
+                vol.Range(min=1, max=MAX_ADAPTER_SLOTS),
+            ),
+            vol.Optional(
+                CONF_MIN_WRITE_INTERVAL,
+                default=self.config_entry.options.get(
+                    CONF_MIN_WRITE_INTERVAL, DEFAULT_MIN_WRITE_INTERVAL
+                ),
+            ): vol.All(
+                vol.Coerce(int),
+                vol.Range(min=0, max=MAX_MIN_WRITE_INTERVAL),
+            ),
+            vol.Optional(
+                CONF_COALESCE_WRITES,
+                default=self.config_entry.options.get(
+                    CONF_COALESCE_WRITES, DEFAULT_COALESCE_WRITES
+                ),
+            ): bool,
         }
+        # Bandes mortes par type de mesure
+        for option, default in DEFAULT_DEADBANDS.items():
+            options[
+                vol.Optional(
+                    option, default=self.config_entry.options.get(option, default)
+                )
+            ] = vol.All(vol.Coerce(float), vol.Range(min=0))
+        options[
+            vol.Optional(
+                CONF_DIAGNOSTIC_SENSORS,
+                default=self.config_entry.options.get(
+                    CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS
+                ),
+            )
+        ] = bool
+        options[
+            vol.Optional(
+                CONF_WINDOW_SENSORS,
+                default=self.config_entry.options.get(
+                    CONF_WINDOW_SENSORS, DEFAULT_WINDOW_SENSORS
+                ),
+            )
+        ] = bool
+        options[
+            vol.Optional(
+                CONF_AQI_SCALE,
+                default=self.config_entry.options.get(CONF_AQI_SCALE, DEFAULT_AQI_SCALE),
+            )
+        ] = vol.In(AQI_SCALES)
 
         return self.async_show_form(
             step_id="init",
@@ -0,0 +1,30 @@
+"""Diagnostics support for PMScan."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_ADDRESS
+from homeassistant.core import HomeAssistant
+
+from . import DOMAIN
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data = hass.data.get(DOMAIN, {}).get(entry.entry_id, {})
+    metrics = data.get("metrics")
+    sensors = data.get("sensors", [])
+    return {
+        "address": entry.data.get(CONF_ADDRESS),
+        "options": dict(entry.options),
+        "metrics": metrics.as_dict() if metrics is not None else None,
+        "state_writes": {
+            sensor.unique_id: {
+                "written": sensor.writes_total,
+                "suppressed": sensor.writes_suppressed,
+            }
+            for sensor in sensors
+        },
+    }
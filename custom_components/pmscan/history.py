@@ -0,0 +1,124 @@
+"""Fixed-capacity in-memory history of decoded PMScan frames.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+
+try:
+    from .protocol import FRAME_KEYS, Frame
+except ImportError:
+    # Module chargé hors du paquet (lecteur en ligne de commande)
+    from protocol import FRAME_KEYS, Frame
+
+# Colonnes de l'historique: type de l'array et facteur d'échelle de chaque champ.
+# Les mesures sont conservées comme dans la trame (entiers en dixièmes), soit
+# 18 bytes par trame et par copie.
+COLUMNS = {
+    "timestamp": ("I", 1),
+    "state": ("B", 1),
+    "command": ("B", 1),
+    "particles_count": ("H", 1),
+    "pm1_0": ("H", 10),
+    "pm2_5": ("H", 10),
+    "pm10_0": ("H", 10),
+    "temperature": ("H", 10),
+    "humidity": ("H", 10),
+}
+
+def history_capacity(hours: float, interval: float = 1.0) -> int:
+    """Return the number of frames received in hours at one frame every interval seconds."""
+    return max(1, int(hours * 3600 / interval))
+
+class FrameHistory:
+    """The last capacity frames of a device, in one array per field.
+
+    Each value is written twice, at its ring position and capacity further,
+    so that the last n frames always form one contiguous slice of every
+    column: appending costs O(1) and view() returns a memoryview of that
+    slice without copying (usable as is by numpy.asarray). One day at one
+    frame per second takes about 3 MB.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize an empty history of capacity frames."""
+        self.capacity = capacity
+        self._columns = {
+            key: array(typecode, [0]) * (2 * capacity)
+            for key, (typecode, _scale) in COLUMNS.items()
+        }
+        # Colonne et facteur d'échelle de chaque champ, dans l'ordre de Frame
+        self._routes = tuple((self._columns[key], COLUMNS[key][1]) for key in FRAME_KEYS)
+        self._next = 0
+        self._length = 0
+
+    def __len__(self) -> int:
+        """Return the number of frames in the history."""
+        return self._length
+
+    @property
+    def nbytes(self) -> int:
+        """Return the memory used by the columns, in bytes."""
+        return sum(column.itemsize * len(column) for column in self._columns.values())
+
+    def append(self, frame: Frame) -> None:
+        """Add a frame, replacing the oldest one when the history is full."""
+        index = self._next
+        mirror = index + self.capacity
+        for (column, scale), value in zip(self._routes, frame):
+            if scale != 1:
+                value = round(value * scale)
+            column[index] = column[mirror] = value
+        self._next = index + 1 if index + 1 < self.capacity else 0
+        if self._length < self.capacity:
+            self._length += 1
+
+    def clear(self) -> None:
+        """Forget all frames (the memory stays allocated)."""
+        self._next = 0
+        self._length = 0
+
+    def view(self, key: str, count: int | None = None) -> memoryview:
+        """Return the raw values of a field for the last count frames, oldest first.
+
+        The values are those of the frame: tenths for the fields scaled by
+        10 in COLUMNS. The view shares the memory of the history and is only
+        valid until the next append.
+        """
+        start, end = self._bounds(count)
+        return memoryview(self._columns[key])[start:end]
+
+    def values(self, key: str, count: int | None = None) -> list[float]:
+        """Return the values of a field for the last count frames, in physical units."""
+        scale = COLUMNS[key][1]
+        view = self.view(key, count)
+        if scale == 1:
+            return view.tolist()
+        return [value / scale for value in view]
+
+    def since(self, device_time: int) -> int:
+        """Return the number of frames whose device time is device_time or later."""
+        timestamps = self.view("timestamp")
+        return len(timestamps) - bisect_left(timestamps, device_time)
+
+    def frame(self, index: int) -> Frame:
+        """Return a frame of the history, oldest first (negative indexes from the newest)."""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("history index out of range")
+        start, _end = self._bounds(None)
+        return Frame(*(
+            column[start + index] / scale if scale != 1 else column[start + index]
+            for column, scale in self._routes
+        ))
+
+    def _bounds(self, count: int | None) -> tuple[int, int]:
+        """Return the slice of the columns holding the last count frames."""
+        if count is None or count > self._length:
+            count = self._length
+        end = self._next + self.capacity
+        return end - max(count, 0), end
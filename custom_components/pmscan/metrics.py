@@ -0,0 +1,314 @@
+"""Low-overhead hot-path metrics for PMScan devices.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any
+
+# Étapes mesurées sur le chemin notification -> état, puis mise en place d'une
+# connexion (de la connexion établie aux notifications actives) et délai entre la
+# connexion établie et la première trame valide
+STAGES = ("callback", "decode", "dispatch", "state_write", "setup", "first_frame")
+
+# Nombre de seaux de l'histogramme: le seau i compte les durées < 2^i ns
+HISTOGRAM_BUCKETS = 40
+
+# Horloge du capteur: durée d'une fenêtre de l'estimation du décalage (secondes) et
+# nombre de fenêtres conservées pour l'estimation de la dérive
+CLOCK_WINDOW = 600
+CLOCK_WINDOWS = 12
+# Trames nécessaires avant de juger le décalage, et écart au-delà duquel l'horloge
+# du capteur est remise à l'heure (secondes; l'horodatage est à la seconde près)
+CLOCK_MIN_FRAMES = 5
+CLOCK_SYNC_THRESHOLD = 2.0
+
+class LatencyHistogram:
+    """Latency histogram with power-of-two nanosecond buckets."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, duration_ns: int) -> None:
+        """Record one duration in nanoseconds."""
+        self.counts[min(duration_ns.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration_ns
+        if duration_ns > self.max:
+            self.max = duration_ns
+
+    def percentile(self, fraction: float) -> int:
+        """Return an upper bound of the given percentile in nanoseconds."""
+        if not self.count:
+            return 0
+        target = fraction * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(1 << bucket, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary in microseconds."""
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count / 1000, 1) if self.count else 0.0,
+            "p50_us": round(self.percentile(0.50) / 1000, 1),
+            "p95_us": round(self.percentile(0.95) / 1000, 1),
+            "p99_us": round(self.percentile(0.99) / 1000, 1),
+            "max_us": round(self.max / 1000, 1),
+        }
+
+class DeliveryTracker:
+    """Dropped frames and delivery latency, from the device timestamps.
+
+    Each frame carries the device time (whole seconds). The host time minus
+    the device time is the clock offset plus the delivery latency; its
+    minimum over the current and previous CLOCK_WINDOW is taken as the
+    offset, so the latency of a frame is measured above the fastest recent
+    delivery. The minima of the last CLOCK_WINDOWS windows give the drift.
+
+    Missing frames are counted from the device times against the
+    acquisition interval (the smallest gap seen when interval is None),
+    from the second frame of each connection: the first one may still follow
+    the interval of the previous acquisition.
+    """
+
+    def __init__(self, interval: float | None = None) -> None:
+        """Initialize the tracker."""
+        self.interval = interval
+        self.frames = 0
+        self.frames_missed = 0
+        self.frames_out_of_order = 0
+        self.syncs = 0
+        self.latency = LatencyHistogram()
+        self._gap: int | None = None
+        self._window_start = 0.0
+        self._window_min: float | None = None
+        self._previous_min: float | None = None
+        self._minima: deque[tuple[float, float]] = deque(maxlen=CLOCK_WINDOWS)
+        self._clock_frames = 0
+        self.restart()
+
+    def restart(self) -> None:
+        """Start a new sequence of frames (new connection, clock set)."""
+        self._first_time: int | None = None
+        self._last_time: int | None = None
+        self._sequence_frames = 0
+        self._sequence_missed = 0
+
+    def observe(self, device_time: int, now: float | None = None) -> None:
+        """Record a frame of the given device time received at now (time.time())."""
+        if now is None:
+            now = time.time()
+        last_time = self._last_time
+        if last_time is not None and device_time <= last_time:
+            self.frames_out_of_order += 1
+            return
+        self.frames += 1
+        self._count_missed(device_time)
+
+        apparent = now - device_time
+        if now - self._window_start >= CLOCK_WINDOW or self._window_min is None:
+            if self._window_min is not None:
+                self._minima.append((self._window_start, self._window_min))
+            self._previous_min = self._window_min
+            self._window_start = now
+            self._window_min = apparent
+        elif apparent < self._window_min:
+            self._window_min = apparent
+        self._clock_frames += 1
+        self.latency.record(int((apparent - self.offset) * 1e9))
+
+    def _count_missed(self, device_time: int) -> None:
+        """Update the missing frames of the sequence with a new frame."""
+        last_time = self._last_time
+        self._last_time = device_time
+        if last_time is None:
+            # Première trame de la connexion: elle peut suivre l'intervalle précédent
+            return
+        if self._first_time is None:
+            self._first_time = device_time
+            self._sequence_frames = 1
+            return
+        self._sequence_frames += 1
+        if self.interval is None:
+            gap = device_time - last_time
+            if self._gap is None or gap < self._gap:
+                # Intervalle plus court: le décompte repart de cette trame
+                self._gap = gap
+                self._first_time = last_time
+                self._sequence_frames = 2
+                self._sequence_missed = 0
+                return
+        interval = self.interval or self._gap
+        # Trames attendues depuis le début de la séquence: insensible à la gigue
+        expected = round((device_time - self._first_time) / interval) + 1
+        missed = expected - self._sequence_frames
+        if missed > self._sequence_missed:
+            self.frames_missed += missed - self._sequence_missed
+            self._sequence_missed = missed
+
+    @property
+    def offset(self) -> float:
+        """Return the host time minus the device time, in seconds (0 without frames)."""
+        if self._window_min is None:
+            return 0.0
+        if self._previous_min is None:
+            return self._window_min
+        return min(self._window_min, self._previous_min)
+
+    @property
+    def drift(self) -> float | None:
+        """Return the drift of the device clock in ppm, None before two windows.
+
+        The drift is positive when the device clock runs fast.
+        """
+        points = list(self._minima)
+        if self._window_min is not None:
+            points.append((self._window_start, self._window_min))
+        if len(points) < 2:
+            return None
+        (first_time, first_min), (last_time, last_min) = points[0], points[-1]
+        # Décalage croissant: l'horloge du capteur retarde
+        return (first_min - last_min) / (last_time - first_time) * 1e6
+
+    @property
+    def drop_rate(self) -> float:
+        """Return the fraction of the expected frames that were missed."""
+        expected = self.frames + self.frames_missed
+        return self.frames_missed / expected if expected else 0.0
+
+    def needs_sync(self, threshold: float = CLOCK_SYNC_THRESHOLD) -> bool:
+        """Return True when the device clock is off by more than threshold seconds."""
+        return self._clock_frames >= CLOCK_MIN_FRAMES and abs(self.offset) > threshold
+
+    def synced(self) -> None:
+        """Forget the clock estimates after the device clock was set."""
+        self.syncs += 1
+        self._window_min = self._previous_min = None
+        self._minima.clear()
+        self._clock_frames = 0
+        self.restart()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the drop counters, clock estimates and latency summary."""
+        drift = self.drift
+        return {
+            "frames": self.frames,
+            "frames_missed": self.frames_missed,
+            "frames_out_of_order": self.frames_out_of_order,
+            "drop_rate": round(self.drop_rate, 4),
+            "clock_offset_s": round(self.offset, 3),
+            "clock_drift_ppm": round(drift, 1) if drift is not None else None,
+            "clock_syncs": self.syncs,
+            "latency": self.latency.as_dict(),
+        }
+
+class DeviceMetrics:
+    """Counters and latency histograms of one PMScan device."""
+
+    def __init__(self, address: str | None = None) -> None:
+        """Initialize the metrics."""
+        self.address = address
+        self.frames_received = 0
+        self.frames_rejected_length = 0
+        self.frames_rejected_warmup = 0
+        self.connections = 0
+        # Connexions planifiées du mode cyclique
+        self.cycles = 0
+        # Annonces BLE reçues, et annonces dont la trame a été décodée (les répétitions
+        # d'une même trame ne sont décodées qu'une fois)
+        self.advertisements = 0
+        self.advertisements_decoded = 0
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        # Trames perdues et latence de livraison, d'après l'horloge du capteur
+        self.delivery = DeliveryTracker()
+        self._connected_at: float | None = None
+        self._connected_total = 0.0
+        self._connected_ns = 0
+        # Vrai tant que la première trame valide de la connexion n'est pas arrivée
+        self.awaiting_first_frame = False
+
+    def record(self, stage: str, duration_ns: int) -> None:
+        """Record the duration of a hot-path stage."""
+        self.histograms[stage].record(duration_ns)
+
+    def connected(self, scheduled: bool = False) -> None:
+        """Mark the start of a connection.
+
+        A scheduled connection (duty cycle) is counted as a cycle, not as a
+        connection, so that it does not show up as a reconnect.
+        """
+        if scheduled:
+            self.cycles += 1
+        else:
+            self.connections += 1
+        self._connected_at = time.monotonic()
+        self._connected_ns = time.perf_counter_ns()
+        self.awaiting_first_frame = True
+        self.delivery.restart()
+
+    def first_frame(self) -> None:
+        """Record the time to first frame of the current connection."""
+        if self.awaiting_first_frame:
+            self.awaiting_first_frame = False
+            self.record("first_frame", time.perf_counter_ns() - self._connected_ns)
+
+    def disconnected(self) -> None:
+        """Mark the end of a connection."""
+        self.awaiting_first_frame = False
+        if self._connected_at is not None:
+            self._connected_total += time.monotonic() - self._connected_at
+            self._connected_at = None
+
+    @property
+    def is_connected(self) -> bool:
+        """Return True while a connection is active."""
+        return self._connected_at is not None
+
+    @property
+    def reconnects(self) -> int:
+        """Return the number of connections after the first one."""
+        return max(0, self.connections - 1)
+
+    @property
+    def frames_rejected(self) -> int:
+        """Return the number of frames rejected by the length or 0xFFFF checks."""
+        return self.frames_rejected_length + self.frames_rejected_warmup
+
+    @property
+    def time_connected(self) -> float:
+        """Return the cumulated connection time in seconds."""
+        total = self._connected_total
+        if self._connected_at is not None:
+            total += time.monotonic() - self._connected_at
+        return total
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all counters and latency summaries."""
+        return {
+            "address": self.address,
+            "frames_received": self.frames_received,
+            "frames_rejected_length": self.frames_rejected_length,
+            "frames_rejected_warmup": self.frames_rejected_warmup,
+            "connections": self.connections,
+            "reconnects": self.reconnects,
+            "cycles": self.cycles,
+            "connected": self.is_connected,
+            "advertisements": self.advertisements,
+            "advertisements_decoded": self.advertisements_decoded,
+            "time_connected_s": round(self.time_connected, 1),
+            "latency": {stage: hist.as_dict() for stage, hist in self.histograms.items()},
+            "delivery": self.delivery.as_dict(),
+        }
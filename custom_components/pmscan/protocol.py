@@ -0,0 +1,136 @@
+"""PMScan BLE protocol: UUIDs, real-time frame layout and decoding.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader and the offline tools can use it as well; it only imports the
+standard library.
+"""
+from __future__ import annotations
+
+import logging
+import struct
+from typing import Callable, NamedTuple
+
+_LOGGER = logging.getLogger(__name__)
+# Sans configuration du logging (lecteur en ligne de commande), rien n'est affiché
+_LOGGER.addHandler(logging.NullHandler())
+
+# UUIDs du service et des caractéristiques: même base que le service, en
+# incrémentant les 2 derniers chiffres de la première partie
+PMSCAN_SERVICE_UUID = "f3641900-00b0-4240-ba50-05ca45bf8abc"
+REAL_TIME_DATA_UUID = "f3641901-00b0-4240-ba50-05ca45bf8abc"  # Données temps réel (20 bytes)
+MEMORY_DATA_UUID = "f3641902-00b0-4240-ba50-05ca45bf8abc"  # Données en mémoire
+TEMP_HUMID_ALERT_UUID = "f3641903-00b0-4240-ba50-05ca45bf8abc"  # Alertes température/humidité
+BATTERY_LEVEL_UUID = "f3641904-00b0-4240-ba50-05ca45bf8abc"  # Niveau batterie (%)
+BATTERY_CHARGING_UUID = "f3641905-00b0-4240-ba50-05ca45bf8abc"  # État de charge (0-3)
+CURRENT_TIME_UUID = "f3641906-00b0-4240-ba50-05ca45bf8abc"  # Configuration horloge (timestamp)
+ACQUISITION_INTERVAL_UUID = "f3641907-00b0-4240-ba50-05ca45bf8abc"  # Intervalle d'acquisition
+POWER_MODE_UUID = "f3641908-00b0-4240-ba50-05ca45bf8abc"  # Mode de fonctionnement
+TEMP_HUMID_THRESHOLD_UUID = "f3641909-00b0-4240-ba50-05ca45bf8abc"  # Seuils température/humidité
+DISPLAY_SETTINGS_UUID = "f364190a-00b0-4240-ba50-05ca45bf8abc"  # Configuration affichage
+BATTERY_HEARTBEAT_UUID = "f364190b-00b0-4240-ba50-05ca45bf8abc"  # Batterie heartbeat
+
+# Trame temps réel (et enregistrement de la mémoire), 20 bytes:
+# - Timestamp (4 bytes): Horodatage Unix
+# - State (1 byte): État du capteur
+# - Command (1 byte): Commande en cours
+# - Particles count (2 bytes): Nombre de particules par ml
+# - PM1.0, PM2.5, PM10.0 (2 bytes chacun): Concentrations en µg/m³ (divisées par 10)
+# - Temperature (2 bytes): Température du PCB en °C (divisée par 10)
+# - Humidity (2 bytes): Humidité en % (divisée par 10)
+# - Reserved (2 bytes): Non utilisé
+FRAME = struct.Struct("<IBBHHHHHHxx")
+FRAME_SIZE = FRAME.size
+# Valeur PM envoyée par le capteur pendant son initialisation
+PM_WARMUP_VALUE = 0xFFFF
+
+# Bornes de vraisemblance: humidité maximum (%) et plage de température du PCB (°C)
+MAX_HUMIDITY = 100.0
+MIN_TEMPERATURE = -40.0
+MAX_TEMPERATURE = 85.0
+
+# États de la charge de la batterie
+BATTERY_NOT_CHARGING = 0
+BATTERY_PRE_CHARGING = 1
+BATTERY_CHARGING = 2
+BATTERY_FULLY_CHARGED = 3
+BATTERY_STATES = {
+    BATTERY_NOT_CHARGING: "Non branché",  # Pas de chargeur connecté
+    BATTERY_PRE_CHARGING: "Pré-charge",  # Phase initiale de charge
+    BATTERY_CHARGING: "En charge",  # Charge normale en cours
+    BATTERY_FULLY_CHARGED: "Chargé",  # Charge complète
+}
+
+class Frame(NamedTuple):
+    """A decoded real-time frame or memory record, in physical units."""
+
+    timestamp: int
+    state: int
+    command: int
+    particles_count: int
+    pm1_0: float
+    pm2_5: float
+    pm10_0: float
+    temperature: float
+    humidity: float
+
+# Champs d'une trame décodée, dans l'ordre de la trame
+FRAME_KEYS = Frame._fields
+# Construction directe du tuple, sans passer par Frame.__new__ (plus lent qu'un dict)
+_new_frame = tuple.__new__
+
+def decode_frame(
+    data: bytes | bytearray | memoryview,
+    offset: int = 0,
+    warn: Callable[..., None] | None = None,
+) -> Frame | None:
+    """Decode the 20-byte frame found at offset in data.
+
+    The frame is unpacked in place, without copying data. Returns None for
+    the warm-up frames (0xFFFF PM values); the humidity is capped at
+    MAX_HUMIDITY. Anomalies are reported to warn, called like a logging
+    method (message, *args); they are logged as warnings by default. The
+    raw frame is only formatted when debug logging is enabled.
+    """
+    timestamp, state, command, particles_count, pm1_0, pm2_5, pm10_0, temperature, humidity = (
+        FRAME.unpack_from(data, offset)
+    )
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "Données brutes: %s",
+            memoryview(data)[offset:offset + FRAME_SIZE].hex(" ").upper(),
+        )
+    if warn is None:
+        warn = _LOGGER.warning
+
+    if pm1_0 == PM_WARMUP_VALUE or pm2_5 == PM_WARMUP_VALUE or pm10_0 == PM_WARMUP_VALUE:
+        warn("Capteur en phase de démarrage, valeurs PM non valides")
+        return None
+
+    humidity_value = humidity / 10.0
+    if humidity_value > MAX_HUMIDITY:
+        warn("Valeur d'humidité anormale détectée: %.1f%%", humidity_value)
+        humidity_value = MAX_HUMIDITY
+    temperature_value = temperature / 10.0
+    if not MIN_TEMPERATURE <= temperature_value <= MAX_TEMPERATURE:
+        warn("Température du PCB interne hors limites: %.1f°C", temperature_value)
+
+    return _new_frame(Frame, (
+        timestamp,
+        state,
+        command,
+        particles_count,
+        pm1_0 / 10.0,
+        pm2_5 / 10.0,
+        pm10_0 / 10.0,
+        temperature_value,
+        humidity_value,
+    ))
+
+def record_timestamp(data: bytes | bytearray | memoryview, offset: int = 0) -> int | None:
+    """Return the timestamp of a frame or memory record, None if its PM values are invalid."""
+    timestamp, _state, _command, _particles, pm1_0, pm2_5, pm10_0, _temperature, _humidity = (
+        FRAME.unpack_from(data, offset)
+    )
+    if pm1_0 == PM_WARMUP_VALUE or pm2_5 == PM_WARMUP_VALUE or pm10_0 == PM_WARMUP_VALUE:
+        return None
+    return timestamp
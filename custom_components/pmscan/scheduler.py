@@ -0,0 +1,209 @@
+"""Integration-wide scheduling of PMScan BLE connections.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+# Nombre de connexions courtes simultanées autorisées par adaptateur ou proxy
+# Bluetooth: par défaut et maximum configurable
+DEFAULT_ADAPTER_SLOTS = 3
+MAX_ADAPTER_SLOTS = 10
+# Délais de reconnexion: initial et maximum (secondes), doublé à chaque échec
+DEFAULT_BASE_DELAY = 10.0
+DEFAULT_MAX_DELAY = 600.0
+# Adaptateur utilisé lorsque la source d'un appareil est inconnue
+DEFAULT_ADAPTER = "default"
+
+class ConnectionScheduler:
+    """Share BLE connection slots between all PMScan devices.
+
+    Each adapter has a budget of simultaneous short connections. A device
+    asks for a slot on the adapter that sees it; when the budget is used up
+    the request is queued, and freed slots go first to the device whose data
+    is the oldest. Failed attempts are retried after an exponential backoff with
+    jitter, tracked per device, so devices do not retry in lockstep.
+
+    Duty-cycled devices also get a phase offset in registration order, so
+    their connection windows are spread over their measurement interval.
+
+    Persistent connections are counted but left out of the budget: they are
+    never queued and do not hold a slot, since they may not drop for days.
+    The budget of an adapter is the largest value set with configure() by
+    the devices that connected through it.
+    """
+
+    def __init__(
+        self,
+        slots_per_adapter: int = DEFAULT_ADAPTER_SLOTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.default_slots = slots_per_adapter
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots: dict[str, int] = {}
+        # Dernier adaptateur utilisé par chaque appareil
+        self._adapters: dict[str, str] = {}
+        self._active: dict[str, int] = {}
+        self._persistent: dict[str, int] = {}
+        self._waiters: dict[str, list[tuple[float, int, str, asyncio.Future]]] = {}
+        self._order = itertools.count()
+        self._failures: dict[str, int] = {}
+        self._members: list[str] = []
+
+    def slots(self, adapter: str) -> int:
+        """Return the number of simultaneous short connections allowed on an adapter."""
+        return max(
+            (
+                self._slots[address]
+                for address, used in self._adapters.items()
+                if used == adapter and address in self._slots
+            ),
+            default=self.default_slots,
+        )
+
+    def configure(self, address: str, slots: int) -> None:
+        """Set the number of connection slots requested by a device for its adapter."""
+        self._slots[address] = slots
+        adapter = self._adapters.get(address)
+        if adapter is not None:
+            self._grant(adapter)
+
+    def forget(self, address: str) -> None:
+        """Remove the slot setting of a device."""
+        self._slots.pop(address, None)
+        self._adapters.pop(address, None)
+
+    def register(self, address: str) -> None:
+        """Add a duty-cycled device to the rotation."""
+        if address not in self._members:
+            self._members.append(address)
+
+    def unregister(self, address: str) -> None:
+        """Remove a duty-cycled device from the rotation."""
+        if address in self._members:
+            self._members.remove(address)
+
+    def phase(self, address: str, interval: float) -> float:
+        """Return the offset of the device windows within the interval."""
+        if address not in self._members:
+            return 0.0
+        return self._members.index(address) * interval / len(self._members)
+
+    def delay_until_window(
+        self, address: str, interval: float, now: float | None = None
+    ) -> float:
+        """Return the number of seconds until the next window of the device."""
+        if now is None:
+            now = time.time()
+        phase = self.phase(address, interval)
+        start = (math.floor((now - phase) / interval) + 1) * interval + phase
+        return start - now
+
+    def failures(self, address: str) -> int:
+        """Return the number of consecutive failures of a device."""
+        return self._failures.get(address, 0)
+
+    def failed(self, address: str) -> float:
+        """Record a failed attempt and return the delay before the next one."""
+        failures = self._failures[address] = self._failures.get(address, 0) + 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (failures - 1))
+        # Gigue: entre la moitié et la totalité du délai
+        return random.uniform(delay / 2, delay)
+
+    def succeeded(self, address: str) -> None:
+        """Reset the backoff of a device after a successful connection."""
+        self._failures.pop(address, None)
+
+    def active(self, adapter: str) -> int:
+        """Return the number of slots in use on an adapter."""
+        return self._active.get(adapter, 0)
+
+    def waiting(self, adapter: str) -> int:
+        """Return the number of queued requests for an adapter."""
+        return len(self._waiters.get(adapter, ()))
+
+    def persistent(self, adapter: str) -> int:
+        """Return the number of slots held by persistent connections on an adapter."""
+        return self._persistent.get(adapter, 0)
+
+    @asynccontextmanager
+    async def connection(
+        self,
+        address: str,
+        adapter: str | None = None,
+        stale_since: float = 0.0,
+        persistent: bool = False,
+    ) -> AsyncIterator[None]:
+        """Hold a connection slot on the adapter for the duration of the block.
+
+        stale_since is the time of the last data of the device (0 if none);
+        the oldest one gets the next free slot. persistent marks a connection
+        kept until it is lost: it is counted but does not wait for a slot.
+        """
+        adapter = adapter or DEFAULT_ADAPTER
+        if self._adapters.get(address) != adapter:
+            previous = self._adapters.get(address)
+            self._adapters[address] = adapter
+            # Le budget de l'ancien adaptateur peut avoir augmenté
+            if previous is not None:
+                self._grant(previous)
+        if persistent:
+            self._persistent[adapter] = self.persistent(adapter) + 1
+            try:
+                yield
+            finally:
+                self._persistent[adapter] = self.persistent(adapter) - 1
+            return
+
+        await self._acquire(adapter, stale_since)
+        try:
+            yield
+        finally:
+            self._release(adapter)
+
+    async def _acquire(self, adapter: str, stale_since: float) -> None:
+        if self.active(adapter) < self.slots(adapter) and not self._waiters.get(adapter):
+            self._active[adapter] = self.active(adapter) + 1
+            return
+
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        request = (stale_since, next(self._order), future)
+        heapq.heappush(self._waiters.setdefault(adapter, []), request)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Créneau attribué juste avant l'annulation: il est rendu
+                self._release(adapter)
+            else:
+                waiters = self._waiters[adapter]
+                # Déjà retirée si _grant l'a dépilée après l'annulation
+                if request in waiters:
+                    waiters.remove(request)
+                    heapq.heapify(waiters)
+            raise
+
+    def _release(self, adapter: str) -> None:
+        self._active[adapter] = self.active(adapter) - 1
+        self._grant(adapter)
+
+    def _grant(self, adapter: str) -> None:
+        waiters = self._waiters.get(adapter)
+        while waiters and self.active(adapter) < self.slots(adapter):
+            future = heapq.heappop(waiters)[2]
+            if future.done():
+                continue
+            self._active[adapter] = self.active(adapter) + 1
+            future.set_result(None)
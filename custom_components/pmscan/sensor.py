@@ -4,8 +4,10 @@ from __future__ import annotations
 import logging
 import asyncio
 import struct
+import time
 from datetime import datetime, timedelta
-from typing import Any
+from functools import partial
+from typing import Any, Callable
 
 from bleak import BleakClient
 from homeassistant.components.bluetooth import (
@@ -14,6 +16,7 @@ from homeassistant.components.bluetooth import (
     async_register_callback,
     BluetoothChange,
     async_ble_device_from_address,
+    async_last_service_info,
 )
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -25,35 +28,46 @@ from homeassistant.const import (
     PERCENTAGE,
     UnitOfTemperature,
     CONCENTRATION_PARTS_PER_MILLION,
+    EntityCategory,
 )
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 from homeassistant.util import dt as dt_util
 
-from . import DOMAIN
+from . import DATA_BACKFILL, DATA_SCHEDULER, DOMAIN
+from .aqi import DEFAULT_SCALE, SCALES, AirQuality, AirQualityEngine
+from .backfill import HOUR, BackfillState, hourly_statistics
+from .metrics import DeviceMetrics
+from .protocol import (
+    BATTERY_CHARGING_UUID,
+    BATTERY_LEVEL_UUID,
+    BATTERY_STATES,
+    CURRENT_TIME_UUID,
+    FRAME_KEYS,
+    FRAME_SIZE,
+    Frame,
+    MEMORY_DATA_UUID,
+    PMSCAN_SERVICE_UUID,
+    REAL_TIME_DATA_UUID,
+    decode_frame,
+    record_timestamp,
+)
+from .scheduler import DEFAULT_ADAPTER_SLOTS, ConnectionScheduler
+from .setup_plan import SetupStep, plan_concurrency, run_plan
+from .windows import WindowedStats
 
 _LOGGER = logging.getLogger(__name__)
 
-# Définition des caractéristiques Bluetooth
-PMSCAN_SERVICE_UUID = "f3641900-00b0-4240-ba50-05ca45bf8abc"
-REAL_TIME_DATA_UUID = "f3641901-00b0-4240-ba50-05ca45bf8abc"
-MEMORY_DATA_UUID = "f3641902-00b0-4240-ba50-05ca45bf8abc"
-TEMP_HUMID_ALERT_UUID = "f3641903-00b0-4240-ba50-05ca45bf8abc"
-BATTERY_LEVEL_UUID = "f3641904-00b0-4240-ba50-05ca45bf8abc"
-BATTERY_CHARGING_UUID = "f3641905-00b0-4240-ba50-05ca45bf8abc"
-CURRENT_TIME_UUID = "f3641906-00b0-4240-ba50-05ca45bf8abc"
-ACQUISITION_INTERVAL_UUID = "f3641907-00b0-4240-ba50-05ca45bf8abc"
-POWER_MODE_UUID = "f3641908-00b0-4240-ba50-05ca45bf8abc"
-TEMP_HUMID_THRESHOLD_UUID = "f3641909-00b0-4240-ba50-05ca45bf8abc"
-DISPLAY_SETTINGS_UUID = "f364190a-00b0-4240-ba50-05ca45bf8abc"
-BATTERY_HEARTBEAT_UUID = "f364190b-00b0-4240-ba50-05ca45bf8abc"
-
-# Constantes pour l'état de charge de la batterie
-BATTERY_NOT_CHARGING = 0
-BATTERY_PRE_CHARGING = 1
-BATTERY_CHARGING = 2
-BATTERY_FULLY_CHARGED = 3
+# Caractéristiques utilisées par l'intégration
+GATT_CHARACTERISTICS = (
+    REAL_TIME_DATA_UUID,
+    MEMORY_DATA_UUID,
+    BATTERY_LEVEL_UUID,
+    BATTERY_CHARGING_UUID,
+    CURRENT_TIME_UUID,
+)
 
 # Intervalle de mesure par défaut en secondes
 DEFAULT_MEASUREMENT_INTERVAL = 5
@@ -61,22 +75,84 @@ DEFAULT_MEASUREMENT_INTERVAL = 5
 MIN_MEASUREMENT_INTERVAL = 1
 MAX_MEASUREMENT_INTERVAL = 3600
 
+# Mode cyclique (keep_connection désactivé): trames valides collectées par cycle
+DEFAULT_FRAMES_PER_CYCLE = 3
+MAX_FRAMES_PER_CYCLE = 60
+# Source des mesures du cycle: trames temps réel ou mémoire du capteur
+DEFAULT_PULL_MEMORY = False
+# Intervalle d'acquisition demandé au capteur pendant un cycle (secondes)
+CYCLE_SAMPLE_INTERVAL = 1
+# Marge ajoutée au délai d'attente des trames d'un cycle (secondes)
+CYCLE_TIMEOUT_MARGIN = 15.0
+# Délai sans notification au-delà duquel la lecture de la mémoire est terminée (secondes)
+MEMORY_IDLE_TIMEOUT = 5.0
+
+# Connexion permanente: après une coupure, les heures manquantes sont lues dans la
+# mémoire du capteur et importées dans les statistiques long terme
+DEFAULT_BACKFILL = False
+
+# Mode passif: les mesures sont lues dans les annonces BLE, sans connexion
+DEFAULT_PASSIVE = False
+# Délai sans trame dans les annonces au-delà duquel le mode passif se replie sur une
+# connexion active à chaque intervalle de mesure (secondes)
+PASSIVE_DATA_TIMEOUT = 120
+
+# Filtrage des écritures d'état: intervalle minimum entre deux écritures (secondes)
+DEFAULT_MIN_WRITE_INTERVAL = 0
+MAX_MIN_WRITE_INTERVAL = 3600
+# Regroupement des écritures: au plus une écriture par intervalle, avec la dernière valeur
+DEFAULT_COALESCE_WRITES = False
+# Bandes mortes par défaut: une valeur n'est écrite que si elle s'écarte de plus
+# de la bande morte de la dernière valeur écrite (0 = toute variation est écrite)
+DEFAULT_DEADBANDS = {
+    "deadband_pm": 0.0,
+    "deadband_particles": 0.0,
+    "deadband_temperature": 0.0,
+    "deadband_humidity": 0.0,
+}
+
+# Capteurs de diagnostic optionnels: (clé, nom, unité, icône)
+DEFAULT_DIAGNOSTIC_SENSORS = False
+DIAGNOSTIC_METRICS = (
+    ("metric_frames_received", "Trames reçues", None, "mdi:counter"),
+    ("metric_frames_rejected", "Trames rejetées", None, "mdi:cancel"),
+    ("metric_reconnects", "Reconnexions", None, "mdi:bluetooth-connect"),
+    ("metric_time_connected", "Temps connecté", "s", "mdi:timer-outline"),
+    ("metric_callback_p95", "Latence notification p95", "µs", "mdi:timer-sand"),
+    ("metric_frames_missed", "Trames perdues", None, "mdi:counter"),
+    ("metric_delivery_p95", "Latence de livraison p95", "s", "mdi:timer-sand"),
+)
+
+# Capteurs de statistiques glissantes optionnels: mesures suivies (clé, nom) et
+# statistiques exposées (statistique, fenêtre, nom); les fenêtres sont celles de
+# windows.DEFAULT_WINDOWS
+DEFAULT_WINDOW_SENSORS = False
+WINDOW_MEASUREMENTS = (
+    ("pm2_5", "PM2.5"),
+    ("pm10_0", "PM10"),
+)
+WINDOW_STATISTICS = (
+    ("mean", "1h", "moyenne 1 h"),
+    ("mean", "8h", "moyenne 8 h"),
+    ("mean", "24h", "moyenne 24 h"),
+    ("max", "24h", "maximum 24 h"),
+    ("p95", "24h", "p95 24 h"),
+)
+
 # Délai maximum entre deux mesures avant de considérer les données comme périmées
 MAX_TIME_BETWEEN_UPDATES = timedelta(seconds=10)
 
-# Constantes pour la gestion des connexions
-MAX_CONNECTION_ATTEMPTS = 3
+# Constantes pour la gestion des connexions (délais de reconnexion: voir scheduler.py)
 CONNECTION_TIMEOUT = 30.0
-RECONNECTION_DELAY = 10
-
-# Seuils de qualité de l'air pour PM10 (en µg/m³)
-AIR_QUALITY_THRESHOLDS = {
-    10: ("EXCELLENTE", "Verte"),     # < 10 µg/m³
-    30: ("BONNE", "Jaune"),          # < 30 µg/m³
-    50: ("MOYENNE", "Orange"),        # < 50 µg/m³
-    80: ("MAUVAISE", "Rouge"),       # < 80 µg/m³
-    float('inf'): ("TRÈS MAUVAISE", "Violette")  # ≥ 80 µg/m³
-}
+# Intervalle de vérification d'une connexion permanente (secondes)
+CHECK_INTERVAL = 60
+
+# Indice de qualité de l'air par défaut (voir aqi.SCALES) et indices disponibles
+DEFAULT_AQI_SCALE = DEFAULT_SCALE
+AQI_SCALES = tuple(SCALES)
+
+# Champs de la trame temps réel (clés renvoyées par protocol.decode_frame)
+FRAME_VALUE_TYPES = FRAME_KEYS
 
 # Log des UUIDs au démarrage
 _LOGGER.debug("UUIDs Bluetooth configurés:")
@@ -86,78 +162,218 @@ _LOGGER.debug("Horloge: %s", CURRENT_TIME_UUID)
 _LOGGER.debug("Niveau batterie: %s", BATTERY_LEVEL_UUID)
 _LOGGER.debug("État charge: %s", BATTERY_CHARGING_UUID)
 
-def parse_notification_data(data: bytearray) -> dict[str, Any]:
-    """Parse notification data from PMScan device."""
-    try:
-        if len(data) != 20:
-            _LOGGER.error("Taille des données invalide: %d bytes (attendu: 20 bytes)", len(data))
-            return {}
+def find_pmscan_service(services: Any) -> Any:
+    """Return the PMScan service of a GATT service collection, or None."""
+    for service in services:
+        if service.uuid.lower() == PMSCAN_SERVICE_UUID.lower():
+            return service
+    return None
+
+def resolve_characteristics(service: Any) -> dict[str, Any]:
+    """Return the characteristics of GATT_CHARACTERISTICS found in the service."""
+    characteristics = {}
+    for uuid in GATT_CHARACTERISTICS:
+        characteristic = service.get_characteristic(uuid)
+        if characteristic is None:
+            raise Exception(f"Caractéristique {uuid} non trouvée")
+        characteristics[uuid] = characteristic
+    return characteristics
+
+class PMScanDispatcher:
+    """Route PMScan notifications to the entities they affect.
+
+    The entity map is built once per config entry and the characteristics are
+    resolved once per connection, so a notification costs one decode plus the
+    updates of the entities bound to the decoded values.
+    """
 
-        _LOGGER.debug("Données brutes: %s", ' '.join(f'{x:02X}' for x in data))
-        
-        # Format des données (20 bytes):
-        # - Timestamp (4 bytes): Horodatage Unix
-        # - State (1 byte): État du capteur
-        # - Command (1 byte): Commande en cours
-        # - Particles count (2 bytes): Nombre de particules par ml
-        # - PM1.0 (2 bytes): Concentration en µg/m³ (divisé par 10)
-        # - PM2.5 (2 bytes): Concentration en µg/m³ (divisé par 10)
-        # - PM10.0 (2 bytes): Concentration en µg/m³ (divisé par 10)
-        # - Temperature (2 bytes): Température en °C (divisé par 10)
-        # - Humidity (2 bytes): Humidité en % (divisé par 10)
-        # - Reserved (2 bytes): Non utilisé
-            
-        timestamp, state, cmd, particles_count, pm1_0, pm2_5, pm10_0, temp, humidity = struct.unpack("<IBBHHHHHHxx", data)
-        
-        # Vérification des valeurs PM pendant le démarrage (0xFFFF = capteur en initialisation)
-        if pm1_0 == 0xFFFF or pm2_5 == 0xFFFF or pm10_0 == 0xFFFF:
-            _LOGGER.warning("Capteur en phase de démarrage, valeurs PM non valides")
-            return {}
-        
-        # Calcul et vérification des valeurs
-        humidity_value = humidity / 10.0
-        if humidity_value > 100:
-            _LOGGER.warning("Valeur d'humidité anormale détectée: %f%%", humidity_value)
-            humidity_value = min(humidity_value, 100)  # Limite à 100%
-        
-        temp_value = temp / 10.0
-        if temp_value < -40 or temp_value > 85:
-            _LOGGER.warning("Température hors limites: %f°C", temp_value)
-            _LOGGER.info("Note: La température est celle du PCB interne, pas de l'environnement")
-        
-        result = {
-            "timestamp": timestamp,
-            "state": state,
-            "command": cmd,
-            "particles_count": particles_count,
-            "pm1_0": pm1_0 / 10.0,
-            "pm2_5": pm2_5 / 10.0,
-            "pm10": pm10_0 / 10.0,
-            "temperature": temp_value,
-            "humidity": humidity_value
+    def __init__(self, sensors: list[PMScanSensor], metrics: DeviceMetrics) -> None:
+        """Initialize the dispatcher."""
+        self.metrics = metrics
+        entities: dict[str, list[PMScanSensor]] = {}
+        for sensor in sensors:
+            entities.setdefault(sensor.value_type, []).append(sensor)
+        self._entities = {value_type: tuple(items) for value_type, items in entities.items()}
+        # Champs de la trame temps réel ayant au moins une entité
+        self._frame_routes = tuple(
+            (value_type, self._entities[value_type])
+            for value_type in FRAME_VALUE_TYPES
+            if value_type in self._entities
+        )
+        self.last_update: datetime | None = None
+        # Horloge du capteur à la dernière trame valide
+        self.last_device_time: int | None = None
+        # Statistiques glissantes alimentées par chaque trame valide (optionnel)
+        self.windows: WindowedStats | None = None
+        # Indice de qualité de l'air, évalué une fois par trame pour ses entités
+        self.air_quality: AirQualityEngine | None = None
+        self._air_quality_sensors = self._entities.get("air_quality", ())
+        # Trames valides reçues (mode cyclique) et tampon de lecture de la mémoire
+        self.frames_dispatched = 0
+        self.frame_event = asyncio.Event()
+        self.memory = bytearray()
+        self.memory_done = False
+        # Distinct de frame_event: les trames temps réel peuvent arriver pendant la lecture
+        self.memory_event = asyncio.Event()
+        # Dernière trame reçue dans une annonce et instant de sa réception (monotonic)
+        self._advertised: bytes | None = None
+        self.last_advertisement: float | None = None
+        # Dernière trame valide publiée depuis une annonce
+        self.last_advertised_update: datetime | None = None
+
+    def resolve(self, characteristics: dict[str, Any]) -> dict[Any, Any]:
+        """Bind the notified characteristics to their handlers.
+
+        characteristics maps UUIDs to the characteristic objects of the
+        current connection. Returns a map from characteristic object to the
+        handler bound to it.
+        """
+        return {
+            characteristics[REAL_TIME_DATA_UUID]: self.handle_real_time,
+            characteristics[BATTERY_LEVEL_UUID]: self.handle_battery_level,
+            characteristics[BATTERY_CHARGING_UUID]: self.handle_battery_charging,
         }
-        
-        _LOGGER.debug("Données analysées: %s", result)
-        return result
-        
-    except Exception as e:
-        _LOGGER.error("Erreur lors de l'analyse des données: %s", str(e))
-        return {}
 
-def get_air_quality_info(pm10_value: float) -> tuple[str, str]:
-    """
-    Détermine la qualité de l'air et la couleur correspondante basée sur la valeur PM10.
-    
-    Args:
-        pm10_value (float): Valeur PM10 en µg/m³
-        
-    Returns:
-        tuple: (qualité, couleur_led)
-    """
-    for threshold, (quality, led_color) in AIR_QUALITY_THRESHOLDS.items():
-        if pm10_value < threshold:
-            return quality, led_color
-    return AIR_QUALITY_THRESHOLDS[float('inf')]
+    def update(self, value_type: str, value: Any) -> None:
+        """Update the entities bound to a single value."""
+        for sensor in self._entities.get(value_type, ()):
+            sensor.update_value(value)
+
+    def handle_real_time(self, sender: Any, data: bytearray) -> None:
+        """Handle a real-time data notification."""
+        metrics = self.metrics
+        start = time.perf_counter_ns()
+        metrics.frames_received += 1
+        if len(data) != FRAME_SIZE:
+            metrics.frames_rejected_length += 1
+            _LOGGER.error("Taille des données invalide: %d bytes (attendu: %d bytes)", len(data), FRAME_SIZE)
+            return
+
+        parsed_data = decode_frame(data)
+        decoded = time.perf_counter_ns()
+        metrics.record("decode", decoded - start)
+        if parsed_data is None:
+            metrics.frames_rejected_warmup += 1
+            return
+
+        if metrics.awaiting_first_frame:
+            metrics.first_frame()
+        if sender is not None:
+            # Trames notifiées uniquement, pas les enregistrements de la mémoire
+            metrics.delivery.observe(parsed_data.timestamp)
+        self.last_update = dt_util.utcnow()
+        self.last_device_time = parsed_data.timestamp
+        self.frames_dispatched += 1
+        self.frame_event.set()
+        self.dispatch_frame(parsed_data)
+        end = time.perf_counter_ns()
+        metrics.record("dispatch", end - decoded)
+        metrics.record("callback", end - start)
+
+    def dispatch_frame(self, parsed_data: Frame) -> None:
+        """Update the entities bound to the values of a decoded frame."""
+        for value_type, sensors in self._frame_routes:
+            value = getattr(parsed_data, value_type)
+            for sensor in sensors:
+                sensor.update_value(value)
+        if self.air_quality is not None and self._air_quality_sensors:
+            air_quality = self.air_quality.update(parsed_data.pm2_5, parsed_data.pm10_0)
+            for sensor in self._air_quality_sensors:
+                sensor.update_value(air_quality)
+        if self.windows is not None:
+            self.windows.add(parsed_data)
+
+    def handle_advertisement(self, service_info: BluetoothServiceInfoBleak) -> None:
+        """Handle an advertisement of the device.
+
+        The real-time frame carried in the manufacturer data is decoded once
+        and dispatched to the entities; repeated advertisements of the same
+        frame only refresh the time of the last advertised data. The frame
+        does not count as received over the connection: last_update and the
+        cycle frame counter only follow the notifications.
+        """
+        metrics = self.metrics
+        metrics.advertisements += 1
+        for data in service_info.manufacturer_data.values():
+            if len(data) != FRAME_SIZE:
+                continue
+            self.last_advertisement = time.monotonic()
+            if data == self._advertised:
+                return
+            self._advertised = bytes(data)
+            metrics.advertisements_decoded += 1
+            parsed_data = decode_frame(data)
+            if parsed_data is not None:
+                self.last_advertised_update = dt_util.utcnow()
+                self.dispatch_frame(parsed_data)
+            return
+
+    def handle_memory(self, sender: Any, data: bytearray) -> None:
+        """Handle a memory data notification."""
+        if not data:
+            self.memory_done = True
+        with memoryview(data) as view:
+            for offset in range(0, len(view), FRAME_SIZE):
+                self.memory += view[offset:offset + FRAME_SIZE]
+        self.memory_event.set()
+
+    def dispatch_latest_record(self) -> bool:
+        """Dispatch the most recent valid record read from the memory.
+
+        Only a record newer than the last dispatched frame is dispatched.
+        Returns True if a record was dispatched.
+        """
+        memory = self.memory
+        latest = None
+        latest_timestamp = -1 if self.last_device_time is None else self.last_device_time
+        for offset in range(0, len(memory) - FRAME_SIZE + 1, FRAME_SIZE):
+            timestamp = record_timestamp(memory, offset)
+            if timestamp is not None and timestamp > latest_timestamp:
+                latest, latest_timestamp = offset, timestamp
+        if latest is None:
+            return False
+        # Vue sur l'enregistrement, libérée avant toute nouvelle lecture de la mémoire
+        with memoryview(memory) as view:
+            self.handle_real_time(None, view[latest:latest + FRAME_SIZE])
+        return True
+
+    def update_metrics(self) -> None:
+        """Update the diagnostic metric entities."""
+        metrics = self.metrics
+        self.update("metric_frames_received", metrics.frames_received)
+        self.update("metric_frames_rejected", metrics.frames_rejected)
+        self.update("metric_reconnects", metrics.reconnects)
+        self.update("metric_time_connected", round(metrics.time_connected))
+        self.update(
+            "metric_callback_p95",
+            round(metrics.histograms["callback"].percentile(0.95) / 1000, 1),
+        )
+        self.update("metric_frames_missed", metrics.delivery.frames_missed)
+        self.update(
+            "metric_delivery_p95",
+            round(metrics.delivery.latency.percentile(0.95) / 1e9, 2),
+        )
+
+    def update_windows(self) -> None:
+        """Update the rolling-window statistics entities."""
+        if self.windows is None:
+            return
+        summary = self.windows.summary()
+        for key, _name in WINDOW_MEASUREMENTS:
+            for statistic, window, _label in WINDOW_STATISTICS:
+                value = summary[key][window][statistic]
+                if value is not None:
+                    self.update(f"{key}_{statistic}_{window}", value)
+
+    def handle_battery_level(self, sender: Any, data: bytearray) -> None:
+        """Handle a battery level notification."""
+        _LOGGER.debug("Niveau de batterie reçu: %d%%", data[0])
+        self.update("battery_level", data[0])
+
+    def handle_battery_charging(self, sender: Any, data: bytearray) -> None:
+        """Handle a charging state notification."""
+        _LOGGER.debug("État de charge reçu: %d", data[0])
+        self.update("battery_charging", data[0])
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigType, async_add_entities: AddEntitiesCallback
@@ -172,13 +388,36 @@ async def async_setup_entry(
     keep_connection = entry.options.get("keep_connection", True)
     _LOGGER.debug("Options configurées - Intervalle: %d secondes, Connexion permanente: %s", 
                  measurement_interval, keep_connection)
-
-    # Variable pour suivre l'état de la connexion
-    connection_active = False
-    connection_attempts = 0
+    min_write_interval = entry.options.get("min_write_interval", DEFAULT_MIN_WRITE_INTERVAL)
+    coalesce_writes = entry.options.get("coalesce_writes", DEFAULT_COALESCE_WRITES)
+    deadbands = {
+        option: float(entry.options.get(option, default))
+        for option, default in DEFAULT_DEADBANDS.items()
+    }
+
+    passive = entry.options.get("passive", DEFAULT_PASSIVE)
+    frames_per_cycle = entry.options.get("frames_per_cycle", DEFAULT_FRAMES_PER_CYCLE)
+    pull_memory = entry.options.get("pull_memory", DEFAULT_PULL_MEMORY)
+    backfill_enabled = keep_connection and entry.options.get("backfill", DEFAULT_BACKFILL)
+    if backfill_enabled and "recorder" not in hass.config.components:
+        _LOGGER.warning("Comblement des coupures désactivé: l'historique (recorder) n'est pas chargé")
+        backfill_enabled = False
+
+    diagnostic_sensors = entry.options.get("diagnostic_sensors", DEFAULT_DIAGNOSTIC_SENSORS)
+    window_sensors = entry.options.get("window_sensors", DEFAULT_WINDOW_SENSORS)
+    aqi_scale = entry.options.get("aqi_scale", DEFAULT_AQI_SCALE)
+    if aqi_scale not in SCALES:
+        aqi_scale = DEFAULT_AQI_SCALE
+    metrics: DeviceMetrics = hass.data[DOMAIN][entry.entry_id]["metrics"]
+    scheduler: ConnectionScheduler = hass.data.setdefault(DATA_SCHEDULER, ConnectionScheduler())
+    # Créneaux par adaptateur: la plus grande valeur configurée s'applique à toutes les entrées
+    scheduler.configure(address, entry.options.get("adapter_slots", DEFAULT_ADAPTER_SLOTS))
+    entry.async_on_unload(partial(scheduler.forget, address))
+    backfill: BackfillState = hass.data[DATA_BACKFILL]
 
     sensors = []
-    for discovery_info in async_discovered_service_info(hass):
+    # En mode passif, l'appareil peut n'être vu que par des scanners non connectables
+    for discovery_info in async_discovered_service_info(hass, connectable=not passive):
         if discovery_info.address == address:
             _LOGGER.debug("Appareil PMScan trouvé: %s", discovery_info.name)
             sensors.extend([
@@ -193,161 +432,465 @@ async def async_setup_entry(
                 PMScanBatteryLevelSensor(discovery_info),
                 PMScanBatteryChargingSensor(discovery_info),
                 PMScanAirQualitySensor(discovery_info),
+                PMScanSuppressedWritesSensor(discovery_info),
             ])
+            if diagnostic_sensors:
+                sensors.extend([
+                    PMScanMetricSensor(discovery_info, key, name, unit, icon)
+                    for key, name, unit, icon in DIAGNOSTIC_METRICS
+                ])
+            if window_sensors:
+                sensors.extend([
+                    PMScanWindowSensor(discovery_info, key, name, statistic, window, label)
+                    for key, name in WINDOW_MEASUREMENTS
+                    for statistic, window, label in WINDOW_STATISTICS
+                ])
             break
 
     if not sensors:
         _LOGGER.error("Aucun appareil PMScan trouvé à l'adresse %s", address)
         return
 
+    for sensor in sensors:
+        sensor.metrics = metrics
+        sensor.configure_writes(
+            deadbands.get(sensor.deadband_option, 0.0), min_write_interval, coalesce_writes
+        )
+    hass.data[DOMAIN][entry.entry_id]["sensors"] = sensors
+
     async_add_entities(sensors)
+    dispatcher = PMScanDispatcher(sensors, metrics)
+    dispatcher.air_quality = AirQualityEngine(aqi_scale)
+    if window_sensors:
+        dispatcher.windows = WindowedStats(key for key, _name in WINDOW_MEASUREMENTS)
+
+    def adapter() -> str | None:
+        """Return the adapter or proxy that last saw the device."""
+        service_info = async_last_service_info(hass, address, connectable=True)
+        return service_info.source if service_info else None
+
+    def stale_since() -> float:
+        """Return the time of the last data received, 0 if none."""
+        received = [
+            update.timestamp()
+            for update in (dispatcher.last_update, dispatcher.last_advertised_update)
+            if update is not None
+        ]
+        return max(received, default=0.0)
+
+    def refresh_counters() -> None:
+        """Update the suppressed writes counter, the diagnostic and window sensors."""
+        dispatcher.update(
+            "suppressed_writes",
+            sum(sensor.writes_suppressed for sensor in sensors
+                if sensor.value_type != "suppressed_writes"),
+        )
+        if diagnostic_sensors:
+            dispatcher.update_metrics()
+        dispatcher.update_windows()
+
+    async def subscribe(
+        client: BleakClient,
+        extra_steps: Callable[[dict[str, Any]], list[SetupStep]] | None = None,
+    ) -> dict[str, Any]:
+        """Resolve the PMScan characteristics and run the setup plan.
+
+        The characteristics are looked up by UUID in the services bleak
+        discovered while connecting; the services are only discovered again
+        when the PMScan service is missing from them. The notifications are then started, together with the operations
+        returned by extra_steps, as a plan of GATT operations: concurrent
+        where the backend allows it (see setup_plan.plan_concurrency),
+        otherwise one after another.
+        """
+        start = time.perf_counter_ns()
+        try:
+            pmscan_service = find_pmscan_service(client.services)
+        except Exception:
+            # Découverte non faite pendant la connexion
+            pmscan_service = None
+        if pmscan_service is None:
+            # Attente courte pour stabiliser la connexion avant la découverte
+            await asyncio.sleep(1)
+
+            # Découverte des services
+            services = await client.get_services()
+            if not services:
+                _LOGGER.error("Aucun service découvert sur l'appareil")
+                raise Exception("Aucun service découvert")
+
+            # Vérification du service PMScan
+            pmscan_service = find_pmscan_service(services)
+            if not pmscan_service:
+                _LOGGER.error("Service PMScan non trouvé")
+                raise Exception("Service PMScan non trouvé")
+
+            _LOGGER.info("Service PMScan trouvé avec succès")
+        characteristics = resolve_characteristics(pmscan_service)
+
+        # Notification temps réel en tête: la première trame n'attend pas le reste
+        steps = [
+            SetupStep(f"notify {characteristic.uuid}", partial(client.start_notify, characteristic, handler))
+            for characteristic, handler in dispatcher.resolve(characteristics).items()
+        ]
+        if extra_steps is not None:
+            steps += extra_steps(characteristics)
+        await run_plan(
+            steps,
+            max_concurrency=plan_concurrency(client),
+            on_error=lambda name, error: _LOGGER.warning(
+                "Erreur lors de l'étape %s de la connexion: %s", name, str(error)
+            ),
+        )
+        metrics.record("setup", time.perf_counter_ns() - start)
+        return characteristics
+
+    def interval_step(
+        client: BleakClient, characteristics: dict[str, Any], interval: int
+    ) -> SetupStep:
+        """Return the step that sets the acquisition interval of the device."""
+        return SetupStep(
+            "interval",
+            partial(
+                client.write_gatt_char,
+                characteristics[REAL_TIME_DATA_UUID],
+                interval.to_bytes(2, byteorder='little'),
+            ),
+            # Même caractéristique que la notification temps réel: jamais en même temps
+            after=(f"notify {REAL_TIME_DATA_UUID}",),
+        )
+
+    def battery_steps(client: BleakClient, characteristics: dict[str, Any]) -> list[SetupStep]:
+        """Return the optional steps reading the battery level and charging state."""
+
+        async def read(uuid: str, value_type: str) -> None:
+            value = await client.read_gatt_char(characteristics[uuid])
+            dispatcher.update(value_type, value[0])
+
+        # Chaque lecture suit l'abonnement à la même caractéristique
+        return [
+            SetupStep(
+                "battery_level",
+                partial(read, BATTERY_LEVEL_UUID, "battery_level"),
+                after=(f"notify {BATTERY_LEVEL_UUID}",),
+                optional=True,
+            ),
+            SetupStep(
+                "battery_charging",
+                partial(read, BATTERY_CHARGING_UUID, "battery_charging"),
+                after=(f"notify {BATTERY_CHARGING_UUID}",),
+                optional=True,
+            ),
+        ]
+
+    async def sync_clock(client: BleakClient, characteristics: dict[str, Any]) -> None:
+        """Set the device clock when it is off by more than CLOCK_SYNC_THRESHOLD."""
+        delivery = metrics.delivery
+        if not delivery.needs_sync():
+            return
+        offset = delivery.offset
+        try:
+            await client.write_gatt_char(
+                characteristics[CURRENT_TIME_UUID], struct.pack("<I", int(time.time()))
+            )
+        except Exception as e:
+            _LOGGER.warning("Erreur lors de la mise à l'heure du capteur: %s", str(e))
+            return
+        delivery.synced()
+        _LOGGER.info("Horloge du capteur %s remise à l'heure (écart: %.1f s)", address, offset)
 
     async def connect_and_subscribe():
         """Connect to device and subscribe to notifications."""
-        nonlocal connection_active, connection_attempts
-        
         while True:
-            if connection_active:
-                _LOGGER.debug("Une connexion est déjà active, attente...")
-                await asyncio.sleep(RECONNECTION_DELAY)
-                continue
-
-            if connection_attempts >= MAX_CONNECTION_ATTEMPTS:
-                _LOGGER.error("Nombre maximum de tentatives de connexion atteint (%d)", MAX_CONNECTION_ATTEMPTS)
-                await asyncio.sleep(60)  # Attente plus longue avant de réessayer
-                connection_attempts = 0
-                continue
-
             try:
-                connection_active = True
-                connection_attempts += 1
-                
                 device = async_ble_device_from_address(hass, address)
                 if not device:
-                    _LOGGER.error("Appareil non trouvé: %s", address)
-                    connection_active = False
-                    await asyncio.sleep(RECONNECTION_DELAY)
-                    continue
-
-                async with BleakClient(device, timeout=CONNECTION_TIMEOUT) as client:
-                    _LOGGER.info("Connexion établie avec le PMScan %s (tentative %d/%d)", 
-                               address, connection_attempts, MAX_CONNECTION_ATTEMPTS)
-
-                    # Vérification de la connexion
-                    if not client.is_connected:
-                        _LOGGER.error("La connexion a échoué immédiatement après l'établissement")
-                        raise Exception("Échec de la connexion")
-
-                    # Attente courte pour stabiliser la connexion
-                    await asyncio.sleep(1)
-                    
-                    try:
-                        # Découverte des services
-                        services = await client.get_services()
-                        if not services:
-                            _LOGGER.error("Aucun service découvert sur l'appareil")
-                            raise Exception("Aucun service découvert")
-
-                        # Vérification du service PMScan
-                        pmscan_service = None
-                        for service in services:
-                            if service.uuid.lower() == PMSCAN_SERVICE_UUID.lower():
-                                pmscan_service = service
-                                break
-
-                        if not pmscan_service:
-                            _LOGGER.error("Service PMScan non trouvé")
-                            raise Exception("Service PMScan non trouvé")
-
-                        _LOGGER.info("Service PMScan trouvé avec succès")
-                        connection_attempts = 0  # Réinitialisation du compteur après une connexion réussie
-                    
-                        # Configuration de l'intervalle de mesure
-                        interval_bytes = measurement_interval.to_bytes(2, byteorder='little')
-                        await client.write_gatt_char(REAL_TIME_DATA_UUID, interval_bytes)
-                        _LOGGER.info("Intervalle de mesure configuré à %d secondes", measurement_interval)
-
-                        last_update = None
-                        check_interval = asyncio.create_task(asyncio.sleep(0))
-
-                        def notification_handler(sender: int, data: bytearray) -> None:
-                            """Handle notification from PMScan device."""
-                            nonlocal last_update
-                            _LOGGER.debug("Notification reçue de %s: %s", sender, data.hex())
-                            
-                            # Gestion des différentes caractéristiques
-                            if str(sender).endswith(REAL_TIME_DATA_UUID[-12:]):
-                                parsed_data = parse_notification_data(data)
-                                if parsed_data:
-                                    last_update = dt_util.utcnow()
-                                    for sensor in sensors:
-                                        if sensor.value_type in parsed_data:
-                                            sensor.update_value(parsed_data[sensor.value_type])
-                            
-                            elif str(sender).endswith(BATTERY_LEVEL_UUID[-12:]):
-                                battery_level = data[0]
-                                _LOGGER.debug("Niveau de batterie reçu: %d%%", battery_level)
-                                for sensor in sensors:
-                                    if sensor.value_type == "battery_level":
-                                        sensor.update_value(battery_level)
-                            
-                            elif str(sender).endswith(BATTERY_CHARGING_UUID[-12:]):
-                                charging_state = data[0]
-                                _LOGGER.debug("État de charge reçu: %d", charging_state)
-                                for sensor in sensors:
-                                    if sensor.value_type == "battery_charging":
-                                        sensor.update_value(charging_state)
-
-                        # Activation des notifications pour toutes les caractéristiques
-                        await client.start_notify(REAL_TIME_DATA_UUID, notification_handler)
-                        _LOGGER.info("Notifications activées pour les données temps réel")
-                        
-                        await client.start_notify(BATTERY_LEVEL_UUID, notification_handler)
-                        _LOGGER.info("Notifications activées pour le niveau de batterie")
-                        
-                        await client.start_notify(BATTERY_CHARGING_UUID, notification_handler)
-                        _LOGGER.info("Notifications activées pour l'état de charge")
-
-                        # Lecture initiale du niveau de batterie et de l'état de charge
+                    raise Exception(f"Appareil non trouvé: {address}")
+
+                # Créneau de connexion attribué par l'ordonnanceur commun à toutes les entrées
+                async with scheduler.connection(address, adapter(), stale_since(), persistent=True):
+                    disconnected = asyncio.Event()
+                    async with BleakClient(
+                        device,
+                        timeout=CONNECTION_TIMEOUT,
+                        disconnected_callback=lambda _client: disconnected.set(),
+                    ) as client:
+                        _LOGGER.info("Connexion établie avec le PMScan %s", address)
+
+                        # Vérification de la connexion
+                        if not client.is_connected:
+                            _LOGGER.error("La connexion a échoué immédiatement après l'établissement")
+                            raise Exception("Échec de la connexion")
+
+                        metrics.connected()
+                        backfill_task = None
+
                         try:
-                            battery_level = await client.read_gatt_char(BATTERY_LEVEL_UUID)
-                            charging_state = await client.read_gatt_char(BATTERY_CHARGING_UUID)
-                            
-                            # Mise à jour des capteurs avec les valeurs initiales
-                            for sensor in sensors:
-                                if sensor.value_type == "battery_level":
-                                    sensor.update_value(battery_level[0])
-                                elif sensor.value_type == "battery_charging":
-                                    sensor.update_value(charging_state[0])
-                        except Exception as e:
-                            _LOGGER.warning("Erreur lors de la lecture initiale de la batterie: %s", str(e))
-
-                        while True:
-                            try:
-                                await check_interval
-                                check_interval = asyncio.create_task(asyncio.sleep(60))  # Vérifie toutes les minutes
-                                
+                            dispatcher.last_update = None
+                            metrics.delivery.interval = measurement_interval
+
+                            characteristics = await subscribe(
+                                client,
+                                lambda characteristics: [
+                                    interval_step(client, characteristics, measurement_interval),
+                                    *battery_steps(client, characteristics),
+                                ],
+                            )
+                            scheduler.succeeded(address)
+                            _LOGGER.info(
+                                "Notifications activées, intervalle de mesure configuré à %d secondes",
+                                measurement_interval,
+                            )
+                            if backfill_enabled:
+                                backfill_task = asyncio.create_task(
+                                    backfill_gap(client, characteristics)
+                                )
+
+                            while True:
+                                # Compteurs mis à jour une fois par minute
+                                refresh_counters()
+                                await sync_clock(client, characteristics)
+                                # Dernière trame vue, conservée même si Home Assistant s'arrête
+                                # sans fin propre de la connexion (après la lecture de la coupure)
+                                if (
+                                    backfill_enabled
+                                    and backfill_task is not None
+                                    and backfill_task.done()
+                                    and dispatcher.last_device_time is not None
+                                ):
+                                    backfill.seen(address, dispatcher.last_device_time)
+
+                                last_update = dispatcher.last_update
                                 if last_update and dt_util.utcnow() - last_update > MAX_TIME_BETWEEN_UPDATES:
-                                    _LOGGER.warning("Pas de données reçues depuis %s", MAX_TIME_BETWEEN_UPDATES)
-                                    break
-                                    
-                            except asyncio.CancelledError:
-                                break
+                                    raise Exception(f"Pas de données reçues depuis {MAX_TIME_BETWEEN_UPDATES}")
+
+                                # Vérifie toutes les minutes, ou dès la perte de la connexion
+                                try:
+                                    await asyncio.wait_for(disconnected.wait(), CHECK_INTERVAL)
+                                except asyncio.TimeoutError:
+                                    continue
+                                raise Exception("Connexion perdue")
+                        finally:
+                            metrics.disconnected()
+                            if backfill_task is not None:
+                                backfill_task.cancel()
+                            if backfill_enabled and dispatcher.last_device_time is not None:
+                                backfill.seen(address, dispatcher.last_device_time)
+
+            except Exception as e:
+                delay = scheduler.failed(address)
+                _LOGGER.error(
+                    "Erreur de connexion (échec %d, nouvelle tentative dans %.0f s): %s",
+                    scheduler.failures(address), delay, str(e),
+                )
+                await asyncio.sleep(delay)
 
+    async def collect_frames() -> None:
+        """Wait for frames_per_cycle valid real-time frames."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + frames_per_cycle * CYCLE_SAMPLE_INTERVAL + CYCLE_TIMEOUT_MARGIN
+        while dispatcher.frames_dispatched < frames_per_cycle:
+            try:
+                await asyncio.wait_for(dispatcher.frame_event.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                _LOGGER.warning(
+                    "Cycle de mesure incomplet: %d/%d trames reçues",
+                    dispatcher.frames_dispatched, frames_per_cycle,
+                )
+                break
+            dispatcher.frame_event.clear()
+
+    async def read_memory(client: BleakClient, characteristics: dict[str, Any]) -> None:
+        """Read the memory buffer of the device into dispatcher.memory.
+
+        The device sends its whole memory; the read ends when no record has
+        been received for MEMORY_IDLE_TIMEOUT seconds.
+        """
+        dispatcher.memory.clear()
+        dispatcher.memory_done = False
+        dispatcher.memory_event.clear()
+        await client.start_notify(characteristics[MEMORY_DATA_UUID], dispatcher.handle_memory)
+        try:
+            while not dispatcher.memory_done:
+                try:
+                    await asyncio.wait_for(dispatcher.memory_event.wait(), MEMORY_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                dispatcher.memory_event.clear()
+        finally:
+            await client.stop_notify(characteristics[MEMORY_DATA_UUID])
+        _LOGGER.debug("%d enregistrements lus dans la mémoire", len(dispatcher.memory) // FRAME_SIZE)
+
+    async def collect_memory(client: BleakClient, characteristics: dict[str, Any]) -> None:
+        """Read the device memory and dispatch its most recent record, if new."""
+        await read_memory(client, characteristics)
+        if not dispatcher.dispatch_latest_record():
+            _LOGGER.debug("Aucun nouvel enregistrement valide dans la mémoire")
+        dispatcher.memory.clear()
+
+    async def backfill_gap(client: BleakClient, characteristics: dict[str, Any]) -> None:
+        """Import the hours missed during an outage as hourly statistics.
+
+        The first frame of the connection gives the device time after the
+        outage. The hours entirely between the last frame seen before the
+        outage and this one, and not imported yet, are read from the device
+        memory and imported with a single statistics import per entity.
+        """
+        # Import différé: le recorder n'est chargé que si l'historique est activé
+        from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+        from homeassistant.components.recorder.statistics import async_import_statistics
+
+        while dispatcher.last_update is None:
+            dispatcher.frame_event.clear()
+            await dispatcher.frame_event.wait()
+        # Une horloge du capteur en avance ne doit pas créer d'heures futures
+        gap = backfill.gap(address, min(dispatcher.last_device_time, int(time.time())))
+        if gap is None:
+            return
+        start, end = gap
+        _LOGGER.info(
+            "Coupure de %s: lecture de la mémoire pour %d heure(s) manquante(s)",
+            address, (end - start) // HOUR,
+        )
+        try:
+            await read_memory(client, characteristics)
+            statistics = hourly_statistics(bytes(dispatcher.memory), start, end)
+        finally:
+            dispatcher.memory.clear()
+        hours = set()
+        for sensor in sensors:
+            key_statistics = statistics.get(sensor.value_type)
+            if not key_statistics or sensor.entity_id is None:
+                continue
+            async_import_statistics(
+                hass,
+                StatisticMetaData(
+                    has_mean=True,
+                    has_sum=False,
+                    name=None,
+                    source="recorder",
+                    statistic_id=sensor.entity_id,
+                    unit_of_measurement=sensor.native_unit_of_measurement,
+                ),
+                [
+                    StatisticData(
+                        start=dt_util.utc_from_timestamp(hour.start),
+                        mean=hour.mean,
+                        min=hour.min,
+                        max=hour.max,
+                    )
+                    for hour in key_statistics
+                ],
+            )
+            hours.update(hour.start for hour in key_statistics)
+        # Heures sans enregistrement comprises: la mémoire n'en contiendra pas plus
+        backfill.imported(address, end)
+        _LOGGER.info("%d heure(s) de statistiques importée(s) pour %s", len(hours), address)
+
+    async def sample_once() -> None:
+        """Connect, collect one cycle of measurements and disconnect."""
+        device = async_ble_device_from_address(hass, address)
+        if not device:
+            raise Exception(f"Appareil non trouvé: {address}")
+
+        async with BleakClient(device, timeout=CONNECTION_TIMEOUT) as client:
+            # Connexion planifiée: comptée comme cycle, pas comme reconnexion
+            metrics.connected(scheduled=True)
+            try:
+                # Le capteur notifie à l'intervalle configuré pendant une lecture de la mémoire
+                metrics.delivery.interval = measurement_interval if pull_memory else CYCLE_SAMPLE_INTERVAL
+                if pull_memory:
+                    characteristics = await subscribe(client)
+                    await collect_memory(client, characteristics)
+                else:
+                    dispatcher.frames_dispatched = 0
+                    dispatcher.frame_event.clear()
+                    # Acquisition rapide le temps du cycle
+                    characteristics = await subscribe(
+                        client,
+                        lambda characteristics: [
+                            interval_step(client, characteristics, CYCLE_SAMPLE_INTERVAL)
+                        ],
+                    )
+                    await collect_frames()
+                await sync_clock(client, characteristics)
+
+                # Le capteur enregistre en mémoire à l'intervalle configuré entre deux cycles
+                await client.write_gatt_char(
+                    characteristics[REAL_TIME_DATA_UUID],
+                    measurement_interval.to_bytes(2, byteorder='little'),
+                )
+
+                battery_level = await client.read_gatt_char(characteristics[BATTERY_LEVEL_UUID])
+                charging_state = await client.read_gatt_char(characteristics[BATTERY_CHARGING_UUID])
+                dispatcher.update("battery_level", battery_level[0])
+                dispatcher.update("battery_charging", charging_state[0])
+            finally:
+                metrics.disconnected()
+
+    async def duty_cycle() -> None:
+        """Connect once per measurement window and disconnect in between."""
+        scheduler.register(address)
+        delay = scheduler.delay_until_window(address, measurement_interval)
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    # Créneau de connexion attribué par l'ordonnanceur commun à toutes les entrées
+                    async with scheduler.connection(address, adapter(), stale_since()):
+                        await sample_once()
+                    scheduler.succeeded(address)
+                    delay = scheduler.delay_until_window(address, measurement_interval)
+                except Exception as e:
+                    # Nouvelle tentative après le délai d'attente, au plus tard à la fenêtre suivante
+                    delay = min(
+                        scheduler.failed(address),
+                        scheduler.delay_until_window(address, measurement_interval),
+                    )
+                    _LOGGER.error("Erreur lors du cycle de mesure: %s", str(e))
+
+                refresh_counters()
+        finally:
+            scheduler.unregister(address)
+
+    async def passive_watch() -> None:
+        """Follow the advertisements, connecting only while they carry no data."""
+        scheduler.register(address)
+        started = time.monotonic()
+        fallback = False
+        try:
+            while True:
+                await asyncio.sleep(scheduler.delay_until_window(address, measurement_interval))
+                last_advertisement = dispatcher.last_advertisement or started
+                if time.monotonic() - last_advertisement < PASSIVE_DATA_TIMEOUT:
+                    if fallback:
+                        _LOGGER.info("Mesures de nouveau présentes dans les annonces de %s", address)
+                        fallback = False
+                else:
+                    if not fallback:
+                        _LOGGER.warning(
+                            "Aucune mesure dans les annonces de %s depuis %d s, lecture par connexion",
+                            address, PASSIVE_DATA_TIMEOUT,
+                        )
+                        fallback = True
+                    try:
+                        async with scheduler.connection(address, adapter(), stale_since()):
+                            await sample_once()
+                        scheduler.succeeded(address)
                     except Exception as e:
-                        _LOGGER.error("Erreur de connexion (tentative %d/%d): %s", 
-                                    connection_attempts, MAX_CONNECTION_ATTEMPTS, str(e))
-                        connection_active = False
-                        await asyncio.sleep(RECONNECTION_DELAY)
+                        _LOGGER.error("Erreur lors du cycle de mesure: %s", str(e))
 
-            except Exception as e:
-                _LOGGER.error("Erreur de connexion (tentative %d/%d): %s", 
-                            connection_attempts, MAX_CONNECTION_ATTEMPTS, str(e))
-                connection_active = False
-                await asyncio.sleep(RECONNECTION_DELAY)
+                refresh_counters()
+        finally:
+            scheduler.unregister(address)
 
-    # Démarrer la connexion en arrière-plan
-    hass.async_create_task(connect_and_subscribe())
+    # Démarrer la connexion (ou le suivi des annonces) en arrière-plan
+    if passive:
+        task = hass.async_create_task(passive_watch())
+    elif keep_connection:
+        task = hass.async_create_task(connect_and_subscribe())
+    else:
+        task = hass.async_create_task(duty_cycle())
+    entry.async_on_unload(task.cancel)
 
     @callback
     def _async_update_ble(
@@ -364,14 +907,14 @@ async def async_setup_entry(
         )
 
         if service_info.manufacturer_data:
-            for sensor in sensors:
-                sensor.update_from_bluetooth(service_info)
+            # Une seule analyse par annonce, diffusée aux entités concernées
+            dispatcher.handle_advertisement(service_info)
 
     entry.async_on_unload(
         async_register_callback(
             hass,
             _async_update_ble,
-            {"address": address},
+            {"address": address, "connectable": not passive},
             BluetoothChange.ADVERTISEMENT,
         )
     )
@@ -379,6 +922,9 @@ async def async_setup_entry(
 class PMScanSensor(SensorEntity):
     """Representation of a PMScan sensor."""
 
+    # Option de bande morte appliquée à ce capteur (None = valeur exacte)
+    deadband_option: str | None = None
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         self._discovery_info = discovery_info
@@ -387,6 +933,16 @@ class PMScanSensor(SensorEntity):
         self._attr_state_class = SensorStateClass.MEASUREMENT
         self._value = None
         self.value_type = None
+        # Filtrage des écritures d'état
+        self._deadband = 0.0
+        self._min_write_interval = 0.0
+        self._coalesce = False
+        self._written_value: Any = None
+        self._last_write = 0.0
+        self._cancel_pending_write = None
+        self.writes_total = 0
+        self.writes_suppressed = 0
+        self.metrics: DeviceMetrics | None = None
         _LOGGER.debug(
             "Initialisation du capteur PMScan - Nom: %s, Adresse: %s",
             discovery_info.name,
@@ -403,30 +959,72 @@ class PMScanSensor(SensorEntity):
             "model": "PMScan",
         }
 
+    def configure_writes(
+        self, deadband: float, min_write_interval: float, coalesce: bool
+    ) -> None:
+        """Configure deadband, minimum write interval and coalescing."""
+        self._deadband = deadband
+        self._min_write_interval = min_write_interval
+        self._coalesce = coalesce
+
+    def _is_significant(self, value: Any) -> bool:
+        """Return True if the value differs enough from the last written one."""
+        if self.writes_total == 0:
+            return True
+        if value == self._written_value:
+            return False
+        if self._deadband and isinstance(value, (int, float)) and isinstance(
+            self._written_value, (int, float)
+        ):
+            return abs(value - self._written_value) > self._deadband
+        return True
+
     def update_value(self, value: float) -> None:
         """Update sensor value."""
         self._value = value
-        self.async_write_ha_state()
-
-    def update_from_bluetooth(self, service_info: BluetoothServiceInfoBleak) -> None:
-        """Update sensor state from Bluetooth data."""
-        if not service_info.manufacturer_data:
+        if self._cancel_pending_write is not None:
+            # Une écriture regroupée est déjà planifiée: elle prendra la dernière valeur
+            self.writes_suppressed += 1
+            return
+        if not self._is_significant(value):
+            self.writes_suppressed += 1
             return
 
-        try:
-            # Recherche des données dans manufacturer_data
-            for company_id, data in service_info.manufacturer_data.items():
-                _LOGGER.debug(
-                    "Données fabricant reçues - ID: %s, Données: %s",
-                    company_id,
-                    data.hex(),
+        elapsed = time.monotonic() - self._last_write
+        if self.writes_total and elapsed < self._min_write_interval:
+            self.writes_suppressed += 1
+            if self._coalesce and self.hass is not None:
+                self._cancel_pending_write = async_call_later(
+                    self.hass, self._min_write_interval - elapsed, self._async_write_pending
                 )
-                parsed_data = parse_notification_data(data)
-                if parsed_data and self.value_type in parsed_data:
-                    self.update_value(parsed_data[self.value_type])
-                break
-        except Exception as e:
-            _LOGGER.error("Erreur lors de la mise à jour des données: %s", str(e))
+            return
+
+        self._write_state()
+
+    @callback
+    def _async_write_pending(self, _now: datetime) -> None:
+        """Write the latest value at the end of a coalescing window."""
+        self._cancel_pending_write = None
+        if self._is_significant(self._value):
+            self._write_state()
+
+    def _write_state(self) -> None:
+        """Write the current value to Home Assistant."""
+        self._written_value = self._value
+        self._last_write = time.monotonic()
+        self.writes_total += 1
+        if self.metrics is None:
+            self.async_write_ha_state()
+            return
+        start = time.perf_counter_ns()
+        self.async_write_ha_state()
+        self.metrics.record("state_write", time.perf_counter_ns() - start)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel a pending coalesced write."""
+        if self._cancel_pending_write is not None:
+            self._cancel_pending_write()
+            self._cancel_pending_write = None
 
 class PMScanStateSensor(PMScanSensor):
     """Representation of PMScan state sensor."""
@@ -475,6 +1073,8 @@ class PMScanCommandSensor(PMScanSensor):
 class PMScanParticlesSensor(PMScanSensor):
     """Representation of PMScan particles sensor."""
 
+    deadband_option = "deadband_particles"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -492,6 +1092,8 @@ class PMScanParticlesSensor(PMScanSensor):
 class PMScanPM1Sensor(PMScanSensor):
     """Representation of a PMScan PM1.0 sensor."""
 
+    deadband_option = "deadband_pm"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -509,6 +1111,8 @@ class PMScanPM1Sensor(PMScanSensor):
 class PMScanPM25Sensor(PMScanSensor):
     """Representation of a PMScan PM2.5 sensor."""
 
+    deadband_option = "deadband_pm"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -526,6 +1130,8 @@ class PMScanPM25Sensor(PMScanSensor):
 class PMScanPM10Sensor(PMScanSensor):
     """Representation of a PMScan PM10 sensor."""
 
+    deadband_option = "deadband_pm"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -533,7 +1139,7 @@ class PMScanPM10Sensor(PMScanSensor):
         self._attr_unique_id = f"{discovery_info.address}_pm10_0"
         self._attr_native_unit_of_measurement = CONCENTRATION_MICROGRAMS_PER_CUBIC_METER
         self._attr_device_class = SensorDeviceClass.PM10
-        self.value_type = "pm10"
+        self.value_type = "pm10_0"
 
     @property
     def native_value(self) -> float | None:
@@ -543,6 +1149,8 @@ class PMScanPM10Sensor(PMScanSensor):
 class PMScanTemperatureSensor(PMScanSensor):
     """Representation of PMScan temperature sensor."""
 
+    deadband_option = "deadband_temperature"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -560,6 +1168,8 @@ class PMScanTemperatureSensor(PMScanSensor):
 class PMScanHumiditySensor(PMScanSensor):
     """Representation of PMScan humidity sensor."""
 
+    deadband_option = "deadband_humidity"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -613,17 +1223,13 @@ class PMScanBatteryChargingSensor(PMScanSensor):
         if self._value is None:
             return None
         
-        states = {
-            BATTERY_NOT_CHARGING: "Non branché",
-            BATTERY_PRE_CHARGING: "Pré-charge",
-            BATTERY_CHARGING: "En charge",
-            BATTERY_FULLY_CHARGED: "Chargé"
-        }
-        return states.get(self._value, f"Inconnu ({self._value})")
+        return BATTERY_STATES.get(self._value, f"Inconnu ({self._value})")
 
 class PMScanAirQualitySensor(PMScanSensor):
     """Representation of PMScan air quality sensor."""
 
+    deadband_option = "deadband_pm"
+
     def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
         """Initialize the sensor."""
         super().__init__(discovery_info)
@@ -631,26 +1237,114 @@ class PMScanAirQualitySensor(PMScanSensor):
         self._attr_unique_id = f"{discovery_info.address}_air_quality"
         self._attr_state_class = None
         self._attr_icon = "mdi:air-filter"
-        self.value_type = "pm10"
+        self.value_type = "air_quality"
         self._attr_device_class = None
         self._attr_native_unit_of_measurement = None
         self._attr_suggested_display_precision = None
 
+    def _is_significant(self, value: AirQuality) -> bool:
+        """Return True if the level changed or the concentration moved out of the deadband."""
+        written = self._written_value
+        if self.writes_total == 0 or written is None:
+            return True
+        if value.label != written.label or value.index != written.index:
+            return True
+        return abs(value.concentration - written.concentration) > self._deadband
+
     @property
     def native_value(self) -> str | None:
         """Return the air quality."""
         if self._value is not None:
-            quality, _ = get_air_quality_info(self._value)
-            return quality
+            return self._value.label
         return None
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return the state attributes."""
-        if self._value is not None:
-            _, led_color = get_air_quality_info(self._value)
-            return {
-                "led_color": led_color,
-                "pm10_value": self._value
-            }
-        return {} 
\ No newline at end of file
+        air_quality: AirQuality | None = self._value
+        if air_quality is None:
+            return {}
+        attributes = {
+            "scale": air_quality.scale,
+            "index": air_quality.index,
+            "color": air_quality.color,
+            "pollutant": air_quality.pollutant,
+            "concentration": air_quality.concentration,
+        }
+        if air_quality.scale == "led":
+            attributes["led_color"] = air_quality.color
+            attributes["pm10_value"] = air_quality.concentration
+        return attributes
+
+class PMScanSuppressedWritesSensor(PMScanSensor):
+    """Representation of the PMScan suppressed state writes counter."""
+
+    def __init__(self, discovery_info: BluetoothServiceInfoBleak) -> None:
+        """Initialize the sensor."""
+        super().__init__(discovery_info)
+        self._attr_name = f"PMScan {discovery_info.name} Écritures supprimées"
+        self._attr_unique_id = f"{discovery_info.address}_suppressed_writes"
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_icon = "mdi:filter-remove"
+        self.value_type = "suppressed_writes"
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the number of suppressed state writes."""
+        return self._value
+
+class PMScanMetricSensor(PMScanSensor):
+    """Representation of a PMScan hot-path metric."""
+
+    def __init__(
+        self,
+        discovery_info: BluetoothServiceInfoBleak,
+        key: str,
+        name: str,
+        unit: str | None,
+        icon: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(discovery_info)
+        self._attr_name = f"PMScan {discovery_info.name} {name}"
+        self._attr_unique_id = f"{discovery_info.address}_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_icon = icon
+        if not key.endswith("_p95"):
+            self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self.value_type = key
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the metric value."""
+        return self._value
+
+class PMScanWindowSensor(PMScanSensor):
+    """Representation of a rolling-window statistic of a PMScan measurement."""
+
+    def __init__(
+        self,
+        discovery_info: BluetoothServiceInfoBleak,
+        key: str,
+        name: str,
+        statistic: str,
+        window: str,
+        label: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(discovery_info)
+        self._attr_name = f"{name} {label}"
+        self._attr_unique_id = f"{discovery_info.address}_{key}_{statistic}_{window}"
+        self._attr_native_unit_of_measurement = CONCENTRATION_MICROGRAMS_PER_CUBIC_METER
+        self._attr_device_class = (
+            SensorDeviceClass.PM25 if key == "pm2_5" else SensorDeviceClass.PM10
+        )
+        self._attr_icon = "mdi:chart-bell-curve-cumulative"
+        self.value_type = f"{key}_{statistic}_{window}"
+
+    @property
+    def native_value(self) -> float | None:
+        """Return the statistic value."""
+        return self._value
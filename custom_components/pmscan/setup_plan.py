@@ -0,0 +1,99 @@
+"""Declarative GATT setup plans for PMScan connections.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable
+
+# Backends Bleak dont la pile Bluetooth met elle-même en file les requêtes ATT
+# d'une connexion (BlueZ): les étapes indépendantes peuvent y être lancées ensemble
+CONCURRENT_BACKENDS = frozenset({"BleakClientBlueZDBus"})
+
+class SetupStep:
+    """One GATT operation of a connection setup plan."""
+
+    __slots__ = ("name", "operation", "after", "optional")
+
+    def __init__(
+        self,
+        name: str,
+        operation: Callable[[], Awaitable[Any]],
+        after: Iterable[str] = (),
+        optional: bool = False,
+    ) -> None:
+        """Initialize the step.
+
+        operation is called without argument and awaited; after lists the
+        steps that must complete first; a failing optional step is reported
+        without aborting the plan.
+        """
+        self.name = name
+        self.operation = operation
+        self.after = tuple(after)
+        self.optional = optional
+
+def plan_concurrency(client: Any) -> int | None:
+    """Return the max_concurrency of run_plan suited to a connected client.
+
+    The steps run concurrently (None) only on a backend known to queue the
+    ATT requests itself; any other backend, such as a Bluetooth proxy, gets
+    one operation at a time (1).
+    """
+    backend = getattr(client, "_backend", None)
+    if type(backend).__name__ in CONCURRENT_BACKENDS:
+        return None
+    return 1
+
+async def run_plan(
+    steps: Iterable[SetupStep],
+    max_concurrency: int | None = None,
+    on_error: Callable[[str, BaseException], None] | None = None,
+) -> dict[str, Any]:
+    """Run a setup plan and return the results by step name.
+
+    Each step is issued as soon as the steps it depends on have completed, so
+    independent steps run concurrently, at most max_concurrency at a time
+    (None: no limit; 1: one after another, in plan order). A failing step
+    aborts the plan and its error is raised, unless the step is optional: the
+    error is then passed to on_error, and the steps depending on it are
+    skipped the same way.
+    """
+    steps = list(steps)
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    tasks: dict[str, asyncio.Future] = {}
+
+    async def run(step: SetupStep) -> Any:
+        for name in step.after:
+            await tasks[name]
+        if semaphore is None:
+            return await step.operation()
+        async with semaphore:
+            return await step.operation()
+
+    for step in steps:
+        tasks[step.name] = asyncio.ensure_future(run(step))
+
+    try:
+        pending = set(tasks.values())
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+            for step in steps:
+                task = tasks[step.name]
+                if task in done and not step.optional and task.exception() is not None:
+                    raise task.exception()
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    results = {}
+    for step in steps:
+        error = tasks[step.name].exception()
+        if error is None:
+            results[step.name] = tasks[step.name].result()
+        elif on_error is not None:
+            on_error(step.name, error)
+    return results
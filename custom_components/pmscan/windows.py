@@ -0,0 +1,187 @@
+"""Incremental rolling-window statistics of PMScan measurements.
+
+This module has no Home Assistant or Bluetooth dependency so that the command
+line reader can use it as well.
+"""
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from typing import Any, Iterable
+
+# Fenêtres glissantes par défaut: nom -> durée (secondes)
+DEFAULT_WINDOWS = {"1h": 3600, "8h": 8 * 3600, "24h": 24 * 3600}
+# Nombre de tranches d'une fenêtre: la fenêtre avance par pas de durée / SLOTS
+DEFAULT_SLOTS = 120
+# Précision relative des percentiles (classes logarithmiques de 2 %)
+PERCENTILE_ACCURACY = 0.02
+_LOG_GAMMA = math.log1p(2 * PERCENTILE_ACCURACY)
+
+class RollingWindow:
+    """Mean, maximum and approximate percentiles over a sliding time window.
+
+    The window is a ring of time slots. Each slot keeps the sum, count and
+    value histogram of its values, and running totals are updated when a
+    value is added or a slot expires, so adding a value costs O(1) whatever
+    the window length. The maximum is tracked with a monotonic deque holding
+    at most one value per slot. Percentiles come from a histogram with
+    logarithmic bins, within PERCENTILE_ACCURACY of the exact value.
+    """
+
+    def __init__(self, duration: float, slots: int = DEFAULT_SLOTS) -> None:
+        """Initialize an empty window of duration seconds."""
+        self.duration = duration
+        self.slots = slots
+        self._width = duration / slots
+        self._slot_ids = [-1] * slots
+        self._sums = [0.0] * slots
+        self._counts = [0] * slots
+        self._bins: list[dict[int, int]] = [{} for _ in range(slots)]
+        self._sum = 0.0
+        self._count = 0
+        self._histogram: dict[int, int] = {}
+        # (tranche, valeur) à valeurs strictement décroissantes
+        self._maxima: deque[tuple[int, float]] = deque()
+        self._current = -1
+
+    def add(self, value: float, now: float | None = None) -> None:
+        """Add a value measured at now (time.monotonic() by default)."""
+        slot_id = self._advance(now)
+        index = slot_id % self.slots
+        self._sums[index] += value
+        self._counts[index] += 1
+        self._sum += value
+        self._count += 1
+
+        bin_index = _bin(value)
+        slot_bins = self._bins[index]
+        slot_bins[bin_index] = slot_bins.get(bin_index, 0) + 1
+        self._histogram[bin_index] = self._histogram.get(bin_index, 0) + 1
+
+        maxima = self._maxima
+        while maxima and maxima[-1][1] <= value:
+            maxima.pop()
+        if not maxima or maxima[-1][0] != slot_id:
+            maxima.append((slot_id, value))
+
+    def count(self, now: float | None = None) -> int:
+        """Return the number of values in the window."""
+        self._advance(now)
+        return self._count
+
+    def mean(self, now: float | None = None) -> float | None:
+        """Return the mean of the window, None if it is empty."""
+        self._advance(now)
+        return self._sum / self._count if self._count else None
+
+    def max(self, now: float | None = None) -> float | None:
+        """Return the maximum of the window, None if it is empty."""
+        self._advance(now)
+        return self._maxima[0][1] if self._maxima else None
+
+    def percentile(self, fraction: float, now: float | None = None) -> float | None:
+        """Return an approximation of a percentile, None if the window is empty."""
+        self._advance(now)
+        if not self._count:
+            return None
+        target = fraction * self._count
+        seen = 0
+        for bin_index in sorted(self._histogram):
+            seen += self._histogram[bin_index]
+            if seen >= target:
+                break
+        return min(_value(bin_index), self._maxima[0][1])
+
+    def summary(self, now: float | None = None) -> dict[str, Any]:
+        """Return the count, mean, maximum and 95th percentile of the window."""
+        mean = self.mean(now)
+        p95 = self.percentile(0.95, now)
+        return {
+            "count": self._count,
+            "mean": round(mean, 1) if mean is not None else None,
+            "max": self.max(now),
+            "p95": round(p95, 1) if p95 is not None else None,
+        }
+
+    def _advance(self, now: float | None) -> int:
+        """Expire the slots that left the window and return the current slot."""
+        if now is None:
+            now = time.monotonic()
+        slot_id = int(now // self._width)
+        if slot_id <= self._current:
+            return self._current
+        # Au-delà d'un tour complet, toutes les tranches sont expirées
+        for expired in range(max(self._current + 1, slot_id - self.slots + 1), slot_id + 1):
+            self._expire(expired % self.slots)
+            self._slot_ids[expired % self.slots] = expired
+        self._current = slot_id
+        oldest = slot_id - self.slots + 1
+        maxima = self._maxima
+        while maxima and maxima[0][0] < oldest:
+            maxima.popleft()
+        return slot_id
+
+    def _expire(self, index: int) -> None:
+        if not self._counts[index]:
+            return
+        self._count -= self._counts[index]
+        self._sum = self._sum - self._sums[index] if self._count else 0.0
+        histogram = self._histogram
+        for bin_index, bin_count in self._bins[index].items():
+            remaining = histogram[bin_index] - bin_count
+            if remaining:
+                histogram[bin_index] = remaining
+            else:
+                del histogram[bin_index]
+        self._sums[index] = 0.0
+        self._counts[index] = 0
+        self._bins[index] = {}
+
+class WindowedStats:
+    """Rolling windows of several durations over several measurements."""
+
+    def __init__(
+        self, keys: Iterable[str], windows: dict[str, float] | None = None
+    ) -> None:
+        """Initialize the windows of each measurement key.
+
+        windows maps a window name to its duration in seconds
+        (DEFAULT_WINDOWS by default).
+        """
+        windows = windows if windows is not None else DEFAULT_WINDOWS
+        self.windows = {
+            key: {name: RollingWindow(duration) for name, duration in windows.items()}
+            for key in keys
+        }
+        self._routes = tuple(
+            (key, tuple(key_windows.values())) for key, key_windows in self.windows.items()
+        )
+
+    def add(self, values: Any, now: float | None = None) -> None:
+        """Add the tracked values of a decoded frame (protocol.Frame)."""
+        if now is None:
+            now = time.monotonic()
+        for key, key_windows in self._routes:
+            value = getattr(values, key, None)
+            if value is None:
+                continue
+            for window in key_windows:
+                window.add(value, now)
+
+    def summary(self, now: float | None = None) -> dict[str, dict[str, dict[str, Any]]]:
+        """Return the summary of each window, by measurement key and window name."""
+        if now is None:
+            now = time.monotonic()
+        return {
+            key: {name: window.summary(now) for name, window in key_windows.items()}
+            for key, key_windows in self.windows.items()
+        }
+
+def _bin(value: float) -> int:
+    """Return the logarithmic histogram bin of a value (negative values in bin 0)."""
+    return int(math.log1p(max(value, 0.0)) / _LOG_GAMMA)
+
+def _value(bin_index: int) -> float:
+    """Return the representative value of a histogram bin."""
+    return math.expm1((bin_index + 0.5) * _LOG_GAMMA)
@@ -0,0 +1,381 @@
+"""
+Analyse hors ligne des enregistrements PMScan (segments .pmr de pmscan_record).
+
+Les segments sont découpés en tranches d'enregistrements (un segment entier par
+défaut) réparties entre plusieurs processus (ProcessPoolExecutor). Chaque
+processus projette son segment en mémoire, traite sa tranche par opérations
+vectorielles et renvoie des agrégats partiels par capteur et par jour: effectif,
+sommes, minimum et maximum de chaque mesure, dépassements de seuil, répartition
+des niveaux de l'indice de qualité de l'air et histogramme de PM2.5. Les agrégats
+sont ensuite fusionnés par simple addition.
+
+Les mesures sont agrégées en entiers (dixièmes, comme dans la trame): le résultat
+ne dépend ni du découpage ni du nombre de processus.
+
+Usage:
+    python pmscan_analyze.py REPERTOIRE|SEGMENT... [--jobs N] [--since AAAA-MM-JJ] [--csv]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+from datetime import datetime, timezone
+import os
+import sys
+import time
+
+import numpy as np
+
+from pmscan_batch import PM_WARMUP_VALUE
+from pmscan_record import HEADER_SIZE, RECORD_SIZE, SEGMENT_SUFFIX, Segment, list_segments
+
+# Module sans dépendance Home Assistant partagé avec l'intégration
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_components", "pmscan"))
+from aqi import DEFAULT_SCALE, SCALES  # noqa: E402
+
+# Mesures agrégées (colonnes de la trame, en dixièmes sauf particles_count)
+MEASUREMENTS = ("pm1_0", "pm2_5", "pm10_0", "temperature", "humidity")
+# Humidité maximum, en dixièmes de % (limitation appliquée par le décodage)
+MAX_HUMIDITY_TENTHS = 1000
+# Seuils de dépassement en µg/m³ (lignes directrices OMS 2021, moyenne sur 24 h)
+EXCEEDANCE_THRESHOLDS = {"pm2_5": 15.0, "pm10_0": 45.0}
+# Colonne de la trame de chaque polluant des indices de qualité de l'air
+AQI_COLUMNS = {"pm2_5": "pm2_5", "pm10": "pm10_0"}
+# Histogramme de PM2.5: classes de 1 µg/m³, la dernière regroupant les valeurs au-delà
+PM25_HISTOGRAM_BINS = 500
+
+# Enregistrements par tranche (un segment du Recorder en compte au plus 1 000 000)
+DEFAULT_CHUNK_RECORDS = 1_000_000
+DAY_NS = 86400 * 10**9
+
+class DailyAggregate:
+    """
+    Agrégats des trames d'un capteur sur un jour (UTC, heure de réception).
+
+    Toutes les valeurs sont des entiers: deux agrégats partiels se fusionnent
+    par addition (minimum et maximum exceptés) sans erreur d'arrondi.
+    """
+
+    __slots__ = ("count", "sums", "minima", "maxima", "exceedances", "levels", "pm2_5_histogram")
+
+    def __init__(self, levels):
+        """
+        Args:
+            levels (int): Nombre de niveaux de l'indice de qualité de l'air
+        """
+        self.count = 0
+        self.sums = np.zeros(len(MEASUREMENTS), dtype=np.int64)
+        self.minima = np.full(len(MEASUREMENTS), np.iinfo(np.int64).max, dtype=np.int64)
+        self.maxima = np.full(len(MEASUREMENTS), np.iinfo(np.int64).min, dtype=np.int64)
+        self.exceedances = np.zeros(len(EXCEEDANCE_THRESHOLDS), dtype=np.int64)
+        self.levels = np.zeros(levels, dtype=np.int64)
+        self.pm2_5_histogram = np.zeros(PM25_HISTOGRAM_BINS, dtype=np.int64)
+
+    def add(self, frames, levels):
+        """
+        Ajoute des trames brutes valides.
+
+        Args:
+            frames (np.ndarray): Trames au format RAW_FRAME_DTYPE
+            levels (np.ndarray): Niveau de l'indice de qualité de l'air de chaque trame
+        """
+        self.count += len(frames)
+        for index, key in enumerate(MEASUREMENTS):
+            column = frames[key]
+            if key == "humidity":
+                column = np.minimum(column, MAX_HUMIDITY_TENTHS)
+            self.sums[index] += column.sum(dtype=np.int64)
+            self.minima[index] = min(self.minima[index], column.min())
+            self.maxima[index] = max(self.maxima[index], column.max())
+        for index, (key, threshold) in enumerate(EXCEEDANCE_THRESHOLDS.items()):
+            self.exceedances[index] += np.count_nonzero(frames[key] > threshold * 10)
+        self.levels += np.bincount(levels, minlength=len(self.levels))
+        self.pm2_5_histogram += np.bincount(
+            np.minimum(frames["pm2_5"] // 10, PM25_HISTOGRAM_BINS - 1),
+            minlength=PM25_HISTOGRAM_BINS,
+        )
+
+    def merge(self, other):
+        """Ajoute un autre agrégat partiel du même capteur et du même jour."""
+        self.count += other.count
+        self.sums += other.sums
+        np.minimum(self.minima, other.minima, out=self.minima)
+        np.maximum(self.maxima, other.maxima, out=self.maxima)
+        self.exceedances += other.exceedances
+        self.levels += other.levels
+        self.pm2_5_histogram += other.pm2_5_histogram
+
+    def mean(self, key):
+        """Moyenne d'une mesure."""
+        return self.sums[MEASUREMENTS.index(key)] / self.count / 10
+
+    def max(self, key):
+        """Maximum d'une mesure."""
+        return self.maxima[MEASUREMENTS.index(key)] / 10
+
+    def exceedance_rate(self, key):
+        """Part des trames au-dessus du seuil EXCEEDANCE_THRESHOLDS d'une mesure."""
+        return self.exceedances[list(EXCEEDANCE_THRESHOLDS).index(key)] / self.count
+
+    def pm2_5_percentile(self, fraction):
+        """Percentile de PM2.5, à 1 µg/m³ près (borne haute de la classe)."""
+        rank = np.searchsorted(np.cumsum(self.pm2_5_histogram), fraction * self.count)
+        return float(min(rank, PM25_HISTOGRAM_BINS - 1) + 1)
+
+def aqi_levels(scale, frames):
+    """
+    Niveau de l'indice de chaque trame (le pire des polluants de l'échelle),
+    calculé sur la concentration de la trame elle-même (sans NowCast).
+
+    Args:
+        scale (aqi.Scale): Échelle de l'indice
+        frames (np.ndarray): Trames au format RAW_FRAME_DTYPE
+
+    Returns:
+        np.ndarray: Niveau de chaque trame, de 0 (meilleur) à len(scale.levels) - 1
+    """
+    worst = np.zeros(len(frames), dtype=np.intp)
+    for pollutant, lows in scale.breakpoints.items():
+        concentrations = frames[AQI_COLUMNS[pollutant]] / 10
+        decimals = scale.precision.get(pollutant)
+        if decimals is not None:
+            concentrations = np.floor(concentrations * 10**decimals) / 10**decimals
+        level = np.searchsorted(np.asarray(lows, dtype=float), concentrations, side="right") - 1
+        np.maximum(worst, np.minimum(level, len(scale.levels) - 1), out=worst)
+    return worst
+
+def analyze_chunk(path, start, stop, scale_name=DEFAULT_SCALE, since_ns=None, until_ns=None):
+    """
+    Agrège une tranche d'un segment (exécuté dans un processus du pool).
+
+    Args:
+        path (str): Segment .pmr
+        start (int): Premier enregistrement de la tranche
+        stop (int): Fin de la tranche (exclue)
+        scale_name (str): Indice de qualité de l'air (voir aqi.SCALES)
+        since_ns (int): Ignore les trames reçues avant (ns depuis l'epoch)
+        until_ns (int): Ignore les trames reçues à partir de (ns depuis l'epoch)
+
+    Returns:
+        dict: Agrégats partiels (DailyAggregate) par (adresse, jour AAAA-MM-JJ)
+    """
+    scale = SCALES[scale_name]
+    results = {}
+    with Segment(path) as segment:
+        records = segment.records[start:stop]
+        frames = records["frame"]
+        valid = (
+            (frames["pm1_0"] != PM_WARMUP_VALUE)
+            & (frames["pm2_5"] != PM_WARMUP_VALUE)
+            & (frames["pm10_0"] != PM_WARMUP_VALUE)
+        )
+        received_ns = records["received_ns"]
+        if since_ns is not None:
+            valid &= received_ns >= since_ns
+        if until_ns is not None:
+            valid &= received_ns < until_ns
+        frames = frames[valid]
+        days = received_ns[valid] // DAY_NS
+        levels = aqi_levels(scale, frames)
+        for day in np.unique(days):
+            in_day = days == day
+            aggregate = results[(segment.device_id, _day_label(day))] = DailyAggregate(len(scale.levels))
+            aggregate.add(frames[in_day], levels[in_day])
+        # Plus aucune vue sur la projection: le segment peut être libéré
+        del records, frames, received_ns, valid
+    return results
+
+def plan_chunks(paths, chunk_records=DEFAULT_CHUNK_RECORDS):
+    """
+    Découpe des segments en tranches d'au plus chunk_records enregistrements.
+
+    Args:
+        paths (list): Segments .pmr
+        chunk_records (int): Enregistrements par tranche
+
+    Returns:
+        list: Tranches (chemin, début, fin)
+    """
+    chunks = []
+    for path in paths:
+        count = max(0, (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE)
+        for start in range(0, count, chunk_records):
+            chunks.append((path, start, min(start + chunk_records, count)))
+    return chunks
+
+def analyze(paths, jobs=None, chunk_records=DEFAULT_CHUNK_RECORDS, scale_name=DEFAULT_SCALE,
+            since_ns=None, until_ns=None):
+    """
+    Agrège des segments par capteur et par jour, en parallèle.
+
+    Args:
+        paths (list): Segments .pmr
+        jobs (int): Nombre de processus (None: un par cœur, 1: dans ce processus)
+        chunk_records (int): Enregistrements par tranche
+        scale_name (str): Indice de qualité de l'air (voir aqi.SCALES)
+        since_ns (int): Ignore les trames reçues avant (ns depuis l'epoch)
+        until_ns (int): Ignore les trames reçues à partir de (ns depuis l'epoch)
+
+    Returns:
+        dict: DailyAggregate par (adresse, jour), trié par adresse puis par jour
+    """
+    chunks = plan_chunks(paths, chunk_records)
+    totals = {}
+
+    def reduce(partial):
+        for key, aggregate in partial.items():
+            if key in totals:
+                totals[key].merge(aggregate)
+            else:
+                totals[key] = aggregate
+
+    if jobs == 1:
+        for chunk in chunks:
+            reduce(analyze_chunk(*chunk, scale_name, since_ns, until_ns))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [
+                pool.submit(analyze_chunk, *chunk, scale_name, since_ns, until_ns)
+                for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                reduce(future.result())
+    return dict(sorted(totals.items()))
+
+def _day_label(day):
+    """Jour AAAA-MM-JJ (UTC) d'un numéro de jour depuis l'epoch."""
+    return datetime.fromtimestamp(int(day) * 86400, timezone.utc).strftime("%Y-%m-%d")
+
+def _day_ns(label):
+    """Début (ns depuis l'epoch) d'un jour AAAA-MM-JJ (UTC)."""
+    day = datetime.strptime(label, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(day.timestamp()) * 10**9
+
+def summary_rows(results, scale_name=DEFAULT_SCALE):
+    """
+    Met en forme les agrégats: une ligne par capteur et par jour.
+
+    Args:
+        results (dict): Résultat de analyze
+        scale_name (str): Indice de qualité de l'air utilisé
+
+    Returns:
+        tuple: (en-têtes, lignes)
+    """
+    levels = [label for label, _color in SCALES[scale_name].levels]
+    header = [
+        "capteur", "jour", "trames",
+        "pm1_0_moy", "pm2_5_moy", "pm2_5_p95", "pm2_5_max", "pm10_moy", "pm10_max",
+        "pm2_5_depassement", "pm10_depassement", "temperature_moy", "humidite_moy",
+        *levels,
+    ]
+    rows = []
+    for (address, day), aggregate in results.items():
+        rows.append([
+            address, day, aggregate.count,
+            round(aggregate.mean("pm1_0"), 1),
+            round(aggregate.mean("pm2_5"), 1),
+            aggregate.pm2_5_percentile(0.95),
+            aggregate.max("pm2_5"),
+            round(aggregate.mean("pm10_0"), 1),
+            aggregate.max("pm10_0"),
+            round(aggregate.exceedance_rate("pm2_5"), 3),
+            round(aggregate.exceedance_rate("pm10_0"), 3),
+            round(aggregate.mean("temperature"), 1),
+            round(aggregate.mean("humidity"), 1),
+            *(round(count / aggregate.count, 3) for count in aggregate.levels.tolist()),
+        ])
+    return header, rows
+
+def format_table(results, scale_name=DEFAULT_SCALE):
+    """
+    Formate le tableau de synthèse pour le terminal.
+
+    Args:
+        results (dict): Résultat de analyze
+        scale_name (str): Indice de qualité de l'air utilisé
+
+    Returns:
+        str: Tableau, une ligne par capteur et par jour
+    """
+    scale = SCALES[scale_name]
+    lines = [
+        f"{'Capteur':<17}  {'Jour':<10}  {'Trames':>8}  {'PM1':>5}  {'PM2.5':>5}  {'p95':>5}  "
+        f"{'max':>6}  {'PM10':>5}  {'max':>6}  {'>OMS':>11}  {'T':>5}  {'H':>5}  {scale.title}"
+    ]
+    header, rows = summary_rows(results, scale_name)
+    levels = header[13:]
+    for row in rows:
+        distribution = " ".join(
+            f"{label} {share:.0%}" for label, share in zip(levels, row[13:]) if share
+        )
+        lines.append(
+            f"{row[0]:<17}  {row[1]:<10}  {row[2]:>8}  {row[3]:>5.1f}  {row[4]:>5.1f}  {row[5]:>5.0f}  "
+            f"{row[6]:>6.1f}  {row[7]:>5.1f}  {row[8]:>6.1f}  {row[9]:>5.0%} {row[10]:>5.0%}  "
+            f"{row[11]:>5.1f}  {row[12]:>5.1f}  {distribution}"
+        )
+    return "\n".join(lines)
+
+def expand_paths(paths, device_id=None):
+    """
+    Remplace les répertoires par les segments qu'ils contiennent.
+
+    Args:
+        paths (list): Segments ou répertoires de segments
+        device_id (str): Ne garde que les segments d'un capteur (répertoires uniquement)
+
+    Returns:
+        list: Segments .pmr
+    """
+    segments = []
+    for path in paths:
+        if os.path.isdir(path):
+            segments += list_segments(path, device_id=device_id)
+        elif path.endswith(SEGMENT_SUFFIX):
+            segments.append(path)
+    return segments
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Synthèse par capteur et par jour des enregistrements PMScan (.pmr)",
+    )
+    parser.add_argument("paths", nargs="+", metavar="CHEMIN",
+                        help="segments .pmr ou répertoires d'enregistrement (option --record)")
+    parser.add_argument("--device", metavar="ADRESSE", help="ne garde que les segments d'un capteur")
+    parser.add_argument("--since", metavar="AAAA-MM-JJ", help="premier jour analysé (UTC)")
+    parser.add_argument("--until", metavar="AAAA-MM-JJ", help="dernier jour analysé (UTC, inclus)")
+    parser.add_argument("--jobs", type=int, default=None, metavar="N",
+                        help="nombre de processus (défaut: un par cœur)")
+    parser.add_argument("--chunk-records", type=int, default=DEFAULT_CHUNK_RECORDS, metavar="N",
+                        help=f"enregistrements par tranche de travail (défaut: {DEFAULT_CHUNK_RECORDS})")
+    parser.add_argument("--aqi", choices=sorted(SCALES), default=DEFAULT_SCALE,
+                        help="indice de qualité de l'air de la répartition par niveau (défaut: led)")
+    parser.add_argument("--csv", action="store_true", help="écrit le tableau au format CSV")
+    args = parser.parse_args(argv)
+
+    paths = expand_paths(args.paths, args.device)
+    if not paths:
+        print("Aucun segment .pmr trouvé", file=sys.stderr)
+        return 1
+    since_ns = _day_ns(args.since) if args.since else None
+    until_ns = _day_ns(args.until) + DAY_NS if args.until else None
+
+    start = time.perf_counter()
+    results = analyze(paths, jobs=args.jobs, chunk_records=args.chunk_records,
+                      scale_name=args.aqi, since_ns=since_ns, until_ns=until_ns)
+    elapsed = time.perf_counter() - start
+
+    if args.csv:
+        header, rows = summary_rows(results, args.aqi)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(header)
+        writer.writerows(rows)
+    else:
+        print(format_table(results, args.aqi))
+    frames = sum(aggregate.count for aggregate in results.values())
+    print(f"{len(paths)} segment(s), {frames} trames analysées en {elapsed:.2f} s "
+          f"({frames / elapsed:,.0f} trames/s)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Décodage vectorisé des trames PMScan.
+Ce module décode en un seul appel un tampon contigu de N trames de 20 bytes
+(telles que reçues sur REAL_TIME_DATA_UUID) dans un tableau structuré NumPy.
+Il applique les mêmes règles que parse_real_time_data (masque 0xFFFF pendant le
+démarrage, division par 10, limitation de l'humidité à 100%) sous forme
+d'opérations vectorielles, sans créer d'objet Python par trame.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Module sans dépendance Home Assistant partagé avec l'intégration
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_components", "pmscan"))
+from protocol import FRAME_SIZE, PM_WARMUP_VALUE  # noqa: E402
+
+# Disposition brute d'une trame, identique à struct "<IBBHHHHHHxx"
+RAW_FRAME_DTYPE = np.dtype([
+    ("timestamp", "<u4"),
+    ("state", "u1"),
+    ("command", "u1"),
+    ("particles_count", "<u2"),
+    ("pm1_0", "<u2"),
+    ("pm2_5", "<u2"),
+    ("pm10_0", "<u2"),
+    ("temperature", "<u2"),
+    ("humidity", "<u2"),
+    ("reserved", "<u2"),
+])
+
+# Trame décodée: mêmes champs que le dictionnaire de parse_real_time_data
+FRAME_DTYPE = np.dtype([
+    ("timestamp", "<u4"),
+    ("state", "u1"),
+    ("command", "u1"),
+    ("particles_count", "<u2"),
+    ("pm1_0", "<f8"),
+    ("pm2_5", "<f8"),
+    ("pm10_0", "<f8"),
+    ("temperature", "<f8"),
+    ("humidity", "<f8"),
+])
+
+def frames_view(buffer):
+    """
+    Expose un tampon de trames brutes sous forme de tableau structuré, sans copie.
+
+    Args:
+        buffer (bytes | bytearray | memoryview | np.ndarray): N trames de 20 bytes contiguës,
+            ou tableau déjà au format RAW_FRAME_DTYPE
+
+    Returns:
+        np.ndarray: Tableau de N éléments au format RAW_FRAME_DTYPE
+    """
+    if isinstance(buffer, np.ndarray) and buffer.dtype == RAW_FRAME_DTYPE:
+        return buffer
+    raw = np.frombuffer(buffer, dtype=np.uint8)
+    if raw.size % FRAME_SIZE:
+        raise ValueError(
+            f"Taille du tampon invalide: {raw.size} bytes (multiple de {FRAME_SIZE} attendu)"
+        )
+    return raw.view(RAW_FRAME_DTYPE)
+
+def decode_frames(buffer, keep_invalid=False):
+    """
+    Décode un tampon de trames PMScan en une seule passe vectorielle.
+
+    Les trames dont une valeur PM vaut 0xFFFF (capteur en phase de démarrage)
+    sont écartées, comme le fait parse_real_time_data en renvoyant None.
+
+    Args:
+        buffer (bytes | bytearray | memoryview | np.ndarray): N trames de 20 bytes contiguës
+        keep_invalid (bool): Si True, conserve toutes les trames et renvoie aussi
+            le masque de validité au lieu de filtrer
+
+    Returns:
+        np.ndarray: Tableau au format FRAME_DTYPE, ou le tuple (tableau, masque)
+            si keep_invalid est True
+    """
+    raw = frames_view(buffer)
+
+    valid = (
+        (raw["pm1_0"] != PM_WARMUP_VALUE)
+        & (raw["pm2_5"] != PM_WARMUP_VALUE)
+        & (raw["pm10_0"] != PM_WARMUP_VALUE)
+    )
+    if not keep_invalid:
+        raw = raw[valid]
+
+    frames = np.empty(raw.shape, dtype=FRAME_DTYPE)
+    frames["timestamp"] = raw["timestamp"]
+    frames["state"] = raw["state"]
+    frames["command"] = raw["command"]
+    frames["particles_count"] = raw["particles_count"]
+    np.divide(raw["pm1_0"], 10.0, out=frames["pm1_0"])
+    np.divide(raw["pm2_5"], 10.0, out=frames["pm2_5"])
+    np.divide(raw["pm10_0"], 10.0, out=frames["pm10_0"])
+    np.divide(raw["temperature"], 10.0, out=frames["temperature"])
+    np.divide(raw["humidity"], 10.0, out=frames["humidity"])
+    # Limite l'humidité à 100%
+    np.minimum(frames["humidity"], 100.0, out=frames["humidity"])
+
+    if keep_invalid:
+        return frames, valid
+    return frames
+
+def frames_to_dicts(frames):
+    """
+    Convertit un tableau décodé en liste de dictionnaires au format de parse_real_time_data.
+
+    Utile pour comparer les deux décodeurs ou alimenter du code existant;
+    à éviter sur de gros volumes.
+
+    Args:
+        frames (np.ndarray): Tableau au format FRAME_DTYPE
+
+    Returns:
+        list: Liste de dictionnaires
+    """
+    names = FRAME_DTYPE.names
+    return [dict(zip(names, row)) for row in frames.tolist()]
@@ -0,0 +1,274 @@
+"""
+Client PMScan réutilisable, sous forme de flux asynchrone de trames.
+
+    async with PMScanClient(adresse) as client:
+        async for frame in client.stream():
+            print(frame.pm2_5)
+
+Chaque consommateur (chaque appel à stream()) dispose de sa propre file bornée.
+Le callback BLE décode la trame une seule fois puis la dépose dans chaque file,
+sans jamais attendre: un consommateur lent ne retarde ni la réception des
+notifications, ni les autres consommateurs. Quand une file est pleine, sa
+politique de débordement s'applique (voir FrameStream) et les trames écartées
+sont comptées.
+"""
+
+import asyncio
+from collections import deque
+import time
+import weakref
+
+from bleak import BleakClient
+
+from pmscan_reader import (
+    DeviceMetrics,
+    decode_frame,
+    record_dispatch,
+    run_setup,
+    setup_steps,
+    sync_clock,
+)
+
+# Politiques de débordement d'une file pleine
+DROP_OLDEST = "drop_oldest"  # La trame la plus ancienne est écartée
+DROP_NEWEST = "drop_newest"  # La nouvelle trame est écartée
+BLOCK = "block"  # Aucune trame écartée: le surplus attend dans la file d'attente de débordement
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+# Trames en attente au maximum par consommateur
+DEFAULT_STREAM_SIZE = 100
+# Délai maximum pour établir une connexion (secondes)
+CONNECTION_TIMEOUT = 20.0
+
+class FrameStream:
+    """
+    File de trames d'un consommateur, itérable avec async for.
+
+    Avec DROP_OLDEST et DROP_NEWEST, la file ne dépasse jamais maxsize trames.
+    Avec BLOCK, aucune trame n'est perdue: le callback BLE ne pouvant pas
+    attendre, les trames au-delà de maxsize sont gardées dans une file de
+    débordement (comptées dans overflowed) et la mémoire utilisée croît tant
+    que le consommateur est en retard.
+
+    L'itération s'arrête une fois les trames restantes consommées, après la
+    déconnexion du capteur ou un appel à close().
+    """
+
+    def __init__(self, maxsize=DEFAULT_STREAM_SIZE, policy=DROP_OLDEST):
+        """
+        Args:
+            maxsize (int): Nombre maximum de trames en attente
+            policy (str): Politique de débordement (DROP_OLDEST, DROP_NEWEST ou BLOCK)
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Politique de débordement inconnue: {policy} (attendu: {', '.join(POLICIES)})")
+        if maxsize < 1:
+            raise ValueError("La taille de la file doit être d'au moins 1 trame")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.delivered = 0
+        self.dropped = 0
+        self.overflowed = 0
+        self.max_depth = 0
+        self.closed = False
+        self._frames = deque()
+        self._waiter = None
+
+    @property
+    def depth(self):
+        """Nombre de trames en attente."""
+        return len(self._frames)
+
+    def put(self, frame):
+        """Dépose une trame (appelé depuis le callback BLE, n'attend jamais)."""
+        if self.closed:
+            return
+        frames = self._frames
+        if len(frames) >= self.maxsize:
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                return
+            if self.policy == DROP_OLDEST:
+                frames.popleft()
+                self.dropped += 1
+            else:
+                self.overflowed += 1
+        frames.append(frame)
+        if len(frames) > self.max_depth:
+            self.max_depth = len(frames)
+        self._wake()
+
+    def close(self):
+        """Termine le flux: les trames déjà en attente restent lisibles."""
+        self.closed = True
+        self._wake()
+
+    def status(self):
+        """
+        Returns:
+            dict: Profondeur de la file et compteurs du consommateur
+        """
+        return {
+            "policy": self.policy,
+            "maxsize": self.maxsize,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "overflowed": self.overflowed,
+        }
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._frames:
+            if self.closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        self.delivered += 1
+        return self._frames.popleft()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+class PMScanClient:
+    """
+    Connexion à un PMScan, diffusant les trames décodées à des consommateurs
+    indépendants (stream()).
+
+    La mise en place de la connexion est celle du lecteur: abonnements, lecture
+    de la batterie et synchronisation de l'horloge, en parallèle. Le niveau de
+    batterie et l'état de charge sont tenus à jour dans battery_level et
+    charging_state.
+    """
+
+    def __init__(self, address_or_device, stats=False, timeout=CONNECTION_TIMEOUT):
+        """
+        Args:
+            address_or_device (str | BLEDevice): Adresse du capteur ou appareil trouvé par un scan
+            stats (bool): Mesure les trames reçues/rejetées et les latences (metrics)
+            timeout (float): Délai maximum pour établir la connexion (secondes)
+        """
+        self.address = getattr(address_or_device, "address", address_or_device)
+        self.battery_level = None
+        self.charging_state = None
+        self.metrics = DeviceMetrics(self.address) if stats else None
+        # Consommateurs: un flux abandonné sans close() disparaît avec sa dernière référence
+        self._streams = weakref.WeakSet()
+        self._client = BleakClient(
+            address_or_device,
+            timeout=timeout,
+            disconnected_callback=self._disconnected,
+        )
+
+    @property
+    def is_connected(self):
+        """Indique si le capteur est connecté."""
+        return self._client.is_connected
+
+    async def connect(self):
+        """
+        Se connecte au capteur et s'abonne aux notifications. Les erreurs des
+        étapes optionnelles (lecture initiale de la batterie) sont ignorées.
+        """
+        await self._client.connect()
+        if self.metrics is not None:
+            self.metrics.connected()
+        await run_setup(
+            self._client,
+            setup_steps(
+                self._client, self._data_handler, self._battery_handler, self._charging_handler,
+                sync_time=self.metrics is None,
+            ),
+            self.metrics,
+        )
+
+    async def disconnect(self):
+        """Se déconnecte du capteur; les flux se terminent une fois vidés."""
+        try:
+            await self._client.disconnect()
+        finally:
+            self._disconnected(self._client)
+
+    async def sync_clock(self):
+        """
+        Avec stats, remet l'horloge du capteur à l'heure si elle s'écarte trop
+        (voir pmscan_reader.sync_clock).
+
+        Returns:
+            bool: True si l'horloge a été remise à l'heure
+        """
+        if self.metrics is None:
+            return False
+        return await sync_clock(self._client, self.metrics)
+
+    def stream(self, maxsize=DEFAULT_STREAM_SIZE, policy=DROP_OLDEST):
+        """
+        Crée un consommateur des trames reçues à partir de maintenant
+        (flux déjà terminé si le capteur n'est pas connecté).
+
+        Args:
+            maxsize (int): Nombre maximum de trames en attente
+            policy (str): Politique de débordement (DROP_OLDEST, DROP_NEWEST ou BLOCK)
+
+        Returns:
+            FrameStream: Flux de trames décodées (protocol.Frame), à parcourir avec async for
+        """
+        stream = FrameStream(maxsize, policy)
+        if not self.is_connected:
+            stream.close()
+        else:
+            self._streams.add(stream)
+        return stream
+
+    def stream_status(self):
+        """
+        Returns:
+            list: État (FrameStream.status) de chaque consommateur actif
+        """
+        return [stream.status() for stream in self._streams]
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.disconnect()
+
+    def _data_handler(self, sender, data):
+        # Décodage une seule fois, puis simple dépôt dans la file de chaque consommateur
+        metrics = self.metrics
+        parsed_data, start = decode_frame(data, metrics)
+        if parsed_data is None:
+            return
+        if metrics is not None:
+            decoded = time.perf_counter_ns()
+        for stream in self._streams:
+            stream.put(parsed_data)
+        if metrics is not None:
+            record_dispatch(metrics, start, decoded)
+
+    def _battery_handler(self, sender, data):
+        self.battery_level = data[0]
+
+    def _charging_handler(self, sender, data):
+        self.charging_state = data[0]
+
+    def _disconnected(self, _client):
+        if self.metrics is not None and self.metrics.is_connected:
+            self.metrics.disconnected()
+        for stream in list(self._streams):
+            stream.close()
+        self._streams.clear()
@@ -0,0 +1,384 @@
+"""
+Affichage terminal du lecteur PMScan.
+Les callbacks BLE ne font que mettre à jour un instantané partagé (Snapshot).
+L'afficheur (Renderer) tourne dans sa propre tâche asyncio à une fréquence
+plafonnée: il compose l'écran à partir de l'instantané, le compare case par
+case à l'écran précédent et n'envoie au terminal que les cases modifiées.
+L'écriture elle-même se fait hors de la boucle d'événements, de sorte qu'un
+terminal lent (SSH, console série) ne retarde pas la réception des notifications.
+
+Lorsque plusieurs capteurs sont suivis, ils sont affichés côte à côte.
+"""
+
+import asyncio
+import shutil
+import sys
+import time
+
+# Codes couleur ANSI
+RESET = "\033[0m"
+RED = "\033[31m"
+GREEN = "\033[32m"
+YELLOW = "\033[33m"
+CYAN = "\033[36m"
+BOLD = "\033[1m"
+DIM = "\033[2m"
+
+# Fréquence de rafraîchissement par défaut (images par seconde)
+DEFAULT_REFRESH_RATE = 4.0
+# Largeur d'une colonne de capteur et séparateur entre colonnes
+COLUMN_WIDTH = 40
+COLUMN_SEPARATOR = " │ "
+# Recomposition de l'écran même sans nouvelle donnée (indicateurs dépendant du temps)
+IDLE_RECOMPOSE = 1.0
+# Au-delà de ce délai sans mesure, un capteur est signalé comme muet (secondes)
+STALE_AFTER = 15.0
+
+# Style de chaque couleur d'indice de qualité de l'air (voir aqi.py)
+AIR_QUALITY_STYLES = {
+    "Cyan": CYAN,
+    "Verte": GREEN,
+    "Jaune": YELLOW,
+    "Orange": "\033[38;5;208m",
+    "Rouge": RED,
+    "Bordeaux": "\033[38;5;88m",
+    "Violette": "\033[35m",
+}
+
+CHARGING_STATES = {
+    0: ("Non branché", RED),
+    1: ("Pré-charge", YELLOW),
+    2: ("En charge", CYAN),
+    3: ("Chargé", GREEN),
+}
+
+# Libellés des mesures suivies par les statistiques glissantes (µg/m³), courts pour
+# tenir dans une colonne du tableau de bord
+WINDOW_LABELS = {"pm2_5": "PM2.5", "pm10_0": "PM10"}
+
+# Tendance affichée sous les mesures: nombre de trames et caractères, du plus bas au plus haut
+TREND_FRAMES = 30
+TREND_BLOCKS = "▁▂▃▄▅▆▇█"
+
+class DeviceView:
+    """Dernier état connu d'un capteur, tel qu'affiché."""
+
+    def __init__(self, label):
+        self.label = label
+        self.connected = False
+        self.data = None
+        self.status = None
+        self.battery_level = None
+        self.charging_state = None
+        self.last_update = None
+        self.frames = 0
+        self.metrics = None
+        self.windows = None
+        self.history = None
+        # Qualité de l'air de la dernière trame: (description, couleur)
+        self.air_quality = None
+
+class Snapshot:
+    """
+    Instantané partagé entre les callbacks BLE et l'afficheur.
+    Chaque mise à jour incrémente un numéro de version; l'afficheur ne
+    recompose l'écran que si ce numéro a changé.
+    """
+
+    def __init__(self):
+        self.devices = {}
+        self.version = 0
+
+    def device(self, address, label=None):
+        """Renvoie (en le créant si besoin) l'état d'un capteur."""
+        view = self.devices.get(address)
+        if view is None:
+            view = self.devices[address] = DeviceView(label or address)
+            self.version += 1
+        return view
+
+    def update(self, address, **fields):
+        """
+        Met à jour l'état d'un capteur. Appelé depuis les callbacks BLE: ne fait
+        aucune entrée/sortie.
+
+        Args:
+            address (str): Adresse du capteur
+            **fields: Attributs de DeviceView à modifier (data, battery_level...)
+        """
+        view = self.device(address)
+        for name, value in fields.items():
+            setattr(view, name, value)
+        if "data" in fields:
+            view.frames += 1
+            view.last_update = time.monotonic()
+        self.version += 1
+
+def _battery_bar(level):
+    bars = max(0, min(10, int(level / 10)))
+    return "[" + "█" * bars + "░" * (10 - bars) + f"] {level}%"
+
+def device_lines(view):
+    """
+    Compose les lignes affichées pour un capteur.
+
+    Args:
+        view (DeviceView): État du capteur
+
+    Returns:
+        list: Lignes, chacune sous forme de liste de segments (texte, style)
+    """
+    title_style = BOLD if view.connected else DIM
+    lines = [[(view.label, title_style)]]
+
+    if view.battery_level is not None:
+        lines.append([("Batterie: " + _battery_bar(view.battery_level), "")])
+    else:
+        lines.append([("Batterie: -", DIM)])
+    if view.charging_state is not None:
+        text, style = CHARGING_STATES.get(
+            view.charging_state, (f"Inconnu ({view.charging_state})", "")
+        )
+        lines.append([("Charge: ", ""), (text, style)])
+    else:
+        lines.append([("Charge: -", DIM)])
+    lines.append([])
+
+    data = view.data
+    if data is None:
+        lines.append([(view.status or "En attente de données...", DIM)])
+        if view.metrics is not None:
+            lines += stats_lines(view.metrics)
+        return lines
+
+    lines += [
+        [(f"État: 0x{data.state:02X}  Commande: 0x{data.command:02X}", "")],
+        [(f"Particules: {data.particles_count} /ml", "")],
+        [(f"PM1.0:  {data.pm1_0:6.1f} µg/m³", "")],
+        [(f"PM2.5:  {data.pm2_5:6.1f} µg/m³", "")],
+        [(f"PM10.0: {data.pm10_0:6.1f} µg/m³", "")],
+        [(f"Température PCB: {data.temperature:.1f}°C", "")],
+        [(f"Humidité interne: {data.humidity:.1f}%", "")],
+    ]
+    if view.air_quality is not None:
+        text, color = view.air_quality
+        lines.append([(f"Qualité de l'air: {text}", AIR_QUALITY_STYLES.get(color, ""))])
+
+    if view.history is not None and len(view.history) > 1:
+        lines.append([("Tendance PM2.5: ", ""), (trend(view.history.view("pm2_5", TREND_FRAMES)), CYAN)])
+
+    if view.status:
+        lines.append([(view.status, YELLOW)])
+    elif view.last_update and time.monotonic() - view.last_update > STALE_AFTER:
+        lines.append([(f"Aucune mesure depuis {time.monotonic() - view.last_update:.0f} s", RED)])
+    if view.windows is not None:
+        lines += window_lines(view.windows)
+    if view.metrics is not None:
+        lines += stats_lines(view.metrics)
+    return lines
+
+def trend(values):
+    """
+    Compose une mini-courbe (une case par valeur) entre le minimum et le maximum des valeurs.
+
+    Args:
+        values (memoryview): Valeurs, de la plus ancienne à la plus récente
+
+    Returns:
+        str: Mini-courbe
+    """
+    low = min(values)
+    span = max(values) - low
+    top = len(TREND_BLOCKS) - 1
+    if not span:
+        return TREND_BLOCKS[0] * len(values)
+    return "".join(TREND_BLOCKS[(value - low) * top // span] for value in values)
+
+def window_lines(windows):
+    """
+    Compose les lignes des statistiques glissantes d'un capteur (option --windows).
+
+    Args:
+        windows (WindowedStats): Fenêtres glissantes du capteur
+
+    Returns:
+        list: Lignes, chacune sous forme de liste de segments (texte, style)
+    """
+    lines = [[]]
+    for key, key_windows in windows.summary().items():
+        for name, summary in key_windows.items():
+            if not summary["count"]:
+                continue
+            lines.append([(
+                f"{WINDOW_LABELS.get(key, key)} {name}: moy {summary['mean']:.1f} "
+                f"max {summary['max']:.1f} p95 {summary['p95']:.1f}",
+                "",
+            )])
+    return lines
+
+def stats_lines(metrics):
+    """
+    Compose les lignes de statistiques d'un capteur (option --stats).
+
+    Args:
+        metrics (DeviceMetrics): Compteurs du capteur
+
+    Returns:
+        list: Lignes, chacune sous forme de liste de segments (texte, style)
+    """
+    callback = metrics.histograms["callback"]
+    delivery = metrics.delivery
+    return [
+        [],
+        [(f"Trames: {metrics.frames_received} reçues, {metrics.frames_rejected} rejetées, "
+          f"{delivery.frames_missed} perdues", DIM)],
+        [(f"Reconnexions: {metrics.reconnects}  Connecté: {metrics.time_connected:.0f} s", DIM)],
+        [(f"Traitement p95: {callback.percentile(0.95) / 1000:.1f} µs  "
+          f"Livraison p95: {delivery.latency.percentile(0.95) / 1e6:.0f} ms  "
+          f"Horloge: {delivery.offset:+.1f} s", DIM)],
+    ]
+
+def _to_cells(segments, width):
+    """Convertit une ligne de segments en liste de cases (caractère, style) de largeur fixe."""
+    cells = []
+    for text, style in segments:
+        cells.extend((char, style) for char in text)
+    cells = cells[:width]
+    cells.extend([(" ", "")] * (width - len(cells)))
+    return cells
+
+class Renderer:
+    """
+    Afficheur à rafraîchissement différentiel.
+
+    L'écran est modélisé comme une grille de cases (caractère, style). À chaque
+    image, seules les suites de cases modifiées sont réécrites.
+    """
+
+    def __init__(self, snapshot, refresh_rate=DEFAULT_REFRESH_RATE, stream=None,
+                 title="=== PMScan Données en temps réel ===", footer=None):
+        """
+        Args:
+            snapshot (Snapshot): Instantané partagé
+            refresh_rate (float): Nombre maximum d'images par seconde
+            stream: Flux de sortie (par défaut sys.stdout)
+            title (str): Titre affiché en haut de l'écran
+            footer (callable): Fonction sans argument renvoyant les lignes (str)
+                affichées sous les capteurs, par exemple les compteurs d'export
+        """
+        self.snapshot = snapshot
+        self.period = 1.0 / refresh_rate
+        self.stream = stream or sys.stdout
+        self.title = title
+        self.footer = footer
+        self._screen = []
+        self._rendered_version = None
+        self._last_compose = 0.0
+        self._size = None
+        self.frames_rendered = 0
+        self.bytes_written = 0
+
+    def compose(self, width):
+        """
+        Compose l'écran complet à partir de l'instantané.
+
+        Args:
+            width (int): Largeur du terminal
+
+        Returns:
+            list: Lignes de cases (caractère, style)
+        """
+        rows = [_to_cells([(self.title, BOLD)], width), _to_cells([], width)]
+        views = list(self.snapshot.devices.values())
+        per_band = max(1, (width + len(COLUMN_SEPARATOR)) // (COLUMN_WIDTH + len(COLUMN_SEPARATOR)))
+
+        for start in range(0, len(views), per_band):
+            columns = [device_lines(view) for view in views[start:start + per_band]]
+            height = max(len(lines) for lines in columns)
+            separator = _to_cells([(COLUMN_SEPARATOR, DIM)], len(COLUMN_SEPARATOR))
+            for i in range(height):
+                cells = []
+                for index, lines in enumerate(columns):
+                    if index:
+                        cells += separator
+                    cells += _to_cells(lines[i] if i < len(lines) else [], COLUMN_WIDTH)
+                rows.append(cells[:width] + _to_cells([], width - len(cells)))
+            rows.append(_to_cells([], width))
+        if self.footer is not None:
+            rows += [_to_cells([(line, DIM)], width) for line in self.footer()]
+        return rows
+
+    def diff(self, rows):
+        """
+        Calcule les séquences d'échappement qui transforment l'écran précédent en rows.
+
+        Returns:
+            str: Texte à écrire sur le terminal (vide si rien n'a changé)
+        """
+        out = []
+        for y, row in enumerate(rows):
+            old = self._screen[y] if y < len(self._screen) else None
+            x = 0
+            while x < len(row):
+                if old is not None and x < len(old) and old[x] == row[x]:
+                    x += 1
+                    continue
+                # Début d'une suite de cases modifiées
+                out.append(f"\033[{y + 1};{x + 1}H")
+                style = None
+                while x < len(row) and (old is None or x >= len(old) or old[x] != row[x]):
+                    char, cell_style = row[x]
+                    if cell_style != style:
+                        out.append(RESET + cell_style)
+                        style = cell_style
+                    out.append(char)
+                    x += 1
+                out.append(RESET)
+        # Lignes devenues inutiles
+        for y in range(len(rows), len(self._screen)):
+            out.append(f"\033[{y + 1};1H\033[2K")
+        self._screen = rows
+        return "".join(out)
+
+    def render(self):
+        """
+        Produit la mise à jour de l'écran si l'instantané ou la taille du terminal a changé.
+
+        Returns:
+            str: Texte à écrire (vide si rien à faire)
+        """
+        size = shutil.get_terminal_size()
+        now = time.monotonic()
+        prefix = ""
+        if size != self._size:
+            # Changement de taille: effacement complet puis réécriture
+            self._size = size
+            self._screen = []
+            prefix = "\033[2J\033[H"
+        elif (self.snapshot.version == self._rendered_version
+              and now - self._last_compose < IDLE_RECOMPOSE):
+            return ""
+        self._rendered_version = self.snapshot.version
+        self._last_compose = now
+        return prefix + self.diff(self.compose(size.columns))
+
+    def _write(self, text):
+        self.stream.write(text)
+        self.stream.flush()
+
+    async def run(self):
+        """Boucle de rafraîchissement, à lancer comme tâche asyncio."""
+        loop = asyncio.get_running_loop()
+        self._write("\033[?25l")  # Masque le curseur
+        try:
+            while True:
+                started = loop.time()
+                text = self.render()
+                if text:
+                    # Écriture hors de la boucle d'événements
+                    await loop.run_in_executor(None, self._write, text)
+                    self.frames_rendered += 1
+                    self.bytes_written += len(text)
+                await asyncio.sleep(max(0.0, self.period - (loop.time() - started)))
+        finally:
+            self._write(f"\033[{len(self._screen) + 1};1H{RESET}\033[?25h")
@@ -0,0 +1,413 @@
+"""
+Export des mesures PMScan vers des fichiers CSV, JSON Lines ou Parquet.
+
+Les callbacks BLE déposent chaque trame décodée dans une file bornée par
+destination, sans aucune entrée/sortie. Une tâche d'écriture par destination
+vide sa file par lots et écrit dans un thread, hors de la boucle d'événements.
+Les fichiers changent à partir d'une taille ou d'une durée maximum.
+
+Si une file est pleine (disque trop lent), la trame est ignorée pour cette
+destination et comptée; les callbacks ne sont jamais bloqués.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+# Colonnes exportées, dans l'ordre
+FIELDS = (
+    "received",
+    "address",
+    "timestamp",
+    "state",
+    "command",
+    "particles_count",
+    "pm1_0",
+    "pm2_5",
+    "pm10_0",
+    "temperature",
+    "humidity",
+)
+
+# Trames en attente au maximum par destination
+DEFAULT_QUEUE_SIZE = 10_000
+# Nouveau fichier au-delà de cette taille (octets) ou de cette durée (secondes)
+DEFAULT_ROTATE_BYTES = 64 * 1024 * 1024
+DEFAULT_ROTATE_SECONDS = 24 * 3600
+
+def _received_iso(received_ns):
+    """Heure de réception au format ISO 8601 (UTC)."""
+    return datetime.fromtimestamp(received_ns / 1e9, timezone.utc).isoformat(timespec="milliseconds")
+
+class FileSink:
+    """
+    Destination fichier, appelée depuis le thread d'écriture uniquement.
+
+    Les sous-classes définissent l'extension, la taille des lots et
+    l'écriture d'un lot de lignes.
+    """
+
+    name = None
+    suffix = None
+    # Lignes par écriture et délai maximum avant l'écriture d'un lot incomplet
+    batch_rows = 500
+    flush_interval = 2.0
+
+    def __init__(self, directory, rotate_bytes=DEFAULT_ROTATE_BYTES,
+                 rotate_seconds=DEFAULT_ROTATE_SECONDS):
+        """
+        Args:
+            directory (str): Répertoire des fichiers exportés
+            rotate_bytes (int): Taille maximum d'un fichier (0 = sans limite)
+            rotate_seconds (float): Durée maximum d'un fichier (0 = sans limite)
+        """
+        self.directory = directory
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.path = None
+        self.files = 0
+        self._opened_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def write_batch(self, rows):
+        """
+        Écrit un lot de lignes, en changeant de fichier si nécessaire.
+
+        Args:
+            rows (list): Lignes (dict, clés de FIELDS sauf "received", plus "received_ns")
+        """
+        if self.path is None or self._rotation_due():
+            self.close()
+            self._open(self._new_path())
+        self._write_rows(rows)
+
+    def _rotation_due(self):
+        if self.rotate_seconds and time.monotonic() - self._opened_at >= self.rotate_seconds:
+            return True
+        return bool(self.rotate_bytes) and self._size() >= self.rotate_bytes
+
+    def _new_path(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        base = os.path.join(self.directory, f"pmscan-{stamp}")
+        # Index pour garder des noms uniques si plusieurs fichiers naissent la même seconde
+        index = 0
+        path = f"{base}-{index:03d}{self.suffix}"
+        while os.path.exists(path):
+            index += 1
+            path = f"{base}-{index:03d}{self.suffix}"
+        return path
+
+    def _open(self, path):
+        self.path = path
+        self.files += 1
+        self._opened_at = time.monotonic()
+
+    def _size(self):
+        raise NotImplementedError
+
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        """Ferme le fichier courant."""
+        self.path = None
+
+class _TextSink(FileSink):
+    """Destination texte: un lot est formaté en mémoire puis écrit en une fois."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._file = None
+
+    def _open(self, path):
+        super()._open(path)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+
+    def _size(self):
+        return self._file.tell()
+
+    def _write_rows(self, rows):
+        self._file.write(self._format(rows))
+        self._file.flush()
+
+    def _format(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+class CsvSink(_TextSink):
+    """Export CSV, une ligne d'en-tête par fichier."""
+
+    name = "csv"
+    suffix = ".csv"
+
+    def _open(self, path):
+        super()._open(path)
+        self._file.write(",".join(FIELDS) + "\r\n")
+
+    def _format(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(
+            [_received_iso(row["received_ns"]), *(row[field] for field in FIELDS[1:])]
+            for row in rows
+        )
+        return buffer.getvalue()
+
+class JsonLinesSink(_TextSink):
+    """Export JSON Lines, un objet par trame."""
+
+    name = "jsonl"
+    suffix = ".jsonl"
+
+    def _format(self, rows):
+        return "".join(
+            json.dumps(
+                {"received": _received_iso(row["received_ns"]),
+                 **{field: row[field] for field in FIELDS[1:]}},
+                ensure_ascii=False,
+            ) + "\n"
+            for row in rows
+        )
+
+class ParquetSink(FileSink):
+    """
+    Export Parquet: chaque lot devient un groupe de lignes (row group), d'où
+    des lots plus grands que pour les formats texte. Nécessite pyarrow.
+    """
+
+    name = "parquet"
+    suffix = ".parquet"
+    batch_rows = 10_000
+    flush_interval = 60.0
+
+    def __init__(self, *args, **kwargs):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)") from None
+        super().__init__(*args, **kwargs)
+        self._pa = pa
+        self._pq = pq
+        self._schema = pa.schema([
+            ("received", pa.timestamp("ns", tz="UTC")),
+            ("address", pa.string()),
+            ("timestamp", pa.uint32()),
+            ("state", pa.uint8()),
+            ("command", pa.uint8()),
+            ("particles_count", pa.uint16()),
+            ("pm1_0", pa.float32()),
+            ("pm2_5", pa.float32()),
+            ("pm10_0", pa.float32()),
+            ("temperature", pa.float32()),
+            ("humidity", pa.float32()),
+        ])
+        self._writer = None
+
+    def _open(self, path):
+        super()._open(path)
+        self._writer = self._pq.ParquetWriter(path, self._schema)
+
+    def _size(self):
+        return os.path.getsize(self.path)
+
+    def _write_rows(self, rows):
+        columns = {"received": [row["received_ns"] for row in rows]}
+        for field in FIELDS[1:]:
+            columns[field] = [row[field] for row in rows]
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+
+    def close(self):
+        # Le pied de fichier Parquet n'est écrit qu'à la fermeture
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        super().close()
+
+SINKS = {sink.name: sink for sink in (CsvSink, JsonLinesSink, ParquetSink)}
+
+class SinkWriter:
+    """File bornée et tâche d'écriture d'une destination, avec ses compteurs."""
+
+    def __init__(self, sink, queue_size=DEFAULT_QUEUE_SIZE):
+        """
+        Args:
+            sink (FileSink): Destination (fichier, ou Publisher de pmscan_publish)
+            queue_size (int): Nombre maximum de trames en attente
+        """
+        self.sink = sink
+        self.queue = asyncio.Queue(queue_size)
+        self.rows_written = 0
+        self.batches_written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.max_depth = 0
+        self.write_time = 0.0
+        self._started = time.monotonic()
+        # Lot en cours de constitution et écriture en cours (repris à la fermeture)
+        self._batch = []
+        self._writing = None
+
+    def submit(self, row):
+        """Dépose une ligne dans la file (appelé depuis les callbacks BLE)."""
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def run(self):
+        """Vide la file par lots de sink.batch_rows, au plus tard après sink.flush_interval."""
+        loop = asyncio.get_running_loop()
+        queue = self.queue
+        while True:
+            batch = self._batch
+            if getattr(self.sink, "pending", False):
+                # Destination réseau avec des lots en attente: nouvel essai même sans trame
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), self.sink.flush_interval))
+                except asyncio.TimeoutError:
+                    self._writing = asyncio.ensure_future(asyncio.to_thread(self.sink.retry))
+                    try:
+                        await asyncio.shield(self._writing)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        self.errors += 1
+                        self.last_error = str(e)
+                    continue
+            else:
+                batch.append(await queue.get())
+            deadline = loop.time() + self.sink.flush_interval
+            while len(batch) < self.sink.batch_rows:
+                while not queue.empty() and len(batch) < self.sink.batch_rows:
+                    batch.append(queue.get_nowait())
+                timeout = deadline - loop.time()
+                if len(batch) >= self.sink.batch_rows or timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self._batch = []
+            # Une annulation n'interrompt pas l'écriture: close() l'attend
+            self._writing = asyncio.ensure_future(self._write(batch))
+            try:
+                await asyncio.shield(self._writing)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Lot perdu (disque plein...), l'export continue avec les lots suivants
+                self.errors += 1
+                self.last_error = str(e)
+
+    async def _write(self, batch):
+        start = time.perf_counter()
+        await asyncio.to_thread(self.sink.write_batch, batch)
+        self.write_time += time.perf_counter() - start
+        self.rows_written += len(batch)
+        self.batches_written += 1
+
+    async def close(self):
+        """Termine l'écriture en cours, écrit les lignes restantes puis ferme la destination."""
+        if self._writing is not None:
+            await asyncio.gather(self._writing, return_exceptions=True)
+        batch, self._batch = self._batch, []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        if batch:
+            await self._write(batch)
+        await asyncio.to_thread(self.sink.close)
+
+    @property
+    def throughput(self):
+        """Lignes écrites par seconde depuis le démarrage."""
+        elapsed = time.monotonic() - self._started
+        return self.rows_written / elapsed if elapsed > 0 else 0.0
+
+    def status(self):
+        """
+        Returns:
+            str: Résumé des compteurs de la destination
+        """
+        return (
+            f"{self.sink.name}: {self.rows_written} lignes ({self.throughput:.1f}/s), "
+            f"file {self.queue.qsize()}/{self.queue.maxsize} (max {self.max_depth}), "
+            f"{self.dropped} ignorées"
+            + (f", {self.errors} erreurs ({self.last_error})" if self.errors else "")
+            # Destinations réseau: état de la connexion et lots en attente
+            + (f", {self.sink.status()}" if hasattr(self.sink, "status") else "")
+        )
+
+class Exporter:
+    """Diffuse les trames décodées vers toutes les destinations d'export."""
+
+    def __init__(self, specs=(), rotate_bytes=DEFAULT_ROTATE_BYTES,
+                 rotate_seconds=DEFAULT_ROTATE_SECONDS, queue_size=DEFAULT_QUEUE_SIZE, sinks=()):
+        """
+        Args:
+            specs (list): Destinations au format "FORMAT:REPERTOIRE" (csv, jsonl, parquet)
+            rotate_bytes (int): Taille maximum d'un fichier (0 = sans limite)
+            rotate_seconds (float): Durée maximum d'un fichier (0 = sans limite)
+            queue_size (int): Nombre maximum de trames en attente par destination
+            sinks (list): Destinations supplémentaires déjà créées (voir pmscan_publish)
+        """
+        self.writers = []
+        for spec in specs:
+            name, sep, directory = spec.partition(":")
+            if not sep or name not in SINKS or not directory:
+                raise ValueError(
+                    f"Export invalide: {spec} (attendu FORMAT:REPERTOIRE, FORMAT parmi "
+                    f"{', '.join(SINKS)})"
+                )
+            sink = SINKS[name](directory, rotate_bytes=rotate_bytes, rotate_seconds=rotate_seconds)
+            self.writers.append(SinkWriter(sink, queue_size))
+        self.writers += [SinkWriter(sink, queue_size) for sink in sinks]
+        self._tasks = []
+
+    def submit(self, address, parsed_data, received_ns=None):
+        """
+        Dépose une trame décodée dans la file de chaque destination.
+
+        Args:
+            address (str): Adresse du capteur
+            parsed_data (Frame): Trame décodée (parse_real_time_data)
+            received_ns (int): Heure de réception en ns (par défaut, maintenant)
+        """
+        row = parsed_data._asdict()
+        row["address"] = address
+        row["received_ns"] = received_ns if received_ns is not None else time.time_ns()
+        for writer in self.writers:
+            writer.submit(row)
+
+    def start(self):
+        """Lance les tâches d'écriture (dans la boucle d'événements courante)."""
+        self._tasks = [asyncio.create_task(writer.run()) for writer in self.writers]
+
+    async def close(self):
+        """Arrête les tâches d'écriture et écrit les trames restantes."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for writer in self.writers:
+            await writer.close()
+
+    def status_lines(self):
+        """
+        Returns:
+            list: Une ligne de compteurs par destination
+        """
+        return ["Export " + writer.status() for writer in self.writers]
@@ -0,0 +1,398 @@
+"""
+Mode flotte du lecteur PMScan.
+Se connecte simultanément à tous les PMScan à portée (ou à une liste d'adresses)
+sous asyncio. Chaque capteur a sa propre tâche de connexion/reconnexion; le
+nombre de tentatives de connexion simultanées est plafonné par un sémaphore.
+Toutes les mesures sont fusionnées dans un flux de sortie unique, chaque ligne
+étant marquée par l'adresse du capteur. La perte d'un capteur ne bloque pas
+les autres.
+"""
+
+import asyncio
+from functools import partial
+import time
+
+from bleak import BleakClient, BleakScanner
+
+from pmscan_reader import (
+    DEFAULT_HISTORY_HOURS,
+    DEFAULT_SCALE,
+    WINDOW_KEYS,
+    AirQualityEngine,
+    DeviceMetrics,
+    FrameHistory,
+    WindowedStats,
+    decode_frame,
+    evaluate_air_quality,
+    format_history,
+    format_stats,
+    format_windows,
+    history_capacity,
+    record_dispatch,
+    run_setup,
+    setup_steps,
+    sync_clock,
+)
+from pmscan_display import DEFAULT_REFRESH_RATE, Renderer, Snapshot
+from pmscan_scan import DEFAULT_SCAN_TIMEOUT, find_pmscans
+
+# Nom partiel pour identifier un PMScan
+PMSCAN_NAME_PREFIX = "PMScan"
+
+# Nombre maximum de tentatives de connexion simultanées
+DEFAULT_MAX_CONNECTING = 3
+# Délai maximum pour établir une connexion (secondes)
+CONNECTION_TIMEOUT = 20.0
+# Délais de reconnexion: initial et maximum (secondes), doublé à chaque échec
+RECONNECTION_DELAY = 5.0
+MAX_RECONNECTION_DELAY = 120.0
+# Avec --stats: intervalle de vérification de l'horloge des capteurs (secondes)
+CLOCK_CHECK_INTERVAL = 10.0
+
+class FleetDevice:
+    """
+    État d'un capteur de la flotte.
+    Maintient la dernière mesure, l'historique, la batterie et le nombre de reconnexions.
+    """
+
+    def __init__(self, address, name=None):
+        self.address = address
+        self.name = name or address
+        self.connected = False
+        self.reconnects = 0
+        self.battery_level = None
+        self.charging_state = None
+        self.last_data = None
+        self.last_update = None
+        self.metrics = None
+        self.windows = None
+        self.history = None
+        self.air_quality = None
+        # Passe à True à la première connexion réussie: seules les suivantes sont des reconnexions
+        self.was_connected = False
+
+class Fleet:
+    """
+    Gère un ensemble de capteurs PMScan connectés en parallèle.
+
+    Les mesures et événements sont placés dans une file commune sous la forme
+    de tuples (adresse, type, valeur), consommée par une seule tâche de sortie.
+    """
+
+    def __init__(self, max_connecting=DEFAULT_MAX_CONNECTING, output=print, record_dir=None,
+                 snapshot=None, stats=False, windows=False, aqi=DEFAULT_SCALE, exporter=None,
+                 history=DEFAULT_HISTORY_HOURS):
+        """
+        Args:
+            max_connecting (int): Nombre maximum de tentatives de connexion simultanées
+            output (callable): Fonction recevant chaque ligne du flux fusionné
+            record_dir (str): Répertoire d'enregistrement des trames brutes (optionnel)
+            snapshot (Snapshot): Instantané d'affichage à tenir à jour (mode tableau de bord)
+            stats (bool): Mesure les trames reçues/rejetées et les latences de chaque capteur
+            windows (bool): Calcule les statistiques glissantes de chaque capteur
+            aqi (str): Indice de qualité de l'air affiché (voir aqi.SCALES)
+            exporter (Exporter): Export des trames décodées (optionnel, voir pmscan_export)
+            history (float): Durée de l'historique en mémoire de chaque capteur (heures, 0 = aucun)
+        """
+        self.devices = {}
+        self.output = output
+        self.snapshot = snapshot
+        self.stats = stats
+        self.windows = windows
+        self.aqi = aqi
+        self.exporter = exporter
+        self.history = history
+        self.record_dir = record_dir
+        self.recorders = {}
+        self.queue = asyncio.Queue()
+        self._connect_slots = asyncio.Semaphore(max_connecting)
+        self._tasks = []
+
+    def add_device(self, address, name=None):
+        """Ajoute un capteur à la flotte (sans le connecter)."""
+        if address not in self.devices:
+            device = self.devices[address] = FleetDevice(address, name)
+            if self.stats:
+                device.metrics = DeviceMetrics(address)
+            if self.windows:
+                device.windows = WindowedStats(WINDOW_KEYS)
+            if self.history > 0:
+                device.history = FrameHistory(history_capacity(self.history))
+            device.air_quality = AirQualityEngine(self.aqi)
+            if self.snapshot is not None:
+                view = self.snapshot.device(address, f"{name or address}")
+                view.metrics = device.metrics
+                view.windows = device.windows
+                view.history = device.history
+            if self.record_dir:
+                from pmscan_record import Recorder
+                self.recorders[address] = Recorder(self.record_dir, address)
+        return self.devices[address]
+
+    def _make_handlers(self, device):
+        """Crée les callbacks BLE d'un capteur; ils ne font que mettre à jour l'état et la file."""
+
+        recorder = self.recorders.get(device.address)
+        metrics = device.metrics
+        windows = device.windows
+        history = device.history
+        export = partial(self.exporter.submit, device.address) if self.exporter is not None else None
+
+        def data_handler(sender, data):
+            if recorder is not None:
+                recorder.append(data)
+            parsed_data, start = decode_frame(data, metrics)
+            if parsed_data is None:
+                return
+            if metrics is not None:
+                decoded = time.perf_counter_ns()
+            device.last_data = parsed_data
+            device.last_update = time.time()
+            if history is not None:
+                history.append(parsed_data)
+            if windows is not None:
+                windows.add(parsed_data)
+            if export is not None:
+                export(parsed_data)
+            air_quality = evaluate_air_quality(device.air_quality, parsed_data)
+            if self.snapshot is not None:
+                self.snapshot.update(device.address, data=parsed_data, air_quality=air_quality)
+            else:
+                self.queue.put_nowait((device.address, "data", (parsed_data, air_quality[0])))
+            if metrics is not None:
+                record_dispatch(metrics, start, decoded)
+
+        def battery_handler(sender, data):
+            device.battery_level = data[0]
+            if self.snapshot is not None:
+                self.snapshot.update(device.address, battery_level=data[0])
+
+        def charging_handler(sender, data):
+            device.charging_state = data[0]
+            if self.snapshot is not None:
+                self.snapshot.update(device.address, charging_state=data[0])
+
+        return data_handler, battery_handler, charging_handler
+
+    async def _device_loop(self, device):
+        """
+        Boucle de connexion d'un capteur: connexion, abonnement, attente de la
+        déconnexion puis reconnexion avec un délai croissant.
+        """
+        delay = RECONNECTION_DELAY
+        data_handler, battery_handler, charging_handler = self._make_handlers(device)
+
+        while True:
+            disconnected = asyncio.Event()
+            client = BleakClient(
+                device.address,
+                timeout=CONNECTION_TIMEOUT,
+                disconnected_callback=lambda _client: disconnected.set(),
+            )
+            try:
+                # Seule la phase de connexion occupe un créneau
+                async with self._connect_slots:
+                    await client.connect()
+                    if device.metrics is not None:
+                        device.metrics.connected()
+                    # Abonnements, lecture de la batterie et horloge, en parallèle
+                    await run_setup(
+                        client,
+                        setup_steps(
+                            client, data_handler, battery_handler, charging_handler,
+                            sync_time=device.metrics is None,
+                        ),
+                        device.metrics,
+                        on_error=lambda step, e: self.queue.put_nowait(
+                            (device.address, "error", f"{step}: {e}")
+                        ),
+                    )
+
+                device.connected = True
+                if device.was_connected:
+                    device.reconnects += 1
+                device.was_connected = True
+                delay = RECONNECTION_DELAY
+                self.queue.put_nowait((device.address, "connected", None))
+
+                if device.metrics is None:
+                    await disconnected.wait()
+                else:
+                    # L'horloge n'est remise à l'heure que si elle s'écarte trop
+                    while not disconnected.is_set():
+                        try:
+                            await asyncio.wait_for(disconnected.wait(), CLOCK_CHECK_INTERVAL)
+                        except asyncio.TimeoutError:
+                            await sync_clock(client, device.metrics)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.queue.put_nowait((device.address, "error", str(e)))
+            finally:
+                if device.metrics is not None and device.metrics.is_connected:
+                    device.metrics.disconnected()
+                if device.connected:
+                    device.connected = False
+                    self.queue.put_nowait((device.address, "disconnected", None))
+                try:
+                    await client.disconnect()
+                except Exception:
+                    pass
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECTION_DELAY)
+
+    def format_event(self, address, kind, value):
+        """
+        Formate un événement du flux fusionné.
+
+        Returns:
+            str: Ligne marquée par l'heure et l'adresse du capteur
+        """
+        device = self.devices[address]
+        prefix = f"{time.strftime('%H:%M:%S')} [{address}]"
+        if kind == "data":
+            value, air_quality = value
+            battery = f" Bat={device.battery_level}%" if device.battery_level is not None else ""
+            return (
+                f"{prefix} PM1.0={value.pm1_0:.1f} PM2.5={value.pm2_5:.1f} "
+                f"PM10={value.pm10_0:.1f} µg/m³ T={value.temperature:.1f}°C "
+                f"H={value.humidity:.1f}%{battery} Air: {air_quality}"
+            )
+        if kind == "connected":
+            return f"{prefix} Connecté ({device.name})"
+        if kind == "disconnected":
+            return f"{prefix} Déconnecté"
+        return f"{prefix} Erreur: {value}"
+
+    async def _output_loop(self):
+        """Consomme la file commune et écrit le flux fusionné."""
+        while True:
+            address, kind, value = await self.queue.get()
+            if self.snapshot is not None:
+                # Mode tableau de bord: les événements changent l'état affiché
+                if kind in ("connected", "disconnected"):
+                    self.snapshot.update(address, connected=kind == "connected")
+                elif kind == "error":
+                    self.snapshot.update(address, status=f"Erreur: {value}")
+                continue
+            self.output(self.format_event(address, kind, value))
+
+    async def _record_flush_loop(self):
+        """Écrit périodiquement les trames en attente des enregistreurs."""
+        while True:
+            await asyncio.sleep(1)
+            for recorder in self.recorders.values():
+                recorder.flush_if_due()
+
+    async def run(self):
+        """Lance toutes les tâches de la flotte et attend leur fin (Ctrl+C pour arrêter)."""
+        self._tasks = [asyncio.create_task(self._output_loop())]
+        self._tasks += [
+            asyncio.create_task(self._device_loop(device))
+            for device in self.devices.values()
+        ]
+        if self.recorders:
+            self._tasks.append(asyncio.create_task(self._record_flush_loop()))
+        if self.exporter is not None:
+            self.exporter.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            for recorder in self.recorders.values():
+                recorder.close()
+            if self.exporter is not None:
+                await self.exporter.close()
+
+async def discover_pmscans(timeout=DEFAULT_SCAN_TIMEOUT):
+    """
+    Recherche tous les PMScan à portée.
+
+    Args:
+        timeout (float): Durée du scan en secondes
+
+    Returns:
+        list: Liste de tuples (adresse, nom)
+    """
+    devices = await BleakScanner.discover(timeout=timeout)
+    return [
+        (device.address, device.name)
+        for device in devices
+        if device.name and PMSCAN_NAME_PREFIX in device.name
+    ]
+
+async def run_fleet(addresses=None, max_connecting=DEFAULT_MAX_CONNECTING, record_dir=None,
+                    dashboard=False, refresh_rate=DEFAULT_REFRESH_RATE, stats=False,
+                    windows=False, aqi=DEFAULT_SCALE, exporter=None, names=(),
+                    scan_timeout=DEFAULT_SCAN_TIMEOUT, history=DEFAULT_HISTORY_HOURS):
+    """
+    Point d'entrée du mode flotte.
+
+    Args:
+        addresses (list): Adresses des capteurs; si vide, les capteurs nommés par
+            names, ou à défaut tous les PMScan à portée
+        max_connecting (int): Nombre maximum de tentatives de connexion simultanées
+        record_dir (str): Répertoire d'enregistrement des trames brutes (optionnel)
+        dashboard (bool): Affiche les capteurs côte à côte au lieu du flux de lignes
+        refresh_rate (float): Fréquence maximum de rafraîchissement du tableau de bord
+        stats (bool): Affiche les compteurs et latences de chaque capteur
+        windows (bool): Affiche les statistiques glissantes de chaque capteur
+        aqi (str): Indice de qualité de l'air du tableau de bord (voir aqi.SCALES)
+        exporter (Exporter): Export des trames décodées (optionnel, voir pmscan_export)
+        names (list): Noms (ou parties de noms) des capteurs, un capteur par nom
+        scan_timeout (float): Durée maximum du scan (secondes)
+        history (float): Durée de l'historique en mémoire de chaque capteur (heures, 0 = aucun)
+    """
+    snapshot = Snapshot() if dashboard else None
+    fleet = Fleet(max_connecting=max_connecting, record_dir=record_dir, snapshot=snapshot,
+                  stats=stats, windows=windows, aqi=aqi, exporter=exporter, history=history)
+    if addresses:
+        for address in addresses:
+            fleet.add_device(address)
+    elif names:
+        # Le scan s'arrête dès qu'un capteur par nom a été vu
+        print("Recherche des PMScan " + ", ".join(names) + "...")
+        for device in await find_pmscans(names=names, count=len(names), timeout=scan_timeout):
+            fleet.add_device(device.address, device.name)
+    else:
+        print("Recherche des PMScan à portée...")
+        for address, name in await discover_pmscans(scan_timeout):
+            fleet.add_device(address, name)
+
+    if not fleet.devices:
+        print("Aucun PMScan trouvé!")
+        return
+
+    print(f"{len(fleet.devices)} capteur(s): " + ", ".join(fleet.devices))
+    print("Réception des données... (Ctrl+C pour arrêter)")
+    render_task = None
+    if snapshot is not None:
+        renderer = Renderer(
+            snapshot, refresh_rate=refresh_rate,
+            footer=exporter.status_lines if exporter is not None else None,
+        )
+        render_task = asyncio.create_task(renderer.run())
+    try:
+        await fleet.run()
+    finally:
+        if render_task is not None:
+            render_task.cancel()
+            await asyncio.gather(render_task, return_exceptions=True)
+        if stats:
+            for device in fleet.devices.values():
+                print(f"\n=== Statistiques {device.name} ({device.address}) ===")
+                print(format_stats(device.metrics))
+        if windows:
+            for device in fleet.devices.values():
+                print(f"\n=== Statistiques glissantes {device.name} ({device.address}), µg/m³ ===")
+                print(format_windows(device.windows))
+        if history > 0:
+            for device in fleet.devices.values():
+                print(f"\n=== Historique {device.name} ({device.address}) ===")
+                print(format_history(device.history))
+        if exporter is not None:
+            print("\n=== Export ===")
+            print("\n".join(exporter.status_lines()))
@@ -0,0 +1,291 @@
+"""
+Téléchargement de l'historique stocké dans la mémoire du PMScan.
+Lorsque le capteur n'est pas connecté, il enregistre ses mesures en mémoire.
+Ce module active les notifications de MEMORY_DATA_UUID, reçoit les
+enregistrements (même format de 20 bytes que les données temps réel) et les
+écrit sur disque par lots, avec un curseur de reprise: le nombre
+d'enregistrements de la mémoire déjà traités est conservé, et le transfert
+suivant écarte ce nombre d'enregistrements en tête de la mémoire reçue.
+Le transfert se termine lorsque le capteur n'envoie plus rien pendant
+idle_timeout secondes.
+
+Le client BLE est passé en paramètre (BleakClient ou tout objet exposant
+start_notify/stop_notify), ce qui permet de tester le transfert avec un faux
+client GATT.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+
+# Module sans dépendance Home Assistant partagé avec l'intégration
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_components", "pmscan"))
+from protocol import FRAME_SIZE, MEMORY_DATA_UUID  # noqa: E402
+
+# Taille d'un enregistrement mémoire (identique à une trame temps réel)
+RECORD_SIZE = FRAME_SIZE
+
+# Nombre d'enregistrements accumulés avant chaque écriture sur disque
+DEFAULT_FLUSH_RECORDS = 256
+# Délai sans notification au-delà duquel le transfert est considéré terminé (secondes)
+DEFAULT_IDLE_TIMEOUT = 5.0
+# Intervalle entre deux affichages du débit (secondes)
+PROGRESS_INTERVAL = 1.0
+
+class MemoryCursor:
+    """
+    Curseur de reprise d'un téléchargement mémoire.
+    Il est stocké dans un petit fichier JSON à côté du fichier de sortie et
+    n'est mis à jour qu'après l'écriture effective des enregistrements.
+
+    records compte les enregistrements du fichier de sortie, offset les
+    enregistrements de la mémoire du capteur déjà traités (écrits ou écartés),
+    last_timestamp l'horodatage du dernier d'entre eux.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self.offset = 0
+        self.last_timestamp = None
+
+    def load(self):
+        """Charge le curseur depuis le disque s'il existe."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return self
+        self.records = int(state.get("records", 0))
+        # Curseurs antérieurs sans rang: lecture depuis le début
+        self.offset = int(state.get("offset", 0))
+        self.last_timestamp = state.get("last_timestamp")
+        return self
+
+    def save(self):
+        """Enregistre le curseur de façon atomique (fichier temporaire puis renommage)."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "records": self.records,
+                "offset": self.offset,
+                "last_timestamp": self.last_timestamp,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+class MemoryDump:
+    """
+    Télécharge la mémoire du PMScan vers un fichier binaire d'enregistrements de 20 bytes.
+
+    Le fichier produit peut être relu directement avec pmscan_batch.decode_frames.
+    """
+
+    def __init__(self, client, output_path, cursor_path=None,
+                 flush_records=DEFAULT_FLUSH_RECORDS, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 progress=None):
+        """
+        Args:
+            client: Client GATT connecté (BleakClient ou équivalent)
+            output_path (str): Fichier binaire de sortie
+            cursor_path (str): Fichier du curseur de reprise (par défaut output_path + ".cursor")
+            flush_records (int): Nombre d'enregistrements par écriture disque
+            idle_timeout (float): Délai sans données marquant la fin du transfert
+            progress (callable): Fonction appelée avec les statistiques pendant le transfert
+        """
+        self.client = client
+        self.output_path = output_path
+        self.cursor = MemoryCursor(cursor_path or output_path + ".cursor")
+        self.flush_records = flush_records
+        self.idle_timeout = idle_timeout
+        self.progress = progress
+
+        self._pending = bytearray()
+        self._data_event = asyncio.Event()
+        self._finished = False
+        # Rang dans la mémoire du capteur du prochain enregistrement reçu (depuis 0)
+        self._index = 0
+        # Enregistrements de tête déjà traités lors d'un transfert précédent
+        self._start = 0
+        # Enregistrements écartés mais plus récents que le curseur, repris si la
+        # mémoire ne correspond plus au curseur
+        self._held = []
+        self._last_timestamp = None
+
+        self.records_received = 0
+        self.records_written = 0
+        self.records_skipped = 0
+        self.bytes_received = 0
+        self.start_time = None
+        # La mémoire ne correspond plus au curseur (effacée ou réécrite)
+        self.memory_changed = False
+
+    def _notification_handler(self, sender, data):
+        """Accumule les données reçues; le découpage et l'écriture se font hors du callback."""
+        if not data:
+            self._finished = True
+        else:
+            self._pending += data
+            self.bytes_received += len(data)
+        self._data_event.set()
+
+    def stats(self):
+        """
+        Renvoie les statistiques du transfert en cours.
+
+        Returns:
+            dict: Enregistrements reçus/écrits/ignorés, octets reçus, durée et débits
+        """
+        elapsed = time.monotonic() - self.start_time if self.start_time else 0.0
+        return {
+            "records_received": self.records_received,
+            "records_written": self.records_written,
+            "records_skipped": self.records_skipped,
+            "memory_changed": self.memory_changed,
+            "bytes_received": self.bytes_received,
+            "elapsed": elapsed,
+            "records_per_second": self.records_received / elapsed if elapsed else 0.0,
+            "bytes_per_second": self.bytes_received / elapsed if elapsed else 0.0,
+        }
+
+    def _resume(self, output):
+        """Ramène le fichier de sortie à la position du curseur (écritures partielles éliminées)."""
+        self.cursor.load()
+        output.truncate(self.cursor.records * RECORD_SIZE)
+        output.seek(0, os.SEEK_END)
+        self._start = self.cursor.offset
+        self._last_timestamp = self.cursor.last_timestamp
+
+    def _memory_changed(self):
+        """
+        La mémoire ne correspond plus au curseur: les enregistrements écartés
+        par leur rang mais plus récents que le curseur sont finalement conservés.
+
+        Returns:
+            list: Enregistrements repris
+        """
+        self.memory_changed = True
+        held, self._held = self._held, []
+        self.records_skipped -= len(held)
+        self._start = 0
+        return held
+
+    def _take_records(self):
+        """
+        Extrait les enregistrements complets du tampon de réception.
+
+        Returns:
+            list: Enregistrements de 20 bytes à écrire
+        """
+        complete = len(self._pending) - len(self._pending) % RECORD_SIZE
+        chunk = bytes(self._pending[:complete])
+        del self._pending[:complete]
+
+        records = []
+        last_timestamp = self._last_timestamp
+        for offset in range(0, len(chunk), RECORD_SIZE):
+            record = chunk[offset:offset + RECORD_SIZE]
+            self.records_received += 1
+            index = self._index
+            self._index += 1
+            if index >= self._start:
+                records.append(record)
+                continue
+            # Enregistrements déjà traités lors d'un transfert précédent, écartés selon leur rang
+            self.records_skipped += 1
+            timestamp = struct.unpack_from("<I", record)[0]
+            if last_timestamp is None or timestamp > last_timestamp:
+                self._held.append(record)
+            # Contrôle de cohérence: le dernier enregistrement écarté doit être le dernier
+            # du transfert précédent, sinon la mémoire a changé depuis
+            if index == self._start - 1 and last_timestamp is not None and timestamp != last_timestamp:
+                records.extend(self._memory_changed())
+            elif index == self._start - 1:
+                self._held.clear()
+        return records
+
+    def _flush(self, output, batch):
+        """Écrit un lot d'enregistrements puis avance le curseur."""
+        if not batch:
+            return
+        output.write(b"".join(batch))
+        output.flush()
+        os.fsync(output.fileno())
+        self.records_written += len(batch)
+        self.cursor.records += len(batch)
+        self.cursor.offset = self._index
+        self.cursor.last_timestamp = self._last_timestamp = struct.unpack_from("<I", batch[-1])[0]
+        self.cursor.save()
+        batch.clear()
+
+    async def run(self):
+        """
+        Lance le téléchargement et attend sa fin.
+
+        Returns:
+            dict: Statistiques finales du transfert (voir stats())
+        """
+        mode = "r+b" if os.path.exists(self.output_path) else "w+b"
+        with open(self.output_path, mode) as output:
+            self._resume(output)
+            self.start_time = time.monotonic()
+            last_progress = self.start_time
+            batch = []
+            complete = False
+
+            await self.client.start_notify(MEMORY_DATA_UUID, self._notification_handler)
+            try:
+                while not self._finished:
+                    try:
+                        await asyncio.wait_for(self._data_event.wait(), self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        # Plus aucune donnée: toute la mémoire a été reçue
+                        break
+                    self._data_event.clear()
+
+                    batch.extend(self._take_records())
+                    if len(batch) >= self.flush_records:
+                        self._flush(output, batch)
+
+                    now = time.monotonic()
+                    if self.progress and now - last_progress >= PROGRESS_INTERVAL:
+                        self.progress(self.stats())
+                        last_progress = now
+                complete = True
+            finally:
+                batch.extend(self._take_records())
+                if complete and self._index < self._start:
+                    # Mémoire plus courte que le curseur: elle a été effacée depuis
+                    batch.extend(self._memory_changed())
+                self._flush(output, batch)
+                if complete and self.cursor.offset != self._index:
+                    # Enregistrements de fin tous écartés: le curseur suit la mémoire reçue
+                    self.cursor.offset = self._index
+                    self.cursor.save()
+                try:
+                    await self.client.stop_notify(MEMORY_DATA_UUID)
+                except Exception:
+                    pass
+
+        return self.stats()
+
+def format_dump_stats(stats):
+    """
+    Formate les statistiques d'un transfert pour l'affichage.
+
+    Args:
+        stats (dict): Statistiques renvoyées par MemoryDump.stats()
+
+    Returns:
+        str: Ligne de texte lisible
+    """
+    line = (
+        f"{stats['records_written']} enregistrements écrits "
+        f"({stats['records_skipped']} déjà présents) en {stats['elapsed']:.1f} s - "
+        f"{stats['records_per_second']:.0f} enr/s, {stats['bytes_per_second']:.0f} octets/s"
+    )
+    if stats.get("memory_changed"):
+        line += " - attention: mémoire du capteur effacée ou réécrite depuis le dernier transfert"
+    return line
@@ -0,0 +1,387 @@
+"""
+Publication des mesures PMScan vers une base de séries temporelles.
+
+Les trames de tous les capteurs sont regroupées en lots au format « line
+protocol » d'InfluxDB, envoyés soit par HTTP (API d'écriture d'InfluxDB 1.x/2.x,
+ou tout service compatible), soit en messages MQTT (par exemple vers Telegraf).
+Les publicateurs s'utilisent comme les destinations de pmscan_export: file
+bornée, lots par taille ou par durée et envoi dans un thread, avec une seule
+connexion réutilisée d'un lot à l'autre.
+
+Quand le serveur est injoignable, les lots sont mis en attente sur disque
+(spool) puis renvoyés dans l'ordre dès qu'il répond à nouveau.
+"""
+
+import base64
+import gzip
+import http.client
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+# Répertoire par défaut des lots en attente
+DEFAULT_SPOOL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pmscan", "spool")
+# Taille maximum des lots en attente sur disque (les plus anciens sont supprimés au-delà)
+DEFAULT_SPOOL_BYTES = 256 * 1024 * 1024
+# Délai avant une nouvelle tentative après un échec, doublé à chaque échec
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+# Lots en attente renvoyés au plus à chaque nouveau lot
+REPLAY_BATCHES = 10
+
+MEASUREMENT = "pmscan"
+# Champs publiés: (clé de la trame, nom du champ, entier)
+LINE_FIELDS = (
+    ("particles_count", "particles_count", True),
+    ("pm1_0", "pm1_0", False),
+    ("pm2_5", "pm2_5", False),
+    ("pm10_0", "pm10_0", False),
+    ("temperature", "temperature", False),
+    ("humidity", "humidity", False),
+    ("state", "state", True),
+    ("command", "command", True),
+    ("timestamp", "device_time", True),
+)
+
+_TAG_ESCAPE = re.compile(r"([,= \\])")
+
+def _escape_tag(value):
+    """Échappe une clé ou une valeur d'étiquette du line protocol."""
+    return _TAG_ESCAPE.sub(r"\\\1", str(value))
+
+class Publisher:
+    """
+    Publicateur line protocol, appelé depuis le thread d'écriture uniquement.
+
+    Les sous-classes définissent la connexion et l'envoi d'un lot; une erreur
+    OSError (ConnectionError...) signale un serveur injoignable et met le lot
+    en attente sur disque, toute autre erreur fait perdre le lot.
+    """
+
+    name = None
+    # Lignes par lot et délai maximum avant l'envoi d'un lot incomplet
+    batch_rows = 5000
+    flush_interval = 1.0
+
+    def __init__(self, url, spool_dir=DEFAULT_SPOOL_DIR, spool_bytes=DEFAULT_SPOOL_BYTES,
+                 measurement=MEASUREMENT):
+        """
+        Args:
+            url (str): Adresse du serveur
+            spool_dir (str): Répertoire des lots en attente (un sous-répertoire par serveur)
+            spool_bytes (int): Taille maximum des lots en attente
+            measurement (str): Nom de la mesure InfluxDB
+        """
+        self.url = url
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.username = parts.username
+        self.password = parts.password
+        self.path = parts.path
+        self.query = parts.query
+        self.measurement = _escape_tag(measurement)
+        self.batches_sent = 0
+        self.batches_spooled = 0
+        self.batches_replayed = 0
+        self.spool_dropped = 0
+        self.connected = False
+        self._prefixes = {}
+        self._retry_delay = RETRY_DELAY
+        self._retry_at = 0.0
+
+        # Sous-répertoire propre au serveur, sans les identifiants
+        self.spool_dir = os.path.join(
+            spool_dir, re.sub(r"[^\w.-]+", "_", f"{parts.scheme}_{parts.hostname}_{parts.port}{parts.path}")
+        )
+        self.spool_bytes = spool_bytes
+        os.makedirs(self.spool_dir, exist_ok=True)
+        # Lots laissés en attente par une exécution précédente
+        self._spool = sorted(
+            entry.name for entry in os.scandir(self.spool_dir) if entry.name.endswith(".lp")
+        )
+        self._spool_size = sum(
+            os.path.getsize(os.path.join(self.spool_dir, name)) for name in self._spool
+        )
+
+    def format_lines(self, rows):
+        """
+        Formate un lot de trames en line protocol.
+
+        Args:
+            rows (list): Lignes (dict) de pmscan_export.Exporter
+
+        Returns:
+            bytes: Une ligne par trame, horodatée à la réception (ns)
+        """
+        prefixes = self._prefixes
+        lines = []
+        for row in rows:
+            prefix = prefixes.get(row["address"])
+            if prefix is None:
+                prefix = prefixes[row["address"]] = (
+                    f"{self.measurement},address={_escape_tag(row['address'])} "
+                )
+            lines.append(
+                prefix
+                + ",".join(
+                    f"{field}={row[key]}i" if integer else f"{field}={row[key]}"
+                    for key, field, integer in LINE_FIELDS
+                )
+                + f" {row['received_ns']}\n"
+            )
+        return "".join(lines).encode()
+
+    def write_batch(self, rows):
+        """
+        Envoie un lot, précédé des lots en attente; le met en attente si le serveur est injoignable.
+
+        Args:
+            rows (list): Lignes (dict) de pmscan_export.Exporter
+        """
+        payload = self.format_lines(rows)
+        if time.monotonic() < self._retry_at:
+            self._spool_payload(payload)
+            return
+        try:
+            self._replay()
+            # S'il reste des lots plus anciens, celui-ci passe après eux
+            if not self._spool:
+                self._send(payload)
+        except OSError:
+            self._failed()
+            self._spool_payload(payload)
+            return
+        self._succeeded()
+        if self._spool:
+            self._spool_payload(payload)
+        else:
+            self.batches_sent += 1
+
+    @property
+    def pending(self):
+        """Vrai tant que des lots sont en attente sur disque."""
+        return bool(self._spool)
+
+    def retry(self):
+        """Renvoie des lots en attente sans nouveau lot (appelé quand la file reste vide)."""
+        if not self._spool or time.monotonic() < self._retry_at:
+            return
+        try:
+            self._replay()
+        except OSError:
+            self._failed()
+            return
+        self._succeeded()
+
+    def _replay(self):
+        """Renvoie les plus anciens lots en attente (au plus REPLAY_BATCHES)."""
+        for _ in range(min(REPLAY_BATCHES, len(self._spool))):
+            path = os.path.join(self.spool_dir, self._spool[0])
+            with open(path, "rb") as f:
+                payload = f.read()
+            try:
+                self._send(payload)
+            except ValueError:
+                # Lot refusé par le serveur: il ne doit pas bloquer les suivants
+                self.spool_dropped += 1
+            else:
+                self.batches_replayed += 1
+            self._spool.pop(0)
+            self._spool_size -= len(payload)
+            os.remove(path)
+
+    def _spool_payload(self, payload):
+        """Écrit un lot en attente sur disque, en supprimant les plus anciens au-delà de spool_bytes."""
+        while self._spool and self._spool_size + len(payload) > self.spool_bytes:
+            path = os.path.join(self.spool_dir, self._spool.pop(0))
+            self._spool_size -= os.path.getsize(path)
+            os.remove(path)
+            self.spool_dropped += 1
+        name = f"{time.time_ns():020d}.lp"
+        path = os.path.join(self.spool_dir, name)
+        # Écriture atomique: un lot n'est jamais relu à moitié écrit
+        with open(path + ".tmp", "wb") as f:
+            f.write(payload)
+        os.replace(path + ".tmp", path)
+        self._spool.append(name)
+        self._spool_size += len(payload)
+        self.batches_spooled += 1
+
+    def _failed(self):
+        self.connected = False
+        self._disconnect()
+        self._retry_at = time.monotonic() + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, MAX_RETRY_DELAY)
+
+    def _succeeded(self):
+        self.connected = True
+        self._retry_delay = RETRY_DELAY
+
+    def status(self):
+        """
+        Returns:
+            str: État de la connexion et des lots en attente
+        """
+        state = "connecté" if self.connected else "déconnecté"
+        text = f"{state}, {self.batches_sent} lots envoyés"
+        if self._spool or self.batches_spooled or self.batches_replayed:
+            text += (
+                f", {len(self._spool)} en attente ({self._spool_size / 1024:.0f} ko), "
+                f"{self.batches_replayed} renvoyés"
+            )
+        if self.spool_dropped:
+            text += f", {self.spool_dropped} abandonnés"
+        return text
+
+    def close(self):
+        """Tente d'envoyer les lots en attente, puis ferme la connexion."""
+        if self._spool and time.monotonic() >= self._retry_at:
+            try:
+                self._replay()
+            except OSError:
+                pass
+        self._disconnect()
+
+    def _send(self, payload):
+        raise NotImplementedError
+
+    def _disconnect(self):
+        raise NotImplementedError
+
+class InfluxPublisher(Publisher):
+    """
+    Publication par l'API HTTP d'écriture d'InfluxDB, sur une connexion persistante.
+
+    L'adresse est celle de l'API d'écriture, par exemple
+    http://serveur:8086/api/v2/write?org=ORG&bucket=BUCKET (2.x) ou
+    http://serveur:8086/write?db=BASE (1.x). Les lots sont compressés en gzip.
+    """
+
+    name = "influx"
+    timeout = 10.0
+
+    def __init__(self, url, token=None, **kwargs):
+        """
+        Args:
+            url (str): Adresse http(s) de l'API d'écriture
+            token (str): Jeton d'API (en-tête Authorization: Token)
+        """
+        super().__init__(url, **kwargs)
+        self.https = urlsplit(url).scheme == "https"
+        self.headers = {"Content-Type": "text/plain; charset=utf-8", "Content-Encoding": "gzip"}
+        if token:
+            self.headers["Authorization"] = f"Token {token}"
+        elif self.username:
+            credentials = f"{self.username}:{self.password or ''}".encode()
+            self.headers["Authorization"] = "Basic " + base64.b64encode(credentials).decode()
+        self.target = (self.path or "/") + (f"?{self.query}" if self.query else "")
+        self._connection = None
+
+    def _send(self, payload):
+        body = gzip.compress(payload, 1)
+        reused = self._connection is not None
+        if not reused:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._connection = connection_class(self.host, self.port, timeout=self.timeout)
+        try:
+            self._connection.request("POST", self.target, body, self.headers)
+            response = self._connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._disconnect()
+            if reused:
+                # Connexion inactive fermée par le serveur: un seul nouvel essai
+                return self._send(payload)
+            raise ConnectionError(str(e)) from e
+        if response.status == 429 or response.status >= 500:
+            # Serveur surchargé ou indisponible: le lot sera renvoyé
+            raise ConnectionError(f"HTTP {response.status}")
+        if response.status >= 300:
+            # Requête refusée (authentification, format...): la renvoyer ne servirait à rien
+            raise ValueError(f"HTTP {response.status}: {content[:200].decode(errors='replace')}")
+
+    def _disconnect(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+class MqttPublisher(Publisher):
+    """
+    Publication MQTT: un message line protocol par lot (QoS 1), sur le sujet
+    donné par le chemin de l'adresse, par exemple mqtt://serveur:1883/capteurs/pmscan.
+
+    Nécessite paho-mqtt.
+    """
+
+    name = "mqtt"
+    timeout = 10.0
+
+    def __init__(self, url, **kwargs):
+        """
+        Args:
+            url (str): Adresse mqtt://[utilisateur:mot_de_passe@]serveur[:port]/sujet
+        """
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            raise ImportError("La publication MQTT nécessite paho-mqtt (pip install paho-mqtt)") from None
+        super().__init__(url, **kwargs)
+        self._mqtt = mqtt
+        self.port = self.port or 1883
+        self.topic = self.path.strip("/") or MEASUREMENT
+        self._client = None
+
+    def _send(self, payload):
+        mqtt = self._mqtt
+        try:
+            if self._client is None:
+                if hasattr(mqtt, "CallbackAPIVersion"):
+                    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+                else:
+                    client = mqtt.Client()
+                if self.username:
+                    client.username_pw_set(self.username, self.password)
+                client.connect(self.host, self.port)
+                # Boucle réseau de paho dans son propre thread (keepalive, accusés de réception)
+                client.loop_start()
+                self._client = client
+            info = self._client.publish(self.topic, payload, qos=1)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                raise ConnectionError(mqtt.error_string(info.rc))
+            info.wait_for_publish(self.timeout)
+            if not info.is_published():
+                raise ConnectionError("accusé de réception MQTT non reçu")
+        except (RuntimeError, ValueError) as e:
+            # paho signale ainsi une publication sans connexion
+            raise ConnectionError(str(e)) from e
+
+    def _disconnect(self):
+        if self._client is not None:
+            self._client.loop_stop()
+            self._client.disconnect()
+            self._client = None
+
+PUBLISHERS = {"http": InfluxPublisher, "https": InfluxPublisher, "mqtt": MqttPublisher}
+
+def make_publisher(url, spool_dir=DEFAULT_SPOOL_DIR, token=None):
+    """
+    Crée le publicateur correspondant au schéma d'une adresse.
+
+    Args:
+        url (str): Adresse http(s):// (InfluxDB) ou mqtt://
+        spool_dir (str): Répertoire des lots en attente
+        token (str): Jeton d'API InfluxDB (optionnel)
+
+    Returns:
+        Publisher: Publicateur, à passer à pmscan_export.Exporter
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in PUBLISHERS or not parts.hostname:
+        raise ValueError(
+            f"Publication invalide: {url} (attendu http(s)://serveur/... ou mqtt://serveur/sujet)"
+        )
+    if PUBLISHERS[parts.scheme] is InfluxPublisher:
+        return InfluxPublisher(url, token=token, spool_dir=spool_dir)
+    return MqttPublisher(url, spool_dir=spool_dir)
@@ -5,105 +5,103 @@ Il affiche les mesures de qualité d'air (PM1.0, PM2.5, PM10.0), la température
 l'état de la batterie et la qualité de l'air avec un code couleur correspondant à la LED du capteur.
 """
 
+import argparse
 import asyncio
 from bleak import BleakClient, BleakScanner
+from functools import partial
+import os
 import struct
+import sys
 import time
 
-# UUIDs des caractéristiques BLE du PMScan
-# Format: Base UUID = f3641900-00b0-4240-ba50-05ca45bf8abc
-# Les autres UUIDs suivent le même format en incrémentant les 2 derniers chiffres de la première partie
-PMSCAN_SERVICE_UUID = "f3641900-00b0-4240-ba50-05ca45bf8abc"  # Service principal
-REAL_TIME_DATA_UUID = "f3641901-00b0-4240-ba50-05ca45bf8abc"  # Données temps réel (20 bytes)
-MEMORY_DATA_UUID = "f3641902-00b0-4240-ba50-05ca45bf8abc"     # Données en mémoire
-TEMP_HUMID_ALERT_UUID = "f3641903-00b0-4240-ba50-05ca45bf8abc"  # Alertes température/humidité
-BATTERY_LEVEL_UUID = "f3641904-00b0-4240-ba50-05ca45bf8abc"   # Niveau batterie (%)
-BATTERY_CHARGING_UUID = "f3641905-00b0-4240-ba50-05ca45bf8abc"  # État de charge (0-3)
-CURRENT_TIME_UUID = "f3641906-00b0-4240-ba50-05ca45bf8abc"    # Configuration horloge (timestamp)
-ACQUISITION_INTERVAL_UUID = "f3641907-00b0-4240-ba50-05ca45bf8abc"  # Intervalle d'acquisition
-POWER_MODE_UUID = "f3641908-00b0-4240-ba50-05ca45bf8abc"      # Mode de fonctionnement
-TEMP_HUMID_THRESHOLD_UUID = "f3641909-00b0-4240-ba50-05ca45bf8abc"  # Seuils température/humidité
-DISPLAY_SETTINGS_UUID = "f364190a-00b0-4240-ba50-05ca45bf8abc"  # Configuration affichage
-BATTERY_HEARTBEAT_UUID = "f364190b-00b0-4240-ba50-05ca45bf8abc"  # Batterie heartbeat
-
-# États possibles de la charge de la batterie
-BATTERY_STATES = {
-    0: "Non branché",    # Pas de chargeur connecté
-    1: "Pré-charge",     # Phase initiale de charge
-    2: "En charge",      # Charge normale en cours
-    3: "Chargé"         # Charge complète
-}
-
-# Seuils de qualité de l'air pour PM10 (en µg/m³)
-AIR_QUALITY_THRESHOLDS = {
-    10: ("EXCELLENTE", "\033[32m", "Verte"),     # < 10 µg/m³
-    30: ("BONNE", "\033[33m", "Jaune"),          # < 30 µg/m³
-    50: ("MOYENNE", "\033[38;5;208m", "Orange"), # < 50 µg/m³
-    80: ("MAUVAISE", "\033[31m", "Rouge"),       # < 80 µg/m³
-    float('inf'): ("TRÈS MAUVAISE", "\033[35m", "Violette")  # ≥ 80 µg/m³
-}
-
-def parse_real_time_data(data):
+from pmscan_display import AIR_QUALITY_STYLES, WINDOW_LABELS, Renderer, Snapshot, window_lines
+from pmscan_export import DEFAULT_QUEUE_SIZE, DEFAULT_ROTATE_BYTES, DEFAULT_ROTATE_SECONDS, SINKS, Exporter
+from pmscan_memory import MemoryDump, format_dump_stats
+from pmscan_publish import DEFAULT_SPOOL_DIR, make_publisher
+from pmscan_scan import DEFAULT_SCAN_TIMEOUT, DeviceCache, connect_pmscan
+
+# Modules sans dépendance Home Assistant partagés avec l'intégration (en fin de
+# sys.path: ils ne masquent pas un paquet installé du même nom)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_components", "pmscan"))
+from metrics import DeviceMetrics  # noqa: E402
+from protocol import (  # noqa: E402
+    BATTERY_CHARGING_UUID,
+    BATTERY_LEVEL_UUID,
+    CURRENT_TIME_UUID,
+    FRAME_SIZE,
+    PMSCAN_SERVICE_UUID,
+    REAL_TIME_DATA_UUID,
+    decode_frame as decode_protocol_frame,
+)
+from setup_plan import SetupStep, plan_concurrency, run_plan  # noqa: E402
+from aqi import DEFAULT_SCALE, LED_SCALE, SCALES, AirQualityEngine, describe  # noqa: E402
+from history import FrameHistory, history_capacity  # noqa: E402
+from windows import WindowedStats  # noqa: E402
+
+# Mesures suivies par les statistiques glissantes (option --windows)
+WINDOW_KEYS = ("pm2_5", "pm10_0")
+# Durée de l'historique en mémoire de chaque capteur (heures): désactivé par défaut,
+# durée retenue pour --history sans valeur
+DEFAULT_HISTORY_HOURS = 0.0
+HISTORY_HOURS = 24.0
+
+# État partagé entre les callbacks BLE et l'afficheur (mode un seul capteur)
+snapshot = Snapshot()
+DEFAULT_DEVICE = "pmscan"
+
+class ReaderSession:
+    """
+    Traitements actifs du capteur suivi (mode un seul capteur), selon les
+    options: configurés par main, utilisés par notification_handler.
+    """
+
+    def __init__(self):
+        self.recorder = None
+        self.metrics = None
+        self.windows = None
+        self.history = None
+        self.export = None
+        self.air_quality = None
+
+session = ReaderSession()
+
+def parse_real_time_data(data, verbose=True):
     """
     Parse les données reçues du capteur PMScan.
-    
-    Format des données (20 bytes):
-    - Timestamp (4 bytes): Horodatage Unix
-    - State (1 byte): État du capteur
-    - Command (1 byte): Commande en cours
-    - Particles count (2 bytes): Nombre de particules par ml
-    - PM1.0 (2 bytes): Concentration en µg/m³ (divisé par 10)
-    - PM2.5 (2 bytes): Concentration en µg/m³ (divisé par 10)
-    - PM10.0 (2 bytes): Concentration en µg/m³ (divisé par 10)
-    - Temperature (2 bytes): Température en °C (divisé par 10)
-    - Humidity (2 bytes): Humidité en % (divisé par 10)
-    - Reserved (2 bytes): Non utilisé
-    
+
+    Le format des 20 bytes et le décodage sont ceux du module protocol, partagé
+    avec l'intégration Home Assistant (protocol.FRAME).
+
+    Args:
+        data (bytes): Trame de 20 bytes
+        verbose (bool): Affiche les données brutes et les avertissements
+
     Returns:
-        dict: Données parsées ou None si erreur
+        Frame: Données parsées (protocol.Frame) ou None si erreur
     """
     # Vérification de la taille des données
-    if len(data) != 20:
-        print(f"ERREUR: Taille des données invalide: {len(data)} bytes (attendu: 20 bytes)")
+    if len(data) != FRAME_SIZE:
+        if verbose:
+            print(f"ERREUR: Taille des données invalide: {len(data)} bytes (attendu: {FRAME_SIZE} bytes)")
         return None
-    
+
     # Affichage des données brutes pour débogage
-    print("Données brutes:", ' '.join(f'{x:02X}' for x in data))
-    
-    # Décode les données selon le format spécifié
-    timestamp, state, cmd, particles_count, pm1_0, pm2_5, pm10_0, temp, humidity = struct.unpack("<IBBHHHHHHxx", data)
-    
-    # Vérification des valeurs PM pendant le démarrage (0xFFFF = capteur en initialisation)
-    if pm1_0 == 0xFFFF or pm2_5 == 0xFFFF or pm10_0 == 0xFFFF:
-        print("ATTENTION: Capteur en phase de démarrage, valeurs PM non valides")
-        return None
-    
-    # Calcul et vérification des valeurs
-    humidity_value = humidity / 10.0
-    if humidity_value > 100:
-        print(f"ATTENTION: Valeur d'humidité anormale détectée: {humidity_value}%")
-        humidity_value = min(humidity_value, 100)  # Limite à 100%
-    
-    temp_value = temp / 10.0
-    if temp_value < -40 or temp_value > 85:
-        print(f"ATTENTION: Température hors limites: {temp_value}°C")
-        print("Note: La température est celle du PCB interne, pas de l'environnement")
-    
-    return {
-        "timestamp": timestamp,
-        "state": state,
-        "command": cmd,
-        "particles_count": particles_count,
-        "pm1_0": pm1_0 / 10.0,
-        "pm2_5": pm2_5 / 10.0,
-        "pm10_0": pm10_0 / 10.0,
-        "temperature": temp_value,
-        "humidity": humidity_value
-    }
+    if verbose:
+        print("Données brutes:", bytes(data).hex(" ").upper())
+        return decode_protocol_frame(data, warn=print_warning)
+    return decode_protocol_frame(data, warn=ignore_warning)
+
+def print_warning(message, *args):
+    """Affiche un avertissement du décodage (mêmes arguments qu'une méthode de logging)."""
+    print("ATTENTION: " + message % args)
+
+def ignore_warning(message, *args):
+    """Ignore un avertissement du décodage."""
 
 def get_air_quality_info(pm10_value):
     """
-    Détermine la qualité de l'air et la couleur correspondante basée sur la valeur PM10.
+    Détermine la qualité de l'air et la couleur correspondante basée sur la valeur PM10
+    (échelle de la LED du capteur).
     
     Args:
         pm10_value (float): Valeur PM10 en µg/m³
@@ -111,70 +109,290 @@ def get_air_quality_info(pm10_value):
     Returns:
         tuple: (qualité, code_couleur_terminal, couleur_led)
     """
-    for threshold, (quality, color_code, led_color) in AIR_QUALITY_THRESHOLDS.items():
-        if pm10_value < threshold:
-            return quality, color_code, led_color
-    return AIR_QUALITY_THRESHOLDS[float('inf')]
+    air_quality = LED_SCALE.evaluate({"pm10": pm10_value})
+    return air_quality.label, AIR_QUALITY_STYLES[air_quality.color], air_quality.color
+
+def evaluate_air_quality(engine, parsed_data):
+    """
+    Évalue la qualité de l'air d'une trame, une seule fois pour l'affichage.
+
+    Args:
+        engine (AirQualityEngine): Indice de qualité de l'air du capteur
+        parsed_data (Frame): Trame décodée
+
+    Returns:
+        tuple: (description, couleur)
+    """
+    air_quality = engine.update(parsed_data.pm2_5, parsed_data.pm10_0)
+    return describe(air_quality), air_quality.color
+
+def decode_frame(data, metrics=None):
+    """
+    Décode une trame temps réel en tenant à jour les compteurs du capteur.
+
+    Args:
+        data (bytes): Trame reçue
+        metrics (DeviceMetrics): Compteurs à mettre à jour (optionnel)
+
+    Returns:
+        tuple: (données parsées ou None, instant de réception en ns ou None)
+    """
+    if metrics is None:
+        return parse_real_time_data(data, verbose=False), None
+    start = time.perf_counter_ns()
+    metrics.frames_received += 1
+    parsed_data = parse_real_time_data(data, verbose=False)
+    metrics.record("decode", time.perf_counter_ns() - start)
+    if parsed_data is None:
+        if len(data) != FRAME_SIZE:
+            metrics.frames_rejected_length += 1
+        else:
+            metrics.frames_rejected_warmup += 1
+    else:
+        metrics.delivery.observe(parsed_data.timestamp)
+    return parsed_data, start
+
+def record_dispatch(metrics, start, decoded):
+    """Enregistre les durées de diffusion et de traitement complet d'une trame."""
+    end = time.perf_counter_ns()
+    if metrics.awaiting_first_frame:
+        metrics.first_frame()
+    metrics.record("dispatch", end - decoded)
+    metrics.record("callback", end - start)
+
+def format_stats(metrics):
+    """
+    Formate les compteurs et latences d'un capteur.
+
+    Args:
+        metrics (DeviceMetrics): Compteurs du capteur
+
+    Returns:
+        str: Résumé sur plusieurs lignes
+    """
+    lines = [
+        f"Trames reçues: {metrics.frames_received} "
+        f"(rejetées: {metrics.frames_rejected_length} taille, "
+        f"{metrics.frames_rejected_warmup} démarrage)",
+        f"Connexions: {metrics.connections} (reconnexions: {metrics.reconnects}), "
+        f"temps connecté: {metrics.time_connected:.0f} s",
+    ]
+    for stage, histogram in metrics.histograms.items():
+        if histogram.count:
+            summary = histogram.as_dict()
+            lines.append(
+                f"Latence {stage}: moy {summary['mean_us']} µs, p50 {summary['p50_us']} µs, "
+                f"p95 {summary['p95_us']} µs, p99 {summary['p99_us']} µs, max {summary['max_us']} µs"
+            )
+    delivery = metrics.delivery
+    if delivery.frames:
+        drift = delivery.drift
+        latency = delivery.latency
+        lines += [
+            f"Trames perdues: {delivery.frames_missed} ({delivery.drop_rate:.2%}), "
+            f"hors séquence: {delivery.frames_out_of_order}",
+            f"Latence de livraison: p50 {latency.percentile(0.50) / 1e6:.0f} ms, "
+            f"p95 {latency.percentile(0.95) / 1e6:.0f} ms, p99 {latency.percentile(0.99) / 1e6:.0f} ms, "
+            f"max {latency.max / 1e6:.0f} ms",
+            f"Horloge du capteur: décalage {delivery.offset:+.2f} s, "
+            f"dérive {f'{drift:+.1f} ppm' if drift is not None else 'inconnue'}, "
+            f"remises à l'heure: {delivery.syncs}",
+        ]
+    return "\n".join(lines)
+
+def format_windows(windows):
+    """
+    Formate les statistiques glissantes d'un capteur pour l'affichage à l'arrêt.
+
+    Args:
+        windows (WindowedStats): Fenêtres glissantes du capteur
+
+    Returns:
+        str: Une ligne par mesure et par fenêtre
+    """
+    return "\n".join("".join(text for text, _style in line) for line in window_lines(windows) if line)
+
+def format_history(history):
+    """
+    Résume l'historique en mémoire d'un capteur pour l'affichage à l'arrêt.
+    Les statistiques sont calculées directement sur les colonnes, sans copie.
+
+    Args:
+        history (FrameHistory): Historique du capteur
+
+    Returns:
+        str: Résumé sur plusieurs lignes
+    """
+    if not len(history):
+        return "Aucune trame"
+    timestamps = history.view("timestamp")
+    lines = [
+        f"{len(history)} trames sur {(timestamps[-1] - timestamps[0]) / 60:.0f} min "
+        f"({history.nbytes / (1024 * 1024):.1f} Mo en mémoire)",
+    ]
+    for key in WINDOW_KEYS:
+        values = history.view(key)
+        lines.append(
+            f"{WINDOW_LABELS.get(key, key)}: moy {sum(values) / len(values) / 10:.1f} "
+            f"min {min(values) / 10:.1f} max {max(values) / 10:.1f} µg/m³"
+        )
+    return "\n".join(lines)
 
 def notification_handler(sender, data):
     """
-    Gère les notifications reçues du capteur et met à jour l'affichage.
-    Affiche toutes les données en temps réel, y compris l'état de la batterie
-    et la qualité de l'air avec le code couleur correspondant.
+    Gère les notifications reçues du capteur.
+    Met uniquement à jour l'instantané partagé: l'affichage est assuré par
+    l'afficheur (pmscan_display.Renderer), dans sa propre tâche.
     """
-    parsed_data = parse_real_time_data(data)
+    # Enregistrement de la trame brute si le mode enregistrement est actif
+    if session.recorder is not None:
+        session.recorder.append(data)
+
+    # Compteurs et latences si l'option --stats est active
+    metrics = session.metrics
+    parsed_data, start = decode_frame(data, metrics)
     if parsed_data is None:
+        if len(data) == FRAME_SIZE:
+            snapshot.update(DEFAULT_DEVICE, status="Capteur en phase de démarrage, valeurs PM non valides")
         return
-        
-    print("\033[2J\033[H")  # Efface l'écran
-    print("=== PMScan Données en temps réel ===")
-    
-    # Affichage des données de batterie et charge
-    if hasattr(notification_handler, 'battery_level'):
-        level = notification_handler.battery_level
-        bars = int(level / 10)
-        print("\nBatterie:")
-        print("[" + "█" * bars + "░" * (10 - bars) + f"] {level}%")
-    
-    if hasattr(notification_handler, 'charging_state'):
-        state = notification_handler.charging_state
-        states = {
-            0: "\033[31mNon branché\033[0m",      # Rouge
-            1: "\033[33mPré-charge\033[0m",       # Jaune
-            2: "\033[36mEn charge\033[0m",        # Cyan
-            3: "\033[32mChargé\033[0m"            # Vert
-        }
-        print(f"État de charge : {states.get(state, f'Inconnu ({state})')}\n")
-    
-    # Affichage des données du capteur
-    print(f"État: 0x{parsed_data['state']:02X}")
-    print(f"Commande: 0x{parsed_data['command']:02X}")
-    print(f"Particules (PM10.0): {parsed_data['particles_count']} /ml")
-    print(f"PM1.0: {parsed_data['pm1_0']:.1f} µg/m³")
-    print(f"PM2.5: {parsed_data['pm2_5']:.1f} µg/m³")
-    print(f"PM10.0: {parsed_data['pm10_0']:.1f} µg/m³")
-    print(f"Température PCB: {parsed_data['temperature']:.1f}°C")
-    print(f"Humidité interne: {parsed_data['humidity']:.1f}%")
-    
-    # Affichage de la qualité de l'air avec code couleur
-    quality, color_code, led_color = get_air_quality_info(parsed_data['pm10_0'])
-    print(f"{color_code}Qualité de l'air: {quality} (LED {led_color})\033[0m")
+
+    # Historique en mémoire et statistiques glissantes (option --windows)
+    if session.history is not None:
+        session.history.append(parsed_data)
+    if session.windows is not None:
+        session.windows.add(parsed_data)
+
+    # Export vers les fichiers: simple dépôt dans les files des destinations
+    if session.export is not None:
+        session.export(parsed_data)
+
+    # Indice de qualité de l'air évalué une fois par trame
+    engine = session.air_quality
+    air_quality = evaluate_air_quality(engine, parsed_data) if engine is not None else None
+
+    if metrics is None:
+        snapshot.update(DEFAULT_DEVICE, data=parsed_data, status=None, air_quality=air_quality)
+        return
+    decoded = time.perf_counter_ns()
+    snapshot.update(DEFAULT_DEVICE, data=parsed_data, status=None, air_quality=air_quality)
+    record_dispatch(metrics, start, decoded)
 
 def battery_notification_handler(sender, data):
     """
     Gère les notifications de niveau de batterie.
-    Stocke le niveau dans une variable globale pour l'affichage principal.
+    Stocke le niveau dans l'instantané partagé pour l'affichage principal.
     """
-    level = data[0]
-    notification_handler.battery_level = level
+    snapshot.update(DEFAULT_DEVICE, battery_level=data[0])
 
 def charging_notification_handler(sender, data):
     """
     Gère les notifications d'état de charge.
-    Stocke l'état dans une variable globale pour l'affichage principal.
+    Stocke l'état dans l'instantané partagé pour l'affichage principal.
+    """
+    snapshot.update(DEFAULT_DEVICE, charging_state=data[0])
+
+def setup_steps(client, data_handler, battery_handler, charging_handler, sync_time=True):
+    """
+    Plan de mise en place d'une connexion: abonnements, lecture initiale de la
+    batterie et synchronisation de l'horloge.
+    Les opérations sur des caractéristiques différentes sont lancées
+    simultanément par run_plan lorsque le backend le permet; chaque lecture
+    suit l'abonnement à la même caractéristique. L'abonnement aux données temps
+    réel est en tête, de sorte que la première trame n'attend pas la lecture de
+    la batterie.
+
+    Args:
+        client (BleakClient): Client connecté au capteur
+        data_handler (callable): Callback des données temps réel
+        battery_handler (callable): Callback du niveau de batterie
+        charging_handler (callable): Callback de l'état de charge
+        sync_time (bool): Met l'horloge du capteur à l'heure à chaque connexion
+            (sinon voir sync_clock)
+
+    Returns:
+        list: Étapes (SetupStep) du plan
+    """
+    async def read(uuid, handler):
+        handler(None, await client.read_gatt_char(uuid))
+
+    steps = [
+        SetupStep("notify_real_time", partial(client.start_notify, REAL_TIME_DATA_UUID, data_handler)),
+        SetupStep("notify_battery_level", partial(client.start_notify, BATTERY_LEVEL_UUID, battery_handler)),
+        SetupStep("notify_charging", partial(client.start_notify, BATTERY_CHARGING_UUID, charging_handler)),
+        SetupStep(
+            "read_battery_level", partial(read, BATTERY_LEVEL_UUID, battery_handler),
+            after=("notify_battery_level",), optional=True,
+        ),
+        SetupStep(
+            "read_charging", partial(read, BATTERY_CHARGING_UUID, charging_handler),
+            after=("notify_charging",), optional=True,
+        ),
+    ]
+    if sync_time:
+        steps.append(SetupStep("sync_time", partial(write_time, client)))
+    return steps
+
+async def write_time(client):
+    """Écrit l'heure courante dans l'horloge du capteur."""
+    await client.write_gatt_char(CURRENT_TIME_UUID, struct.pack("<I", int(time.time())))
+
+async def sync_clock(client, metrics):
+    """
+    Met l'horloge du capteur à l'heure si elle s'écarte de plus de
+    CLOCK_SYNC_THRESHOLD secondes (écart estimé d'après les horodatages des trames).
+
+    Args:
+        client (BleakClient): Client connecté au capteur
+        metrics (DeviceMetrics): Compteurs du capteur
+
+    Returns:
+        bool: True si l'horloge a été remise à l'heure
+    """
+    if not metrics.delivery.needs_sync():
+        return False
+    await write_time(client)
+    metrics.delivery.synced()
+    return True
+
+async def run_setup(client, steps, metrics=None, on_error=None):
     """
-    state = data[0]
-    notification_handler.charging_state = state
+    Exécute un plan de mise en place et mesure sa durée (étape "setup").
+    Les étapes ne sont lancées ensemble que si le backend met lui-même les
+    requêtes en file (voir setup_plan.plan_concurrency).
+
+    Args:
+        client (BleakClient): Client connecté au capteur
+        steps (list): Étapes du plan
+        metrics (DeviceMetrics): Compteurs du capteur (optionnel)
+        on_error (callable): Fonction (étape, erreur) appelée pour les étapes optionnelles en échec
+    """
+    start = time.perf_counter_ns()
+    await run_plan(steps, max_concurrency=plan_concurrency(client), on_error=on_error)
+    if metrics is not None:
+        metrics.record("setup", time.perf_counter_ns() - start)
+
+def build_exporter(args):
+    """
+    Crée l'exportateur décrit par les options --export et --publish.
+
+    Args:
+        args (argparse.Namespace): Options de la ligne de commande
+
+    Returns:
+        Exporter: Exportateur, ou None sans option --export ni --publish
+    """
+    if not args.export and not args.publish:
+        return None
+    return Exporter(
+        args.export or [],
+        rotate_bytes=int(args.rotate_size * 1024 * 1024),
+        rotate_seconds=args.rotate_interval,
+        queue_size=args.export_queue,
+        sinks=[
+            make_publisher(url, spool_dir=args.spool, token=args.publish_token)
+            for url in args.publish or []
+        ],
+    )
 
 async def scan_devices():
     """
@@ -213,54 +431,332 @@ async def scan_devices():
         except ValueError:
             print("Entrée invalide. Veuillez entrer un numéro.")
 
-async def main():
+async def dump_memory(client, output_path):
+    """
+    Télécharge les enregistrements stockés dans la mémoire du capteur.
+    Le transfert reprend automatiquement s'il a été interrompu.
+
+    Args:
+        client (BleakClient): Client connecté au capteur
+        output_path (str): Fichier binaire de sortie
+    """
+    print(f"Téléchargement de la mémoire vers {output_path}... (Ctrl+C pour interrompre)")
+    dump = MemoryDump(
+        client,
+        output_path,
+        progress=lambda stats: print("\r" + format_dump_stats(stats), end="", flush=True),
+    )
+    stats = await dump.run()
+    print("\r" + format_dump_stats(stats))
+    print("Téléchargement terminé.")
+
+async def main(args=None):
     """
     Fonction principale qui gère la connexion au capteur PMScan et
     la réception des données en temps réel.
+
+    Args:
+        args (argparse.Namespace): Options de la ligne de commande
     """
-    # Scan et sélection de l'appareil
-    device = await scan_devices()
-    if not device:
-        print("Opération annulée.")
+    args = args or parse_args([])
+
+    try:
+        exporter = build_exporter(args)
+    except (ValueError, ImportError) as e:
+        print(f"Erreur d'export: {str(e)}")
         return
+
+    if args.fleet is not None:
+        # Import différé: pmscan_fleet importe ce module
+        from pmscan_fleet import run_fleet
+        await run_fleet(
+            args.fleet,
+            max_connecting=args.max_connecting,
+            record_dir=args.record,
+            dashboard=args.dashboard,
+            refresh_rate=args.refresh_rate,
+            stats=args.stats,
+            windows=args.windows,
+            aqi=args.aqi,
+            exporter=exporter,
+            names=args.name,
+            scan_timeout=args.scan_timeout,
+            history=args.history,
+        )
+        return
+
+    # Connexion ciblée (sans question, pour un service) ou scan et sélection de l'appareil.
+    # Les erreurs Bluetooth (adaptateur absent, D-Bus indisponible...) sont signalées sans trace.
+    cache = DeviceCache()
+    try:
+        if args.address or args.name:
+            wanted = args.address or ', '.join(args.name)
+            print(f"\nConnexion à {wanted}...")
+            client, name = await connect_pmscan(args.address, args.name, cache, timeout=args.scan_timeout)
+            if client is None:
+                print(f"Aucun PMScan trouvé ({wanted})")
+                return 1
+        else:
+            device = await scan_devices()
+            if not device:
+                print("Opération annulée.")
+                return
+            print(f"\nConnexion à {device.name} ({device.address})...")
+            client, name = BleakClient(device), device.name
+            await client.connect()
+    except Exception as e:
+        print(f"Erreur de connexion: {str(e)}")
+        return 1
+    address = client.address
     
-    print(f"\nConnexion à {device.name} ({device.address})...")
-    
+    metrics = None
+    if args.stats:
+        metrics = DeviceMetrics(address)
+        session.metrics = metrics
+        snapshot.update(DEFAULT_DEVICE, metrics=metrics)
+    session.air_quality = AirQualityEngine(args.aqi)
+    windows = None
+    if args.windows:
+        windows = WindowedStats(WINDOW_KEYS)
+        session.windows = windows
+        snapshot.update(DEFAULT_DEVICE, windows=windows)
+    history = None
+    if args.history > 0:
+        history = FrameHistory(history_capacity(args.history))
+        session.history = history
+        snapshot.update(DEFAULT_DEVICE, history=history)
+    if exporter is not None:
+        exporter.start()
+        session.export = partial(exporter.submit, address)
+
     try:
-        async with BleakClient(device) as client:
+        try:
             print("Connecté!")
-
-            # Configuration des notifications pour toutes les caractéristiques
-            await client.start_notify(REAL_TIME_DATA_UUID, notification_handler)
-            await client.start_notify(BATTERY_LEVEL_UUID, battery_notification_handler)
-            await client.start_notify(BATTERY_CHARGING_UUID, charging_notification_handler)
-            
-            # Lecture initiale des informations de la batterie
+            if metrics is not None:
+                metrics.connected()
+            # Adresse mémorisée: au prochain démarrage, le capteur est attendu directement
             try:
-                battery_level = await client.read_gatt_char(BATTERY_LEVEL_UUID)
-                charging_state = await client.read_gatt_char(BATTERY_CHARGING_UUID)
-                print(f"\nInformations batterie initiales :")
-                battery_notification_handler(None, battery_level)
-                charging_notification_handler(None, charging_state)
-                print("-" * 40)
-            except Exception as e:
-                print(f"Erreur lors de la lecture de la batterie : {str(e)}")
-            
-            # Envoi du timestamp actuel pour synchroniser l'horloge
-            current_time = int(time.time())
-            await client.write_gatt_char(CURRENT_TIME_UUID, struct.pack("<I", current_time))
-            
+                cache.remember(address, name)
+                cache.save()
+            except OSError as e:
+                print(f"Cache des adresses non enregistré: {str(e)}")
+
+            if args.dump_memory:
+                await dump_memory(client, args.dump_memory)
+                return
+
+            # Enregistrement des trames brutes
+            recorder = None
+            if args.record:
+                from pmscan_record import Recorder
+                recorder = Recorder(args.record, address)
+                session.recorder = recorder
+                print(f"Enregistrement des trames dans {args.record}")
+
+            # Abonnements, lecture de la batterie et synchronisation de l'horloge, en parallèle;
+            # avec --stats, l'horloge n'est remise à l'heure que si elle s'écarte trop
+            await run_setup(
+                client,
+                setup_steps(
+                    client, notification_handler,
+                    battery_notification_handler, charging_notification_handler,
+                    sync_time=metrics is None,
+                ),
+                metrics,
+                on_error=lambda step, e: print(f"Erreur lors de l'étape {step} : {str(e)}"),
+            )
+
             print("\nRéception des données... (Ctrl+C pour arrêter)")
             
+            # Affichage dans sa propre tâche, à fréquence plafonnée
+            snapshot.update(DEFAULT_DEVICE, label=f"{name} ({address})", connected=True)
+            renderer = Renderer(
+                snapshot, refresh_rate=args.refresh_rate,
+                footer=exporter.status_lines if exporter is not None else None,
+            )
+            render_task = asyncio.create_task(renderer.run())
+            
             try:
                 while True:
                     await asyncio.sleep(1)
+                    if recorder is not None:
+                        recorder.flush_if_due()
+                    if metrics is not None:
+                        await sync_clock(client, metrics)
             except KeyboardInterrupt:
                 print("\nArrêt...")
+            finally:
+                render_task.cancel()
+                await asyncio.gather(render_task, return_exceptions=True)
+                if recorder is not None:
+                    recorder.close()
+        finally:
+            await client.disconnect()
     except Exception as e:
         print(f"Erreur de connexion: {str(e)}")
+    finally:
+        if metrics is not None:
+            metrics.disconnected()
+            print("\n=== Statistiques ===")
+            print(format_stats(metrics))
+        if windows is not None:
+            print("\n=== Statistiques glissantes (µg/m³) ===")
+            print(format_windows(windows))
+        if history is not None:
+            print("\n=== Historique ===")
+            print(format_history(history))
+        if exporter is not None:
+            await exporter.close()
+            print("\n=== Export ===")
+            print("\n".join(exporter.status_lines()))
+
+def parse_args(argv=None):
+    """
+    Analyse les options de la ligne de commande.
+
+    Args:
+        argv (list): Arguments à analyser (par défaut sys.argv)
+
+    Returns:
+        argparse.Namespace: Options analysées
+    """
+    parser = argparse.ArgumentParser(description="Lecture des données d'un capteur PMScan via BLE")
+    parser.add_argument(
+        "--address",
+        metavar="ADRESSE",
+        help="se connecte au PMScan d'adresse ADRESSE, sans question (service systemd)",
+    )
+    parser.add_argument(
+        "--name",
+        action="append",
+        default=[],
+        metavar="NOM",
+        help="se connecte au premier PMScan dont le nom contient NOM, sans question "
+             "(répétable; avec --fleet, un capteur par NOM)",
+    )
+    parser.add_argument(
+        "--scan-timeout",
+        type=float,
+        default=DEFAULT_SCAN_TIMEOUT,
+        metavar="SECONDES",
+        help=f"durée maximum d'un scan ciblé (défaut: {DEFAULT_SCAN_TIMEOUT:.0f})",
+    )
+    parser.add_argument(
+        "--dump-memory",
+        metavar="FICHIER",
+        help="télécharge la mémoire du capteur dans FICHIER (reprise automatique si interrompu)",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="REPERTOIRE",
+        help="enregistre les trames brutes dans des segments binaires (.pmr) de REPERTOIRE",
+    )
+    parser.add_argument(
+        "--fleet",
+        nargs="*",
+        metavar="ADRESSE",
+        help="mode flotte: se connecte à tous les PMScan à portée, ou aux ADRESSEs indiquées",
+    )
+    parser.add_argument(
+        "--dashboard",
+        action="store_true",
+        help="mode flotte: affiche les capteurs côte à côte au lieu du flux de lignes",
+    )
+    parser.add_argument(
+        "--refresh-rate",
+        type=float,
+        default=4.0,
+        metavar="HZ",
+        help="fréquence maximum de rafraîchissement de l'affichage (défaut: 4)",
+    )
+    parser.add_argument(
+        "--max-connecting",
+        type=int,
+        default=3,
+        metavar="N",
+        help="mode flotte: nombre maximum de tentatives de connexion simultanées (défaut: 3)",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="mesure les trames reçues/rejetées et les latences de traitement, résumé à l'arrêt",
+    )
+    parser.add_argument(
+        "--windows",
+        action="store_true",
+        help="calcule les moyennes glissantes 1 h, 8 h et 24 h, le maximum et le p95 de PM2.5 et PM10",
+    )
+    parser.add_argument(
+        "--history",
+        type=float,
+        nargs="?",
+        const=HISTORY_HOURS,
+        default=DEFAULT_HISTORY_HOURS,
+        metavar="HEURES",
+        help=f"garde en mémoire les trames des HEURES dernières heures de chaque capteur "
+             f"(défaut: sans historique, {HISTORY_HOURS:.0f} h si HEURES est omis, "
+             f"environ 3 Mo par capteur pour 24 h)",
+    )
+    parser.add_argument(
+        "--aqi",
+        choices=sorted(SCALES),
+        default=DEFAULT_SCALE,
+        help="indice de qualité de l'air: led (échelle de la LED, PM10), eaqi (indice "
+             "européen) ou us_epa (AQI américain avec NowCast) (défaut: led)",
+    )
+    parser.add_argument(
+        "--export",
+        action="append",
+        metavar="FORMAT:REPERTOIRE",
+        help=f"exporte les trames décodées dans REPERTOIRE, FORMAT parmi {', '.join(SINKS)} "
+             "(option répétable; parquet nécessite pyarrow)",
+    )
+    parser.add_argument(
+        "--rotate-size",
+        type=float,
+        default=DEFAULT_ROTATE_BYTES / (1024 * 1024),
+        metavar="MO",
+        help=f"export: nouveau fichier au-delà de MO mégaoctets, 0 = sans limite "
+             f"(défaut: {DEFAULT_ROTATE_BYTES // (1024 * 1024)})",
+    )
+    parser.add_argument(
+        "--rotate-interval",
+        type=float,
+        default=DEFAULT_ROTATE_SECONDS,
+        metavar="SECONDES",
+        help=f"export: nouveau fichier toutes les SECONDES, 0 = sans limite (défaut: {DEFAULT_ROTATE_SECONDS})",
+    )
+    parser.add_argument(
+        "--export-queue",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        metavar="N",
+        help=f"export: trames en attente par destination avant abandon (défaut: {DEFAULT_QUEUE_SIZE})",
+    )
+    parser.add_argument(
+        "--publish",
+        action="append",
+        metavar="URL",
+        help="publie les trames par lots au format line protocol: http(s)://... (API d'écriture "
+             "InfluxDB) ou mqtt://serveur/sujet (nécessite paho-mqtt) (option répétable)",
+    )
+    parser.add_argument(
+        "--publish-token",
+        default=os.environ.get("INFLUX_TOKEN"),
+        metavar="JETON",
+        help="publication: jeton d'API InfluxDB (défaut: variable d'environnement INFLUX_TOKEN)",
+    )
+    parser.add_argument(
+        "--spool",
+        default=DEFAULT_SPOOL_DIR,
+        metavar="REPERTOIRE",
+        help=f"publication: lots en attente quand le serveur est injoignable (défaut: {DEFAULT_SPOOL_DIR})",
+    )
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    args = parse_args()
+
     # Affichage des informations de configuration au démarrage
     print("=== PMScan Reader ===")
     print("UUIDs configurés:")
@@ -271,5 +767,5 @@ if __name__ == "__main__":
     print(f"État charge: {BATTERY_CHARGING_UUID}")
     print("-" * 40)
     
-    # Démarrage de la boucle principale
-    asyncio.run(main()) 
\ No newline at end of file
+    # Démarrage de la boucle principale (code de sortie 1 si le capteur demandé est introuvable)
+    sys.exit(asyncio.run(main(args))) 
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Enregistrement binaire des trames PMScan.
+Les trames brutes de 20 bytes sont ajoutées, avec l'heure de réception côté
+hôte, dans des fichiers segmentés à enregistrements de taille fixe. Les
+écritures sont regroupées par lots pour un coût CPU négligeable.
+
+La lecture projette un segment en mémoire (mmap) et expose ses colonnes sous
+forme de vues NumPy, sans copie ni objet Python par trame.
+
+Format d'un segment (.pmr):
+- En-tête (64 bytes): magic "PMSR", version (uint16), taille d'un
+  enregistrement (uint16), création en ns depuis l'epoch (int64), adresse du
+  capteur (24 bytes ASCII, complétés par des zéros), réservé (24 bytes)
+- Enregistrements (32 bytes): heure de réception en ns depuis l'epoch (int64),
+  trame brute (20 bytes), réservé (4 bytes)
+"""
+
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from pmscan_batch import RAW_FRAME_DTYPE, FRAME_SIZE, decode_frames
+
+SEGMENT_MAGIC = b"PMSR"
+SEGMENT_VERSION = 1
+SEGMENT_SUFFIX = ".pmr"
+
+HEADER_STRUCT = struct.Struct("<4sHHq24s24x")
+HEADER_SIZE = HEADER_STRUCT.size
+
+RECORD_DTYPE = np.dtype([
+    ("received_ns", "<i8"),
+    ("frame", RAW_FRAME_DTYPE),
+    ("reserved", "V4"),
+])
+RECORD_SIZE = RECORD_DTYPE.itemsize
+RECORD_STRUCT = struct.Struct(f"<q{FRAME_SIZE}s4x")
+
+# Écriture sur disque tous les N enregistrements ou toutes les N secondes
+DEFAULT_FLUSH_RECORDS = 256
+DEFAULT_FLUSH_INTERVAL = 5.0
+# Nombre maximum d'enregistrements par segment (~32 Mo)
+DEFAULT_SEGMENT_RECORDS = 1_000_000
+
+def _safe_device_id(device_id):
+    """Transforme une adresse BLE en nom de fichier valide."""
+    return "".join(c if c.isalnum() else "-" for c in device_id)
+
+class Recorder:
+    """
+    Écrit les trames d'un capteur dans des segments en ajout seul.
+
+    Un nouveau segment est créé chaque jour (UTC) ou lorsque le segment courant
+    atteint segment_records enregistrements.
+    """
+
+    def __init__(self, directory, device_id, flush_records=DEFAULT_FLUSH_RECORDS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, segment_records=DEFAULT_SEGMENT_RECORDS):
+        """
+        Args:
+            directory (str): Répertoire des segments
+            device_id (str): Adresse du capteur
+            flush_records (int): Nombre d'enregistrements par écriture
+            flush_interval (float): Délai maximum avant écriture des données en attente
+            segment_records (int): Taille maximum d'un segment en enregistrements
+        """
+        self.directory = directory
+        self.device_id = device_id
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.segment_records = segment_records
+
+        self._buffer = bytearray()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._file = None
+        self._segment_day = None
+        self._segment_count = 0
+        self.path = None
+        self.records_written = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _open_segment(self, received_ns):
+        """Ouvre un nouveau segment pour le jour de received_ns."""
+        self.close()
+        day = time.strftime("%Y%m%d", time.gmtime(received_ns / 1e9))
+        stamp = time.strftime("%H%M%S", time.gmtime(received_ns / 1e9))
+        base = os.path.join(
+            self.directory, f"pmscan-{_safe_device_id(self.device_id)}-{day}-{stamp}"
+        )
+        # Index pour garder des noms uniques et triés si plusieurs segments naissent la même seconde
+        index = 0
+        path = f"{base}-{index:03d}{SEGMENT_SUFFIX}"
+        while os.path.exists(path):
+            index += 1
+            path = f"{base}-{index:03d}{SEGMENT_SUFFIX}"
+
+        self._file = open(path, "wb")
+        self._file.write(HEADER_STRUCT.pack(
+            SEGMENT_MAGIC, SEGMENT_VERSION, RECORD_SIZE, received_ns,
+            self.device_id.encode("ascii", "replace")[:24],
+        ))
+        self._segment_day = day
+        self._segment_count = 0
+        self.path = path
+
+    def append(self, frame, received_ns=None):
+        """
+        Ajoute une trame brute au tampon d'écriture.
+
+        Args:
+            frame (bytes): Trame de 20 bytes
+            received_ns (int): Heure de réception en ns (par défaut, maintenant)
+        """
+        if len(frame) != FRAME_SIZE:
+            return
+        if received_ns is None:
+            received_ns = time.time_ns()
+
+        day = time.strftime("%Y%m%d", time.gmtime(received_ns / 1e9))
+        if (self._file is None or day != self._segment_day
+                or self._segment_count + self._pending >= self.segment_records):
+            self.flush()
+            self._open_segment(received_ns)
+
+        self._buffer += RECORD_STRUCT.pack(received_ns, bytes(frame))
+        self._pending += 1
+        if self._pending >= self.flush_records:
+            self.flush()
+
+    def flush_if_due(self):
+        """Écrit les données en attente si le délai flush_interval est dépassé."""
+        if self._pending and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Écrit le tampon dans le segment courant."""
+        self._last_flush = time.monotonic()
+        if not self._pending or self._file is None:
+            return
+        self._file.write(self._buffer)
+        self._file.flush()
+        self._segment_count += self._pending
+        self.records_written += self._pending
+        self._buffer.clear()
+        self._pending = 0
+
+    def close(self):
+        """Écrit les données en attente et ferme le segment courant."""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+class Segment:
+    """
+    Segment d'enregistrement projeté en mémoire.
+
+    Les colonnes sont des vues sur le fichier: aucune donnée n'est copiée tant
+    qu'elles ne sont pas modifiées ou converties.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE:
+                raise ValueError(f"Segment tronqué: {path}")
+            magic, version, record_size, created_ns, device_id = HEADER_STRUCT.unpack(header)
+            if magic != SEGMENT_MAGIC or record_size != RECORD_SIZE:
+                raise ValueError(f"Format de segment inconnu: {path}")
+            self.version = version
+            self.created_ns = created_ns
+            self.device_id = device_id.rstrip(b"\0").decode("ascii", "replace")
+
+            size = os.fstat(f.fileno()).st_size
+            # Un enregistrement partiel en fin de fichier (arrêt brutal) est ignoré
+            count = (size - HEADER_SIZE) // RECORD_SIZE
+            if count:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.records = np.frombuffer(
+                    self._mmap, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE
+                )
+            else:
+                self._mmap = None
+                self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def received_ns(self):
+        """Heures de réception (ns depuis l'epoch), vue sans copie."""
+        return self.records["received_ns"]
+
+    @property
+    def frames(self):
+        """Trames brutes au format RAW_FRAME_DTYPE, vue sans copie."""
+        return self.records["frame"]
+
+    def column(self, name):
+        """
+        Renvoie une colonne brute de la trame (valeurs non mises à l'échelle), sans copie.
+
+        Args:
+            name (str): Nom du champ (timestamp, pm2_5, humidity...)
+
+        Returns:
+            np.ndarray: Vue sur la colonne
+        """
+        return self.records["frame"][name]
+
+    def decode(self, keep_invalid=False):
+        """Décode les trames du segment avec pmscan_batch.decode_frames."""
+        return decode_frames(self.frames, keep_invalid=keep_invalid)
+
+    def close(self):
+        """Libère la projection mémoire."""
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Des vues sur les colonnes sont encore utilisées: libération par le ramasse-miettes
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def list_segments(directory, device_id=None, day=None):
+    """
+    Liste les segments d'un répertoire, triés par nom (donc par date).
+
+    Args:
+        directory (str): Répertoire des segments
+        device_id (str): Filtre sur l'adresse du capteur
+        day (str): Filtre sur le jour au format AAAAMMJJ
+
+    Returns:
+        list: Chemins des segments
+    """
+    prefix = "pmscan-"
+    if device_id:
+        prefix += _safe_device_id(device_id) + "-"
+    paths = []
+    for name in sorted(os.listdir(directory)):
+        if not name.startswith(prefix) or not name.endswith(SEGMENT_SUFFIX):
+            continue
+        if day and f"-{day}-" not in name:
+            continue
+        paths.append(os.path.join(directory, name))
+    return paths
@@ -0,0 +1,193 @@
+"""
+Recherche ciblée des PMScan.
+Le scan est filtré sur le service PMScan et s'arrête dès que les capteurs
+recherchés (par adresse ou par nom) ont été vus, au lieu d'attendre la fin d'un
+scan complet. Les adresses des capteurs vus récemment sont conservées dans un
+cache: au démarrage suivant, la connexion à un capteur connu est tentée
+directement à sa dernière adresse, sans scan.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from bleak import BleakClient, BleakScanner
+
+# Module sans dépendance Home Assistant partagé avec l'intégration
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_components", "pmscan"))
+from protocol import PMSCAN_SERVICE_UUID  # noqa: E402
+
+# Nom partiel pour identifier un PMScan
+PMSCAN_NAME_PREFIX = "PMScan"
+
+# Durée maximum d'un scan (secondes)
+DEFAULT_SCAN_TIMEOUT = 10.0
+# Cache des adresses et durée au-delà de laquelle une adresse n'est plus utilisée (secondes)
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "pmscan", "devices.json")
+CACHE_MAX_AGE = 7 * 24 * 3600
+
+class DeviceCache:
+    """
+    Adresses des PMScan vus récemment, conservées dans un fichier JSON:
+    {adresse: {"name": nom, "seen": horodatage Unix}}.
+    Un fichier absent ou illisible donne un cache vide.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_age=CACHE_MAX_AGE):
+        """
+        Args:
+            path (str): Fichier du cache
+            max_age (float): Âge maximum d'une adresse utilisable (secondes)
+        """
+        self.path = path
+        self.max_age = max_age
+        try:
+            with open(path, encoding="utf-8") as f:
+                self.devices = json.load(f)
+        except (OSError, ValueError):
+            self.devices = {}
+
+    def lookup(self, names):
+        """
+        Recherche les adresses récentes des capteurs dont le nom contient l'un des noms.
+
+        Args:
+            names (list): Noms (ou parties de noms) recherchés
+
+        Returns:
+            list: Tuples (adresse, nom), du plus récemment vu au plus ancien
+        """
+        oldest = time.time() - self.max_age
+        found = [
+            (entry["seen"], address, entry["name"])
+            for address, entry in self.devices.items()
+            if entry["seen"] >= oldest and name_matches(entry["name"], names)
+        ]
+        return [(address, name) for _seen, address, name in sorted(found, reverse=True)]
+
+    def name(self, address):
+        """Retourne le dernier nom connu d'une adresse, ou None."""
+        entry = self.devices.get(address.upper())
+        return entry["name"] if entry is not None else None
+
+    def remember(self, address, name):
+        """Note qu'un capteur vient d'être vu (et s'y connecter a réussi)."""
+        self.devices[address.upper()] = {"name": name, "seen": time.time()}
+
+    def save(self):
+        """Écrit le cache (remplacement atomique du fichier)."""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.devices, f, indent=1)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+def name_matches(name, names):
+    """Indique si un nom contient l'un des noms recherchés (sans tenir compte de la casse)."""
+    name = (name or "").lower()
+    return any(wanted.lower() in name for wanted in names)
+
+async def find_pmscans(addresses=(), names=(), count=1, timeout=DEFAULT_SCAN_TIMEOUT):
+    """
+    Scanne les PMScan et s'arrête dès que count capteurs recherchés ont été vus.
+
+    Le scan est filtré sur le service PMScan. Sans adresse ni nom, tout PMScan
+    (nom commençant par PMSCAN_NAME_PREFIX) est retenu.
+
+    Args:
+        addresses (list): Adresses recherchées
+        names (list): Noms (ou parties de noms) recherchés
+        count (int): Nombre de capteurs attendus (None: scan complet jusqu'au délai)
+        timeout (float): Durée maximum du scan (secondes)
+
+    Returns:
+        list: Appareils (BLEDevice) trouvés, dans l'ordre où ils ont été vus
+    """
+    wanted = {address.upper() for address in addresses}
+    names = list(names) if wanted or names else [PMSCAN_NAME_PREFIX]
+    found = {}
+    done = asyncio.Event()
+
+    def detected(device, advertisement_data):
+        address = device.address.upper()
+        if address in found:
+            return
+        name = device.name or advertisement_data.local_name
+        if address not in wanted and not name_matches(name, names):
+            return
+        found[address] = device
+        if count is not None and len(found) >= count:
+            done.set()
+
+    async with BleakScanner(detection_callback=detected, service_uuids=[PMSCAN_SERVICE_UUID]):
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    return list(found.values())
+
+async def locate_pmscan(address=None, names=(), timeout=DEFAULT_SCAN_TIMEOUT):
+    """
+    Trouve par un scan le PMScan d'une adresse, ou le premier PMScan dont le nom correspond.
+
+    Args:
+        address (str): Adresse du capteur
+        names (list): Noms (ou parties de noms) recherchés si aucune adresse n'est donnée
+        timeout (float): Durée maximum du scan (secondes)
+
+    Returns:
+        BLEDevice: L'appareil trouvé, ou None
+    """
+    if address is not None:
+        devices = await find_pmscans(addresses=[address], timeout=timeout)
+    else:
+        devices = await find_pmscans(names=names, timeout=timeout)
+    return devices[0] if devices else None
+
+async def connect_pmscan(address=None, names=(), cache=None, timeout=DEFAULT_SCAN_TIMEOUT):
+    """
+    Se connecte au PMScan d'une adresse, ou au premier PMScan dont le nom correspond.
+
+    Un capteur présent dans le cache est connecté directement à sa dernière
+    adresse connue, sans scan; si cette connexion échoue (capteur hors de
+    portée, adresse changée), le capteur est recherché par un scan.
+
+    Args:
+        address (str): Adresse du capteur
+        names (list): Noms (ou parties de noms) recherchés si aucune adresse n'est donnée
+        cache (DeviceCache): Cache des adresses (optionnel)
+        timeout (float): Durée maximum du scan et de la connexion directe (secondes)
+
+    Returns:
+        tuple: (BleakClient connecté, nom du capteur), ou (None, None) si aucun
+            capteur n'a été trouvé
+    """
+    if cache is not None:
+        if address is not None:
+            name = cache.name(address)
+            known = [(address, name)] if name is not None else []
+        else:
+            known = cache.lookup(names)[:1]
+        for cached_address, name in known:
+            client = BleakClient(cached_address, timeout=timeout)
+            try:
+                await client.connect()
+            except Exception:
+                # Connexion directe impossible: recherche par un scan
+                continue
+            return client, name
+
+    device = await locate_pmscan(address, names, timeout=timeout)
+    if device is None:
+        return None, None
+    client = BleakClient(device)
+    await client.connect()
+    return client, device.name
@@ -0,0 +1,583 @@
+"""
+Simulateur de capteur PMScan.
+Remplace BleakClient et BleakScanner par des doublures locales qui imitent le
+service GATT du PMScan: mêmes caractéristiques, notifications temps réel,
+batterie et charge à une cadence configurable, contenu de la mémoire, et
+rejeu de fichiers de trames enregistrées (.pmr ou trames brutes de 20 bytes).
+
+Le code existant (pmscan_reader.main, le mode flotte, connect_and_subscribe de
+l'intégration Home Assistant) tourne sans modification: il suffit de remplacer
+les noms BleakClient/BleakScanner dans les modules concernés avec
+Simulator.patch(). C'est la base des benchmarks et des tests d'endurance.
+
+Usage:
+    python pmscan_sim.py [--devices N] [--interval S] [--replay FICHIER] [options du lecteur...]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import random
+import struct
+import sys
+import time
+
+# Module sans dépendance Home Assistant partagé avec l'intégration
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "custom_components", "pmscan"))
+from protocol import (  # noqa: E402
+    ACQUISITION_INTERVAL_UUID,
+    BATTERY_CHARGING_UUID,
+    BATTERY_HEARTBEAT_UUID,
+    BATTERY_LEVEL_UUID,
+    CURRENT_TIME_UUID,
+    DISPLAY_SETTINGS_UUID,
+    FRAME,
+    FRAME_SIZE,
+    MEMORY_DATA_UUID,
+    PMSCAN_SERVICE_UUID,
+    POWER_MODE_UUID,
+    REAL_TIME_DATA_UUID,
+    TEMP_HUMID_ALERT_UUID,
+    TEMP_HUMID_THRESHOLD_UUID,
+)
+
+# Caractéristiques servies par le simulateur, dans l'ordre des handles
+CHARACTERISTICS = [
+    (REAL_TIME_DATA_UUID, ["read", "write", "notify"]),
+    (MEMORY_DATA_UUID, ["read", "notify"]),
+    (TEMP_HUMID_ALERT_UUID, ["read", "notify"]),
+    (BATTERY_LEVEL_UUID, ["read", "notify"]),
+    (BATTERY_CHARGING_UUID, ["read", "notify"]),
+    (CURRENT_TIME_UUID, ["read", "write"]),
+    (ACQUISITION_INTERVAL_UUID, ["read", "write"]),
+    (POWER_MODE_UUID, ["read", "write"]),
+    (TEMP_HUMID_THRESHOLD_UUID, ["read", "write"]),
+    (DISPLAY_SETTINGS_UUID, ["read", "write"]),
+    (BATTERY_HEARTBEAT_UUID, ["read", "notify"]),
+]
+
+# Intervalle par défaut entre deux trames temps réel (secondes)
+DEFAULT_INTERVAL = 1.0
+# Une notification batterie toutes les N trames temps réel
+BATTERY_NOTIFY_EVERY = 60
+# Durée simulée d'un connect() (secondes)
+DEFAULT_CONNECT_DELAY = 0.05
+# Intervalle entre deux annonces d'un périphérique (secondes)
+ADVERTISING_INTERVAL = 0.1
+
+class SimulatorError(Exception):
+    """Erreur renvoyée par le simulateur (équivalent de BleakError)."""
+
+class SimulatedCharacteristic:
+    """Caractéristique GATT simulée (attributs principaux de BleakGATTCharacteristic)."""
+
+    def __init__(self, uuid, handle, properties):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+        self.description = "PMScan"
+
+    def __str__(self):
+        return self.uuid
+
+    def __repr__(self):
+        return f"SimulatedCharacteristic({self.uuid!r}, handle={self.handle})"
+
+class SimulatedService:
+    """Service GATT simulé."""
+
+    def __init__(self, uuid, characteristics):
+        self.uuid = uuid
+        self.characteristics = characteristics
+        self.handle = characteristics[0].handle - 1 if characteristics else 0
+
+    def get_characteristic(self, uuid):
+        for characteristic in self.characteristics:
+            if characteristic.uuid == str(uuid).lower():
+                return characteristic
+        return None
+
+class SimulatedServiceCollection:
+    """Collection de services (équivalent de BleakGATTServiceCollection)."""
+
+    def __init__(self, services):
+        self.services = {service.handle: service for service in services}
+
+    def __iter__(self):
+        return iter(self.services.values())
+
+    def __len__(self):
+        return len(self.services)
+
+    def get_service(self, uuid):
+        for service in self:
+            if service.uuid == str(uuid).lower():
+                return service
+        return None
+
+    def get_characteristic(self, specifier):
+        for service in self:
+            for characteristic in service.characteristics:
+                if specifier in (characteristic.uuid, characteristic.handle):
+                    return characteristic
+        return None
+
+class SimulatedBLEDevice:
+    """Appareil renvoyé par le scanner simulé (équivalent de BLEDevice)."""
+
+    def __init__(self, address, name):
+        self.address = address
+        self.name = name
+        self.details = None
+        self.rssi = -60
+
+    def __repr__(self):
+        return f"SimulatedBLEDevice({self.address}, {self.name})"
+
+class SimulatedAdvertisementData:
+    """Données d'annonce transmises au callback du scanner simulé (équivalent d'AdvertisementData)."""
+
+    def __init__(self, local_name):
+        self.local_name = local_name
+        self.service_uuids = [PMSCAN_SERVICE_UUID]
+        self.manufacturer_data = {}
+        self.rssi = -60
+
+def synthetic_frames(seed=0, warmup=3):
+    """
+    Génère des trames réalistes (marche aléatoire lissée) sans fin.
+
+    Args:
+        seed (int): Graine du générateur
+        warmup (int): Nombre de trames initiales en phase de démarrage (PM à 0xFFFF)
+
+    Yields:
+        bytes: Trame de 20 bytes (timestamp à 0, fixé à l'émission)
+    """
+    rng = random.Random(seed)
+    pm25 = rng.uniform(5.0, 25.0)
+    step = 0
+    while True:
+        if step < warmup:
+            yield FRAME.pack(0, 0, 0, 0, 0xFFFF, 0xFFFF, 0xFFFF, 250, 450)
+            step += 1
+            continue
+        pm25 = max(0.5, pm25 + rng.gauss(0.0, 1.0) + 0.02 * (15.0 - pm25))
+        pm1 = pm25 * rng.uniform(0.6, 0.8)
+        pm10 = pm25 * rng.uniform(1.2, 1.6)
+        temperature = 25.0 + 2.0 * math.sin(step / 600.0)
+        humidity = 45.0 + 5.0 * math.cos(step / 900.0)
+        yield FRAME.pack(
+            0, 0, 1, int(pm10 * 12),
+            int(pm1 * 10), int(pm25 * 10), int(pm10 * 10),
+            int(temperature * 10), int(humidity * 10),
+        )
+        step += 1
+
+def replay_frames(path, loop=True):
+    """
+    Rejoue les trames d'un fichier enregistré.
+
+    Accepte un segment .pmr (pmscan_record) ou un fichier de trames brutes de
+    20 bytes (pmscan_memory).
+
+    Args:
+        path (str): Fichier à rejouer
+        loop (bool): Recommence au début en fin de fichier
+
+    Yields:
+        bytes: Trame de 20 bytes
+    """
+    while True:
+        if path.endswith(".pmr"):
+            from pmscan_record import Segment
+            with Segment(path) as segment:
+                frames = segment.frames.tobytes()
+        else:
+            with open(path, "rb") as f:
+                frames = f.read()
+        if len(frames) < FRAME_SIZE:
+            return
+        for offset in range(0, len(frames) - FRAME_SIZE + 1, FRAME_SIZE):
+            yield frames[offset:offset + FRAME_SIZE]
+        if not loop:
+            return
+
+class SimulatedPMScan:
+    """
+    Périphérique PMScan simulé.
+    Porte l'état du capteur (horloge, intervalle, batterie, mémoire) et la
+    source des trames temps réel, partagée entre connexions successives.
+    """
+
+    def __init__(self, address, name="PMScan", interval=DEFAULT_INTERVAL, frames=None,
+                 battery_level=87, charging_state=0, memory=None, seed=0,
+                 keep_timestamps=False):
+        """
+        Args:
+            address (str): Adresse BLE simulée
+            name (str): Nom annoncé
+            interval (float): Intervalle entre deux trames temps réel (secondes)
+            frames (iterable): Source de trames (par défaut synthetic_frames)
+            battery_level (int): Niveau de batterie initial (%)
+            charging_state (int): État de charge initial (0-3)
+            memory (bytes): Contenu de la mémoire (enregistrements de 20 bytes)
+            seed (int): Graine des trames synthétiques
+            keep_timestamps (bool): Conserve les horodatages des trames rejouées
+                au lieu de les remplacer par l'horloge simulée
+        """
+        self.address = address
+        self.name = name
+        self.interval = interval
+        self.frames = iter(frames) if frames is not None else synthetic_frames(seed)
+        self.battery_level = battery_level
+        self.charging_state = charging_state
+        self.memory = bytes(memory or b"")
+        self.keep_timestamps = keep_timestamps
+        self.clock_offset = 0
+        self.connected_client = None
+        self.frames_sent = 0
+        self.connections = 0
+        self.writes = []
+
+        handle = 0x10
+        characteristics = []
+        for uuid, properties in CHARACTERISTICS:
+            characteristics.append(SimulatedCharacteristic(uuid, handle, properties))
+            handle += 3
+        self.services = SimulatedServiceCollection(
+            [SimulatedService(PMSCAN_SERVICE_UUID, characteristics)]
+        )
+
+    def device_time(self):
+        """Horloge du capteur (timestamp Unix)."""
+        return int(time.time()) + self.clock_offset
+
+    def next_frame(self):
+        """
+        Produit la prochaine trame temps réel.
+
+        Returns:
+            bytes: Trame de 20 bytes, ou None si la source est épuisée
+        """
+        frame = next(self.frames, None)
+        if frame is None:
+            return None
+        if not self.keep_timestamps:
+            frame = struct.pack("<I", self.device_time()) + bytes(frame[4:])
+        self.frames_sent += 1
+        return frame
+
+    def read(self, uuid):
+        """Valeur renvoyée par une lecture GATT."""
+        if uuid == BATTERY_LEVEL_UUID:
+            return bytearray([self.battery_level])
+        if uuid == BATTERY_CHARGING_UUID:
+            return bytearray([self.charging_state])
+        if uuid == CURRENT_TIME_UUID:
+            return bytearray(struct.pack("<I", self.device_time()))
+        if uuid in (ACQUISITION_INTERVAL_UUID, REAL_TIME_DATA_UUID):
+            return bytearray(struct.pack("<H", max(1, int(self.interval))))
+        return bytearray(2)
+
+    def write(self, uuid, data):
+        """Applique une écriture GATT."""
+        self.writes.append((uuid, bytes(data)))
+        if uuid == CURRENT_TIME_UUID and len(data) >= 4:
+            self.clock_offset = struct.unpack_from("<I", data)[0] - int(time.time())
+        elif uuid in (ACQUISITION_INTERVAL_UUID, REAL_TIME_DATA_UUID) and len(data) >= 2:
+            self.interval = max(1, struct.unpack_from("<H", data)[0])
+
+class Simulator:
+    """
+    Ensemble de périphériques simulés et doublures BleakClient/BleakScanner associées.
+
+    Exemple:
+        sim = Simulator()
+        sim.add_device("AA:BB:CC:DD:EE:01", interval=0.1)
+        with sim.patch(pmscan_reader):
+            asyncio.run(pmscan_reader.main(args))
+    """
+
+    def __init__(self, time_scale=1.0, connect_delay=DEFAULT_CONNECT_DELAY):
+        """
+        Args:
+            time_scale (float): Facteur appliqué aux intervalles (0.01 = 100 fois plus rapide)
+            connect_delay (float): Durée simulée d'une connexion (secondes)
+        """
+        self.devices = {}
+        self.time_scale = time_scale
+        self.connect_delay = connect_delay
+        self.BleakClient = self._make_client_class()
+        self.BleakScanner = self._make_scanner_class()
+
+    def add_device(self, address, **kwargs):
+        """Ajoute un périphérique simulé (voir SimulatedPMScan pour les options)."""
+        device = SimulatedPMScan(address, **kwargs)
+        self.devices[address.upper()] = device
+        return device
+
+    def drop(self, address):
+        """Coupe la connexion d'un périphérique, comme une perte de signal."""
+        device = self.devices[address.upper()]
+        if device.connected_client is not None:
+            device.connected_client._on_disconnect()
+
+    @contextlib.contextmanager
+    def patch(self, *modules):
+        """
+        Remplace BleakClient et BleakScanner dans les modules indiqués le temps du bloc.
+
+        Args:
+            *modules: Modules qui ont importé BleakClient/BleakScanner
+        """
+        saved = []
+        for module in modules:
+            for name in ("BleakClient", "BleakScanner"):
+                if hasattr(module, name):
+                    saved.append((module, name, getattr(module, name)))
+                    setattr(module, name, getattr(self, name))
+        try:
+            yield self
+        finally:
+            for module, name, value in saved:
+                setattr(module, name, value)
+
+    def _make_scanner_class(self):
+        simulator = self
+
+        class SimulatedBleakScanner:
+            """Doublure de BleakScanner."""
+
+            def __init__(self, detection_callback=None, service_uuids=None, **kwargs):
+                self._detection_callback = detection_callback
+                self._service_uuids = service_uuids
+                self._task = None
+
+            async def __aenter__(self):
+                await self.start()
+                return self
+
+            async def __aexit__(self, *exc):
+                await self.stop()
+
+            async def start(self):
+                self._task = asyncio.ensure_future(self._advertise())
+
+            async def stop(self):
+                if self._task is not None:
+                    self._task.cancel()
+                    await asyncio.gather(self._task, return_exceptions=True)
+                    self._task = None
+
+            async def _advertise(self):
+                """Annonce chaque périphérique à intervalle régulier."""
+                if self._service_uuids and PMSCAN_SERVICE_UUID not in self._service_uuids:
+                    return
+                while True:
+                    await asyncio.sleep(ADVERTISING_INTERVAL * simulator.time_scale)
+                    for device in list(simulator.devices.values()):
+                        if self._detection_callback is not None:
+                            self._detection_callback(
+                                SimulatedBLEDevice(device.address, device.name),
+                                SimulatedAdvertisementData(device.name),
+                            )
+
+            @staticmethod
+            async def discover(timeout=5.0, **kwargs):
+                await asyncio.sleep(min(timeout, 0.1) * simulator.time_scale)
+                service_uuids = kwargs.get("service_uuids")
+                return [
+                    SimulatedBLEDevice(device.address, device.name)
+                    for device in simulator.devices.values()
+                    if not service_uuids or PMSCAN_SERVICE_UUID in service_uuids
+                ]
+
+            @staticmethod
+            async def find_device_by_address(address, timeout=10.0, **kwargs):
+                device = simulator.devices.get(address.upper())
+                if device is None:
+                    await asyncio.sleep(timeout * simulator.time_scale)
+                    return None
+                return SimulatedBLEDevice(device.address, device.name)
+
+        return SimulatedBleakScanner
+
+    def _make_client_class(self):
+        simulator = self
+
+        class SimulatedBleakClient:
+            """Doublure de BleakClient connectée à un SimulatedPMScan."""
+
+            def __init__(self, address_or_ble_device, disconnected_callback=None,
+                         services=None, *, timeout=10.0, **kwargs):
+                address = getattr(address_or_ble_device, "address", address_or_ble_device)
+                self.address = address
+                self.timeout = timeout
+                self._disconnected_callback = disconnected_callback
+                self._device = simulator.devices.get(address.upper())
+                self._connected = False
+                self._notify_callbacks = {}
+                self._tasks = []
+
+            @property
+            def is_connected(self):
+                return self._connected
+
+            @property
+            def services(self):
+                return self._device.services
+
+            async def __aenter__(self):
+                await self.connect()
+                return self
+
+            async def __aexit__(self, *exc):
+                await self.disconnect()
+
+            async def connect(self, **kwargs):
+                if self._device is None:
+                    await asyncio.sleep(self.timeout * simulator.time_scale)
+                    raise SimulatorError(f"Appareil {self.address} introuvable")
+                if self._device.connected_client is not None:
+                    raise SimulatorError(f"Appareil {self.address} déjà connecté")
+                await asyncio.sleep(simulator.connect_delay)
+                self._connected = True
+                self._device.connected_client = self
+                self._device.connections += 1
+                return True
+
+            async def disconnect(self):
+                if self._connected:
+                    self._teardown()
+                return True
+
+            async def get_services(self, **kwargs):
+                self._require_connection()
+                return self._device.services
+
+            def _characteristic(self, specifier):
+                if isinstance(specifier, int):
+                    # Handle, comme le permet BleakClient
+                    uuid = specifier
+                    characteristic = self._device.services.get_characteristic(specifier)
+                else:
+                    uuid = getattr(specifier, "uuid", specifier)
+                    characteristic = self._device.services.get_characteristic(str(uuid).lower())
+                if characteristic is None:
+                    raise SimulatorError(f"Caractéristique {uuid} introuvable")
+                return characteristic
+
+            def _require_connection(self):
+                if not self._connected:
+                    raise SimulatorError("Non connecté")
+
+            async def read_gatt_char(self, char_specifier, **kwargs):
+                self._require_connection()
+                characteristic = self._characteristic(char_specifier)
+                await asyncio.sleep(0)
+                return self._device.read(characteristic.uuid)
+
+            async def write_gatt_char(self, char_specifier, data, response=None):
+                self._require_connection()
+                characteristic = self._characteristic(char_specifier)
+                await asyncio.sleep(0)
+                self._device.write(characteristic.uuid, data)
+
+            async def start_notify(self, char_specifier, callback, **kwargs):
+                self._require_connection()
+                characteristic = self._characteristic(char_specifier)
+                self._notify_callbacks[characteristic.uuid] = callback
+                await asyncio.sleep(0)
+                if characteristic.uuid == REAL_TIME_DATA_UUID:
+                    self._tasks.append(asyncio.ensure_future(self._real_time_loop(characteristic)))
+                elif characteristic.uuid == MEMORY_DATA_UUID:
+                    self._tasks.append(asyncio.ensure_future(self._memory_loop(characteristic)))
+
+            async def stop_notify(self, char_specifier):
+                characteristic = self._characteristic(char_specifier)
+                self._notify_callbacks.pop(characteristic.uuid, None)
+
+            def _notify(self, uuid, data):
+                callback = self._notify_callbacks.get(uuid)
+                if callback is not None:
+                    callback(self._characteristic(uuid), bytearray(data))
+
+            async def _real_time_loop(self, characteristic):
+                device = self._device
+                while self._connected:
+                    await asyncio.sleep(device.interval * simulator.time_scale)
+                    if characteristic.uuid not in self._notify_callbacks:
+                        continue
+                    frame = device.next_frame()
+                    if frame is None:
+                        return
+                    self._notify(REAL_TIME_DATA_UUID, frame)
+                    if device.frames_sent % BATTERY_NOTIFY_EVERY == 0:
+                        if device.charging_state in (1, 2):
+                            device.battery_level = min(100, device.battery_level + 1)
+                            if device.battery_level == 100:
+                                device.charging_state = 3
+                                self._notify(BATTERY_CHARGING_UUID, [device.charging_state])
+                        else:
+                            device.battery_level = max(0, device.battery_level - 1)
+                        self._notify(BATTERY_LEVEL_UUID, [device.battery_level])
+
+            async def _memory_loop(self, characteristic):
+                memory = self._device.memory
+                chunk = FRAME_SIZE * 10
+                for offset in range(0, len(memory), chunk):
+                    if not self._connected or MEMORY_DATA_UUID not in self._notify_callbacks:
+                        return
+                    self._notify(MEMORY_DATA_UUID, memory[offset:offset + chunk])
+                    await asyncio.sleep(0)
+
+            def _teardown(self):
+                self._connected = False
+                self._notify_callbacks.clear()
+                for task in self._tasks:
+                    task.cancel()
+                self._tasks.clear()
+                if self._device.connected_client is self:
+                    self._device.connected_client = None
+
+            def _on_disconnect(self):
+                """Perte de connexion initiée par le périphérique."""
+                self._teardown()
+                if self._disconnected_callback is not None:
+                    self._disconnected_callback(self)
+
+        return SimulatedBleakClient
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Lance pmscan_reader contre des PMScan simulés",
+        epilog="Les autres options sont transmises à pmscan_reader.",
+    )
+    parser.add_argument("--devices", type=int, default=1, help="nombre de capteurs simulés")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help="intervalle entre deux trames (secondes)")
+    parser.add_argument("--replay", metavar="FICHIER",
+                        help="rejoue un fichier .pmr ou de trames brutes au lieu de trames synthétiques")
+    args, reader_argv = parser.parse_known_args()
+
+    import pmscan_client
+    import pmscan_fleet
+    import pmscan_reader
+    import pmscan_scan
+
+    simulator = Simulator()
+    for i in range(args.devices):
+        frames = replay_frames(args.replay) if args.replay else None
+        simulator.add_device(
+            f"00:00:00:00:00:{i + 1:02X}", name=f"PMScan-SIM{i + 1}",
+            interval=args.interval, frames=frames, seed=i,
+        )
+
+    with simulator.patch(pmscan_reader, pmscan_fleet, pmscan_scan, pmscan_client):
+        sys.exit(asyncio.run(pmscan_reader.main(pmscan_reader.parse_args(reader_argv))))
+
+if __name__ == "__main__":
+    main()